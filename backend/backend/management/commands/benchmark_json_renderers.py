@@ -0,0 +1,136 @@
+import time
+import uuid
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from account.models import User
+from backend.renderers import FastJSONRenderer, orjson
+from feedback.models import Feedback
+from feedback.serializers import FeedbackSerializer
+from inventory.benchmarks import check_benchmark_allowed, create_benchmark_plants
+from inventory.models import Plant
+from inventory.serializers import PlantListSerializer
+
+
+class Command(BaseCommand):
+    """
+    Compare the rendering speed of the DRF JSONRenderer and FastJSONRenderer.
+
+    The payloads are the responses of the plant list and the feedback list endpoints,
+    built from rows inserted inside a transaction that is rolled back at the end. Only
+    the rows created by the command are read, the existing plants, users and feedbacks
+    are left untouched. Only the rendering is timed (the data is serialized once), and
+    the command checks that both renderers produce the same bytes.
+
+    The rows are written to the configured database, so the command refuses to run when
+    DEBUG is off, unless --yes is passed.
+
+    Usage:
+        python manage.py benchmark_json_renderers
+        python manage.py benchmark_json_renderers --sizes 1000 10000 --repeat 5
+        python manage.py benchmark_json_renderers --yes (DEBUG off)
+    """
+
+    help = 'Benchmark the JSON renderers on the plant list and the feedback list payloads.'
+
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+            help='Numbers of plants and feedbacks in the payloads (default: 1000 10000 100000).'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Number of runs per payload, the best run is reported (default: 5).'
+        )
+        parser.add_argument(
+            '--yes', action='store_true',
+            help='Run even though DEBUG is off (the rows are rolled back, but written to the configured database).'
+        )
+
+
+    def handle(self, *args, **options):
+        if options['repeat'] <= 0 or any(size <= 0 for size in options['sizes']):
+            raise CommandError('The sizes and the number of runs must be positive.')
+
+        check_benchmark_allowed(options['yes'])
+
+        if orjson is None:
+            self.stderr.write('orjson is not installed, FastJSONRenderer uses the stdlib encoder.')
+
+        renderers = {'JSONRenderer': JSONRenderer(), 'FastJSONRenderer': FastJSONRenderer()}
+
+        self.stdout.write(f"{'rows':>8}  {'payload':<10}  {'renderer':<18}  {'rows/s':>12}  {'MB/s':>8}")
+
+        for size in options['sizes']:
+            with transaction.atomic():
+                payloads = {'plants': self.get_plant_payload(size), 'feedback': self.get_feedback_payload(size)}
+
+                for payload_name, data in payloads.items():
+                    rendered = {}
+
+                    for renderer_name, renderer in renderers.items():
+                        best = None
+
+                        for _ in range(options['repeat']):
+                            start = time.perf_counter()
+                            rendered[renderer_name] = renderer.render(data)
+                            elapsed = time.perf_counter() - start
+
+                            best = elapsed if best is None else min(best, elapsed)
+
+                        megabytes = len(rendered[renderer_name]) / 1024 / 1024
+                        self.stdout.write(
+                            f'{size:>8}  {payload_name:<10}  {renderer_name:<18}  '
+                            f'{size / best:>12,.0f}  {megabytes / best:>8.1f}'
+                        )
+
+                    if len(set(rendered.values())) != 1:
+                        raise CommandError(f'The renderers produced different JSON for {size} {payload_name}.')
+
+                # Leave the database as it was
+                transaction.set_rollback(True)
+
+
+    def get_plant_payload(self, size) -> list:
+        """Insert 'size' plants and return the data of the plant list response, with these plants only."""
+
+        ids = create_benchmark_plants(size)
+
+        return PlantListSerializer(PlantListSerializer.get_rows(Plant.objects.filter(id__in=ids).order_by('id'))).data
+
+
+    def get_feedback_payload(self, size) -> list:
+        """Insert 'size' feedbacks from a few new users and return the data of the feedback list response, with these feedbacks only."""
+
+        # The emails are unique, the token keeps them apart from the existing users
+        token = uuid.uuid4().hex[:12]
+
+        # The users are inserted directly, without hashing a password for each of them
+        users = User.objects.bulk_create(
+            User(name=f'Benchmark user {number}', email=f'benchmark_{token}_{number}@example.com', password='!')
+            for number in range(10)
+        )
+
+        Feedback.objects.bulk_create(
+            (
+                Feedback(
+                    user=users[number % len(users)],
+                    content=f'Benchmark feedback number {number}, the plants arrived healthy and well packed.',
+                    rating=number % 6,
+                )
+                for number in range(size)
+            ),
+            batch_size=1000,
+        )
+
+        request = APIRequestFactory().get('/')
+        request.user = AnonymousUser()
+
+        feedback_list = Feedback.objects.filter(user__in=users).select_related('user').order_by('id')
+
+        return FeedbackSerializer(feedback_list, many=True, context={'request': request}).data
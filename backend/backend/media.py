@@ -0,0 +1,177 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+
+# Files named by the hash of their content never change (see inventory/storage.py)
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{64}\.[0-9a-z]+$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable' # One year
+REVALIDATE_CACHE_CONTROL = 'public, no-cache' # Cached, but revalidated (cheap 304) on every use
+
+# Single byte range: "bytes=0-499", "bytes=500-" or "bytes=-500" (the last 500 bytes)
+RANGE_HEADER = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+RANGE_CHUNK_SIZE = 64 * 1024
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file of MEDIA_ROOT in production as well as in development.
+
+    The ETag, Last-Modified and Cache-Control headers are set by Django, which also answers
+    the conditional requests (304) without touching the file. The transfer itself depends
+    on MEDIA_SENDFILE_BACKEND:
+        - 'x-accel-redirect': nginx sends the file from the internal location MEDIA_SENDFILE_PREFIX.
+        - 'x-sendfile': Apache (mod_xsendfile) or lighttpd send the file from its path.
+        - None: Django streams the file, with support for single Range requests.
+    With a web server in front, the image bytes never occupy an application worker.
+
+    The files named by the hash of their content are cached by the browsers for a year,
+    the other files are revalidated on every use.
+    """
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('File not found.')
+
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404('File not found.')
+
+    if not os.path.isfile(full_path):
+        raise Http404('File not found.')
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    if response is None:
+        response = send_file(request, path, full_path, stat.st_size, etag, last_modified)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(path) else REVALIDATE_CACHE_CONTROL
+
+    return response
+
+
+def send_file(request, path, full_path, size, etag, last_modified):
+    """Return the response that transfers the file, through the web server or from Django."""
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    backend = settings.MEDIA_SENDFILE_BACKEND
+
+    if backend == 'x-accel-redirect':
+        # nginx handles Range and the transfer, the internal location maps to MEDIA_ROOT
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_SENDFILE_PREFIX + quote(path)
+
+        return response
+
+    if backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+
+        return response
+
+    if backend is not None:
+        raise ValueError(f'Unknown MEDIA_SENDFILE_BACKEND: {backend!r}')
+
+    byte_range = get_byte_range(request, size, etag, last_modified)
+
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+
+        return response
+
+    if byte_range is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+
+        response = StreamingHttpResponse(read_range(full_path, start, end), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+
+    response['Accept-Ranges'] = 'bytes'
+    if encoding:
+        response['Content-Encoding'] = encoding
+
+    return response
+
+
+def get_byte_range(request, size, etag, last_modified):
+    """
+    Return the (start, end) bytes (inclusive) requested by the Range header, None to send
+    the whole file, or 'unsatisfiable' if the range lies outside of the file.
+
+    Only single ranges are supported, a request with several ranges gets the whole file,
+    which is allowed by RFC 9110. If-Range must match the current ETag or Last-Modified,
+    otherwise the file has changed and the whole file is sent.
+    """
+
+    header = request.headers.get('Range')
+    if not header:
+        return None
+
+    match = RANGE_HEADER.match(header.strip())
+    if match is None:
+        return None
+
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        return None
+
+    first, last = match.groups()
+
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffix range, the last N bytes
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+
+    if start >= size or start > end:
+        return 'unsatisfiable'
+
+    return start, end
+
+
+def read_range(full_path, start, end):
+    """Yield the bytes of the file between start and end (inclusive) in chunks."""
+
+    with open(full_path, 'rb') as file:
+        file.seek(start)
+        remaining = end - start + 1
+
+        while remaining > 0:
+            chunk = file.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+
+            remaining -= len(chunk)
+            yield chunk
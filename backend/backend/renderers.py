@@ -0,0 +1,102 @@
+import math
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError: # The stdlib encoder of JSONRenderer is used instead
+    orjson = None
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+# Types that can't hold a non-finite number, skipped without any other check
+FINITE_TYPES = frozenset((str, int, bool, type(None)))
+
+
+def contains_non_finite(data) -> bool:
+    """Return True if the dicts, lists and tuples of the data hold a NaN or infinite float or Decimal."""
+
+    # A stack of the containers left to walk, the nesting of the data has no limit
+    stack = [(data,)]
+
+    while stack:
+        for value in stack.pop():
+            if type(value) in FINITE_TYPES: # Most of the values, checked first
+                continue
+
+            if isinstance(value, dict):
+                stack.append(value.values())
+            elif isinstance(value, (list, tuple)):
+                stack.append(value)
+            elif isinstance(value, float):
+                if not math.isfinite(value):
+                    return True
+            elif isinstance(value, Decimal) and not value.is_finite():
+                return True
+
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for the DRF JSONRenderer that encodes the data with orjson.
+
+    orjson encodes the UUIDs, the datetimes, the dicts and the lists natively (in C),
+    which is several times faster than json.dumps for the large lists of the catalog.
+    The other types (Decimal, lazy translations, querysets...) are handed to the default
+    method of the DRF encoder, so they are rendered exactly as JSONRenderer renders them.
+
+    The output is the same as the one of JSONRenderer, except for the floats written with
+    an exponent or many decimals: orjson writes 1e16 and 2.5e-5 as 1e16 and 0.000025,
+    json.dumps as 1e+16 and 2.5e-05. Both parse to the same number. The catalog has no
+    such floats, its prices are decimals.
+
+    orjson writes NaN and the infinities as null. When the output holds a null, the data
+    is checked for them and rendered by JSONRenderer if it has any, so STRICT_JSON is
+    honoured: a ValueError is raised in strict mode, NaN or Infinity is written otherwise.
+
+    The stdlib encoder of JSONRenderer is used when orjson is not installed, when the
+    client asked for indented JSON (e.g. the browsable API), when the REST_FRAMEWORK
+    settings ask for ASCII or non-compact output, or when orjson can't encode the data
+    (e.g. an integer larger than 64 bits).
+    """
+
+    # UUID keys and the like are converted to strings, as json.dumps does, and the UTC
+    # datetimes end with 'Z', as in the DRF encoder
+    orjson_options = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z if orjson is not None else 0
+
+    # The DRF encoder handles the types orjson doesn't know about
+    orjson_default = staticmethod(JSONEncoder().default)
+
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render the data into JSON, returning a bytestring."""
+
+        if data is None:
+            return b''
+
+        if not self.can_use_orjson(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            content = orjson.dumps(data, default=self.orjson_default, option=self.orjson_options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # NaN and the infinities are rendered as null, the usual None values only cost the check
+        if b'null' in content and contains_non_finite(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Escape \u2028 and \u2029 like JSONRenderer, so the output stays a strict javascript subset
+        return content.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+    def can_use_orjson(self, accepted_media_type, renderer_context) -> bool:
+        """Return True if orjson produces the same output as the stdlib encoder for this request."""
+
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return False
+
+        # orjson can only indent by two spaces
+        return self.get_indent(accepted_media_type, renderer_context) is None
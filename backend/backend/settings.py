@@ -22,6 +22,24 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # MEDIA_ROOT and MEDIA_URL settings
 MEDIA_ROOT = BASE_DIR / 'media' # Path where media files will be stored
 MEDIA_URL = '/media/' # URL to access media files from the web
+# Hand the media transfers off to the web server: None (Django streams the files),
+# 'x-accel-redirect' (nginx, internal location MEDIA_SENDFILE_PREFIX mapped to MEDIA_ROOT)
+# or 'x-sendfile' (Apache mod_xsendfile, lighttpd). See backend/media.py.
+MEDIA_SENDFILE_BACKEND = None
+MEDIA_SENDFILE_PREFIX = '/protected-media/'
+
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024 # Uploads larger than 10 MB are stopped while they are received, also the largest accepted plant image
+
+# The MaxSizeUploadHandler runs first, so an oversized upload is never fully buffered
+FILE_UPLOAD_HANDLERS = [
+    'inventory.uploadhandlers.MaxSizeUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Resized copies of the plant images (see inventory/images.py)
+PLANT_IMAGE_WORKERS = 2 # Number of processes that generate the image variants
+PLANT_IMAGE_VARIANTS_ASYNC = True # Generate the variants in the process pool, off the request path
 
 
 # Quick-start development settings - unsuitable for production
@@ -52,6 +70,10 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'backend.renderers.FastJSONRenderer', # orjson, falls back to the stdlib encoder
+        'rest_framework.renderers.BrowsableAPIRenderer',
     )
 }
 
@@ -71,6 +93,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     
+    'backend', # Project-level management commands (benchmark_json_renderers)
     'account',
     'inventory',
     'cart',
@@ -128,6 +151,38 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# The local-memory cache is private to each process. That's enough for correctness: the
+# versions that the cached catalog responses depend on live in the database (see
+# inventory/cache.py), so no process serves a response of an older version. Point these
+# aliases to a shared backend (e.g. Redis or Memcached) to render each response only once
+# for all the workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+        'TIMEOUT': 300, # Frees the entries of the previous versions, which are never read again
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+}
+
+# Cache alias that holds the catalog version and the cached catalog responses
+CATALOG_CACHE_ALIAS = 'catalog'
+
+# Cache alias that holds the cart summaries (see cart/cache.py). Their keys include the cart
+# and catalog versions stored in the database, so a local-memory cache per worker never
+# serves a summary that another worker has invalidated.
+CART_CACHE_ALIAS = 'default'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -164,6 +219,21 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+
+# File storages, the plant images (and their variants) are named by the SHA-256 of their
+# content, which deduplicates identical uploads (see inventory/storage.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    'plant_images': {
+        'BACKEND': 'inventory.storage.ContentAddressedStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
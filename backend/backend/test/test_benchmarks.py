@@ -0,0 +1,55 @@
+import io
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from account.models import User
+from feedback.models import Feedback
+from inventory.models import Plant
+
+
+class BenchmarkJSONRenderersCommandTest(TestCase):
+    """
+    Test the benchmark_json_renderers management command.
+
+    - Test that it refuses to run when DEBUG is off, unless --yes is passed.
+    - Test that it only reads the rows it created, and leaves the database as it was.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(name='user', email='user@test.com', password='a12a14t56')
+        self.feedback = Feedback.objects.create(user=self.user, content='The plants arrived healthy and well packed.', rating=5)
+        self.plant = Plant.objects.bulk_create([Plant(name='Monstera', price=25, image='plants/monstera.jpg')])[0]
+
+
+    def benchmark(self, **options):
+        """Run the command on small payloads and return its output."""
+
+        stdout = io.StringIO()
+        call_command('benchmark_json_renderers', sizes=[20], repeat=1, stdout=stdout, stderr=io.StringIO(), **options)
+
+        return stdout.getvalue()
+
+
+    def test_refuses_without_debug(self):
+        """Ensure that the command doesn't write to the database when DEBUG is off (as in the tests) without --yes."""
+
+        with self.assertRaisesMessage(CommandError, 'Pass --yes'):
+            self.benchmark()
+
+
+    def test_database_is_untouched(self):
+        """Ensure that the existing rows are neither deleted nor changed, and that the new ones are rolled back."""
+
+        with CaptureQueriesContext(connection) as queries:
+            output = self.benchmark(yes=True)
+
+        self.assertIn('FastJSONRenderer', output)
+        self.assertFalse([query for query in queries if query['sql'].startswith(('DELETE', 'UPDATE'))])
+
+        self.assertEqual(list(Plant.objects.values_list('id', flat=True)), [self.plant.id])
+        self.assertEqual(list(Feedback.objects.values_list('id', flat=True)), [self.feedback.id])
+        self.assertEqual(list(User.objects.values_list('id', flat=True)), [self.user.id])
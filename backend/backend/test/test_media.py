@@ -0,0 +1,213 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+from django.utils.http import http_date
+
+from backend.media import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL
+
+
+HASHED_NAME = 'plants/ab/' + 'ab' * 32 + '.jpg'
+
+
+class ServeMediaTest(SimpleTestCase):
+    """
+    Test the media view (backend/media.py).
+
+    - Test that a file is served with its validators and the right Cache-Control.
+    - Test the conditional requests (If-None-Match, If-Modified-Since).
+    - Test the single, open-ended, suffix and unsatisfiable byte ranges.
+    - Test If-Range and the requests with several ranges.
+    - Test HEAD requests, missing files and path traversal.
+    - Test the X-Accel-Redirect and X-Sendfile handoffs.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_SENDFILE_BACKEND=None)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.content = bytes(range(256)) * 4 # 1024 bytes
+        self.write_file(HASHED_NAME, self.content)
+        self.write_file('plants/monstera.jpg', self.content)
+
+
+    def write_file(self, name, content):
+        """Write a file into the temporary MEDIA_ROOT."""
+
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, 'wb') as file:
+            file.write(content)
+
+
+    def get(self, name, **headers):
+        """GET a media file."""
+
+        return self.client.get(f'/media/{name}', headers=headers)
+
+
+    def test_serves_file(self):
+        """Test that the whole file is served with its validators."""
+
+        response = self.get(HASHED_NAME)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+
+    def test_cache_control(self):
+        """Test that the hashed names are cached for a year and the other names revalidated."""
+
+        self.assertEqual(self.get(HASHED_NAME)['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(self.get('plants/monstera.jpg')['Cache-Control'], REVALIDATE_CACHE_CONTROL)
+
+
+    def test_if_none_match(self):
+        """Test that a matching ETag gets an empty 304 response."""
+
+        etag = self.get(HASHED_NAME)['ETag']
+        response = self.get(HASHED_NAME, if_none_match=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+
+
+    def test_if_modified_since(self):
+        """Test that a file that didn't change since the date gets a 304 response."""
+
+        last_modified = self.get(HASHED_NAME)['Last-Modified']
+
+        self.assertEqual(self.get(HASHED_NAME, if_modified_since=last_modified).status_code, 304)
+        self.assertEqual(self.get(HASHED_NAME, if_modified_since=http_date(0)).status_code, 200)
+
+
+    def test_range(self):
+        """Test that a single byte range gets a 206 response with the bytes of the range."""
+
+        response = self.get(HASHED_NAME, range='bytes=10-19')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(response['Content-Length'], '10')
+
+
+    def test_open_ended_range(self):
+        """Test the 'bytes=N-' ranges and the ranges that end past the file."""
+
+        response = self.get(HASHED_NAME, range='bytes=1000-')
+        self.assertEqual(b''.join(response.streaming_content), self.content[1000:])
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+
+        response = self.get(HASHED_NAME, range='bytes=1000-5000')
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+
+
+    def test_suffix_range(self):
+        """Test that 'bytes=-N' returns the last N bytes."""
+
+        response = self.get(HASHED_NAME, range='bytes=-24')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[-24:])
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+
+
+    def test_unsatisfiable_range(self):
+        """Test that a range past the end of the file gets a 416 response."""
+
+        for header in ('bytes=1024-', 'bytes=20-10', 'bytes=-0'):
+            response = self.get(HASHED_NAME, range=header)
+
+            self.assertEqual(response.status_code, 416, header)
+            self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+
+    def test_several_ranges(self):
+        """Test that a request with several ranges or an invalid Range gets the whole file."""
+
+        for header in ('bytes=0-9,20-29', 'items=0-9', 'bytes=-'):
+            response = self.get(HASHED_NAME, range=header)
+
+            self.assertEqual(response.status_code, 200, header)
+            self.assertEqual(b''.join(response.streaming_content), self.content)
+
+
+    def test_if_range(self):
+        """Test that the range is only served if If-Range matches the current file."""
+
+        etag = self.get(HASHED_NAME)['ETag']
+
+        response = self.get(HASHED_NAME, range='bytes=0-9', if_range=etag)
+        self.assertEqual(response.status_code, 206)
+
+        response = self.get(HASHED_NAME, range='bytes=0-9', if_range='"outdated"')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.get(HASHED_NAME, range='bytes=0-9', if_range=http_date(0))
+        self.assertEqual(response.status_code, 200)
+
+
+    def test_head(self):
+        """Test that a HEAD request gets the headers without the body."""
+
+        response = self.client.head(f'/media/{HASHED_NAME}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], '1024')
+
+
+    def test_post_not_allowed(self):
+        """Test that the media files are read-only."""
+
+        self.assertEqual(self.client.post(f'/media/{HASHED_NAME}').status_code, 405)
+
+
+    def test_missing_file(self):
+        """Test that missing files, directories and paths outside of MEDIA_ROOT get a 404 response."""
+
+        self.assertEqual(self.get('plants/missing.jpg').status_code, 404)
+        self.assertEqual(self.get('plants').status_code, 404)
+        self.assertEqual(self.get('plants/monstera.jpg/child').status_code, 404)
+        self.assertEqual(self.get('../settings.py').status_code, 404)
+        self.assertEqual(self.get('%2E%2E/settings.py').status_code, 404)
+
+
+    @override_settings(MEDIA_SENDFILE_BACKEND='x-accel-redirect', MEDIA_SENDFILE_PREFIX='/protected-media/')
+    def test_x_accel_redirect(self):
+        """Test that the transfer is handed off to nginx with an empty response."""
+
+        response = self.get('plants/monstera.jpg')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/plants/monstera.jpg')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('ETag', response)
+        self.assertEqual(response['Cache-Control'], REVALIDATE_CACHE_CONTROL)
+
+        # Conditional requests are still answered by Django
+        self.assertEqual(self.get('plants/monstera.jpg', if_none_match=response['ETag']).status_code, 304)
+
+
+    @override_settings(MEDIA_SENDFILE_BACKEND='x-sendfile')
+    def test_x_sendfile(self):
+        """Test that the transfer is handed off to Apache with the path of the file."""
+
+        response = self.get(HASHED_NAME)
+
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, HASHED_NAME))
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
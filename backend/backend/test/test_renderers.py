@@ -0,0 +1,136 @@
+import datetime
+import json
+import uuid
+from decimal import Decimal
+from unittest import mock, skipIf
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from backend import renderers
+from backend.renderers import FastJSONRenderer
+
+
+class FastJSONRendererTest(SimpleTestCase):
+    """
+    Test that FastJSONRenderer renders the same bytes as the DRF JSONRenderer.
+
+    - Test a payload with UUIDs, Decimals, datetimes, nested and non-ASCII values.
+    - Test that \\u2028 and \\u2029 are escaped.
+    - Test that non-string keys are converted to strings.
+    - Test the floats, and that NaN and the infinities follow STRICT_JSON.
+    - Test that None is rendered as an empty body.
+    - Test that indented JSON is rendered by the stdlib encoder.
+    - Test the fallback when orjson can't encode the data or isn't installed.
+    """
+
+    def setUp(self):
+        self.renderer = FastJSONRenderer()
+        self.stdlib_renderer = JSONRenderer()
+
+
+    def assertSameRendering(self, data, accepted_media_type=None, renderer_context=None):
+        """Assert that both renderers produce the same bytes for the data."""
+
+        self.assertEqual(
+            self.renderer.render(data, accepted_media_type, renderer_context),
+            self.stdlib_renderer.render(data, accepted_media_type, renderer_context)
+        )
+
+
+    @skipIf(renderers.orjson is None, 'orjson is not installed')
+    def test_payload(self):
+        """Ensure that the common types are rendered the same way."""
+
+        data = [
+            {
+                'id': uuid.uuid4(),
+                'price': '12.50',
+                'discounted_price': Decimal('13.50'),
+                'in_stock': True,
+                'name': 'Monstera Délicieuse 🌿',
+                'description': None,
+                'rating': 4,
+                'added_at': datetime.datetime(2025, 3, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+                'naive': datetime.datetime(2025, 3, 1, 12, 30),
+                'local': timezone.localtime(timezone.now(), datetime.timezone(datetime.timedelta(hours=2))),
+                'day': datetime.date(2025, 3, 1),
+                'label': gettext_lazy('Plant'),
+                'nested': {'values': (1, 2.5, 'three')},
+            }
+        ]
+
+        self.assertSameRendering(data)
+
+
+    def test_line_separators_are_escaped(self):
+        """Ensure that \\u2028 and \\u2029 are escaped like in JSONRenderer."""
+
+        self.assertSameRendering({'text': 'line\u2028separator\u2029paragraph'})
+        self.assertIn(b'\\u2028', self.renderer.render({'text': '\u2028'}))
+
+
+    def test_non_string_keys(self):
+        """Ensure that the integer keys are converted to strings."""
+
+        self.assertSameRendering({1: 'one', 2: 'two'})
+
+
+    @skipIf(renderers.orjson is None, 'orjson is not installed')
+    def test_floats(self):
+        """Ensure that the floats have the same values, and the same bytes unless written with an exponent."""
+
+        self.assertSameRendering({'rating': 4.5, 'values': [0.1, -2.0, 123456789.25]})
+
+        data = {'large': 1e16, 'small': 1e-7}
+        content = self.renderer.render(data)
+
+        self.assertEqual(content, b'{"large":1e16,"small":1e-7}') # json.dumps writes 1e+16 and 1e-07
+        self.assertEqual(json.loads(content), json.loads(self.stdlib_renderer.render(data)))
+
+
+    def test_non_finite_floats(self):
+        """Ensure that NaN and the infinities raise in strict mode and are rendered like JSONRenderer otherwise."""
+
+        payloads = [{'name': None, 'values': [{'rating': value}]} for value in (float('nan'), float('inf'), -float('inf'))]
+
+        for data in payloads:
+            with self.assertRaises(ValueError):
+                self.stdlib_renderer.render(data)
+
+            with self.assertRaises(ValueError):
+                self.renderer.render(data)
+
+        # STRICT_JSON = False
+        self.renderer.strict = self.stdlib_renderer.strict = False
+
+        for data in payloads:
+            self.assertSameRendering(data)
+
+
+    def test_none(self):
+        """Ensure that None is rendered as an empty body."""
+
+        self.assertEqual(self.renderer.render(None), b'')
+
+
+    def test_indent(self):
+        """Ensure that indented JSON is rendered by the stdlib encoder."""
+
+        self.assertSameRendering({'a': [1, 2]}, 'application/json; indent=4')
+        self.assertSameRendering({'a': [1, 2]}, renderer_context={'indent': 2})
+
+
+    def test_large_integer(self):
+        """Ensure that the integers larger than 64 bits fall back to the stdlib encoder."""
+
+        self.assertSameRendering({'value': 2 ** 70})
+
+
+    def test_without_orjson(self):
+        """Ensure that the stdlib encoder is used when orjson is not installed."""
+
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertSameRendering({'id': uuid.UUID(int=1), 'price': Decimal('1.10')})
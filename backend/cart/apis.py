@@ -3,12 +3,16 @@ from rest_framework.response import Response
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 
 from .models import Cart, CartItem
 from inventory.models import Plant
 from .serializers import CartItemSerializer
+from .cache import get_cart_summary
+from .batch import MAX_CART_OPERATIONS, apply_cart_operations
 
 
 class CartItemListAPI(APIView):
@@ -17,7 +21,8 @@ class CartItemListAPI(APIView):
     items associated with the user object.
     
     This API endpoint allows authenticated users to retrieve a list of cart items, 
-    including the plant, quantity, and total sum.
+    including the plant, quantity, and total sum. The number of queries doesn't
+    depend on the number of items: the cart, the totals and the items with their plants.
     """
     
     # Restrict access to unauthenticated users
@@ -30,40 +35,119 @@ class CartItemListAPI(APIView):
         # Retrieve the Cart object from the database, or return a 404 if it is not found.
         cart = get_object_or_404(Cart, user=request.user)
         
+        # Compute the totals and the number of items with a single aggregate query
+        totals = cart.get_totals()
         
         # Check if the cart is not empty
-        if not cart.cart_items.all().count():
+        if not totals['items_count']:
             return Response({'message': 'Your cart is empty.'}, status=status.HTTP_200_OK)
         
-        # Serializer the cart items using the CartItemSerializer
-        serializer = CartItemSerializer(cart.cart_items.all(), many=True)
+        # Serializer the cart items using the CartItemSerializer.
+        # The products are fetched by the same query (a JOIN) instead of one query per item.
+        serializer = CartItemSerializer(cart.cart_items.select_related('product'), many=True)
         
         # Data that will be returned and displayed on a web page. 
         context = {
             'items': serializer.data,
-            'total_cart_price': cart.get_total(),
-            'total_items_count': cart.get_items_count()
+            'total_cart_price': totals['total_cart_price'],
+            'total_items_count': totals['total_items_count']
         }
         
         return Response(context, status=status.HTTP_200_OK)
     
     
+class CartSummaryAPI(APIView):
+    """
+    The CartSummaryAPI handles a GET request and returns the summary of the user's cart
+    displayed by the navbar badge: the number of items, the number of different products
+    and the total price.
+    
+    The summary is cached per user (see cart/cache.py) and invalidated by every change of
+    the cart and of the catalog, so most page views only read the versions of the cart and
+    of the catalog (one query) instead of aggregating the items. A user without a cart gets
+    a summary of zeros.
+    """
+    
+    # Restrict access to unauthenticated users
+    authentication_classes = [SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, *args, **kwargs):
+        """Return the cached summary of the cart."""
+        
+        summary = get_cart_summary(request.user.id)
+        
+        return Response(summary, status=status.HTTP_200_OK)
+    
+    
+class CartBatchAPI(APIView):
+    """
+    The CartBatchAPI handles a POST request that applies a list of operations to the
+    user's cart at once, e.g. to restore a saved cart or to replay the changes made by
+    a mobile client while it was offline:
+        {"operations": [{"plant_id": "<uuid>", "op": "add", "quantity": 2},
+                        {"plant_id": "<uuid>", "op": "subtract"},
+                        {"plant_id": "<uuid>", "op": "set", "quantity": 5},
+                        {"plant_id": "<uuid>", "op": "remove"}]}
+    
+    The operations are applied in order, in one transaction and with a fixed number of
+    queries (see batch.apply_cart_operations). The batch is all or nothing: if any
+    operation is invalid, the errors are returned with their position in the batch
+    (400) and the cart is left unchanged. Otherwise the response is the new summary of
+    the cart, as returned by the CartSummaryAPI.
+    """
+    
+    # Restrict access for unauthenticated users
+    authentication_classes = [SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+    
+    max_operations = MAX_CART_OPERATIONS # Upper limit for the number of operations in a single request
+    
+    
+    def post(self, request, *args, **kwargs):
+        """Apply the operations and return the summary of the cart."""
+        
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        
+        if not isinstance(operations, list) or not operations:
+            raise ValidationError({'operations': 'A non-empty list of operations is required.'})
+        
+        if len(operations) > self.max_operations:
+            raise ValidationError({'operations': f'Ensure this field has no more than {self.max_operations} operations.'})
+        
+        try:
+            summary, errors = apply_cart_operations(request.user, operations)
+        except Cart.DoesNotExist:
+            raise Http404('The cart does not exist.')
+        
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(summary, status=status.HTTP_200_OK)
+    
+    
 class AddCartItemAPI(APIView):
     """
     The AddCartItemAPI handles a POST request to create a CartItem object 
     and add it to the Cart object.
     
     This API endpoint allows authenticated users to add a product to the cart object. 
-    It requires the plant ID to be passed in the POST request.
+    It requires the plant ID to be passed in the POST request, and optionally the
+    quantity to add (1 by default). Adding a product that is already in the cart
+    increases its quantity, in a single statement (see CartItemManager.add_to_cart).
     """
     
     # Restrict access for unauthenticated users
     authentication_classes = [SessionAuthentication]
     permission_classes = [IsAuthenticated]
     
+    max_quantity = 100 # Upper limit for the quantity added by a single request
+    
     
     def post(self, request, *args, **kwargs):
-        """Add a cart item to the cart object."""
+        """Add a cart item to the cart object, or increase its quantity."""
+        
+        quantity = self.get_quantity(request)
         
         # Retrieve the Cart object from the database or return a 404 if it is not found.
         cart = get_object_or_404(Cart, user=request.user)
@@ -71,11 +155,26 @@ class AddCartItemAPI(APIView):
         # Retrieve the Plant object from the database or return a 404 if it is not found.
         plant = get_object_or_404(Plant, id=request.data.get('plant_id'))
         
-        # Create a CartItem object
-        # Quantity is equal to 1 by default
-        cartItem = CartItem.objects.create(cart=cart, product=plant, quantity=1)
+        # Create the CartItem object or increase its quantity
+        item_id, new_quantity, created = CartItem.objects.add_to_cart(cart, plant, quantity)
         
-        return Response(status=status.HTTP_200_OK)
+        return Response({'id': item_id, 'quantity': new_quantity}, status=status.HTTP_200_OK)
+    
+    
+    def get_quantity(self, request) -> int:
+        """Return the quantity to add, 1 if it is not provided. Raises ValidationError if it is invalid."""
+        
+        quantity = request.data.get('quantity', 1)
+        
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            raise ValidationError({'quantity': 'A valid integer is required.'})
+        
+        if not 1 <= quantity <= self.max_quantity:
+            raise ValidationError({'quantity': f'Ensure this value is between 1 and {self.max_quantity}.'})
+        
+        return quantity
 
 
 class DeleteCartItemAPI(APIView):
@@ -116,6 +215,8 @@ class IncreaseQuantityAPI(APIView):
 
     This API endpoint allows authenticated users to increase the quantity
     of an object by one. It requires them to provide the product ID.
+    The item is updated with a single statement, which returns the new quantity
+    (see CartItemManager.increase_quantity).
     """
 
     # Restriction access for unauthenticated users
@@ -125,19 +226,14 @@ class IncreaseQuantityAPI(APIView):
     def patch(self, request, id, *args, **kwargs):
         """Increase the quantity of the CartItem object by one."""
 
-        # Retrieve the Cart object from the database or return 404 if it is not found
-        cart = get_object_or_404(Cart, user=request.user)
+        # quantity = quantity + 1, for the item of the plant in the user's cart
+        quantity = CartItem.objects.increase_quantity(request.user, id)
 
-        # Retrieve the Plant object from the database or return 404 if it's not found
-        plant = get_object_or_404(Plant, id=id)
+        # The cart, the plant or the item does not exist
+        if quantity is None:
+            raise Http404('The product is not in your cart.')
 
-        # Retrieve the CartItem object
-        cart_item = get_object_or_404(CartItem, cart=cart, product=plant)
-
-        cart_item.quantity += 1 # Increase the amount
-        cart_item.save() # Save to the database
-
-        return Response(status=status.HTTP_200_OK)
+        return Response({'quantity': quantity}, status=status.HTTP_200_OK)
 
 
 
@@ -149,6 +245,8 @@ class DecreaseQuantityAPI(APIView):
     This API endpoint allows authenticated users to decrease the quantity
     of an object by one. It requires them to provide the product ID. If the
     quantity is equal to 1, the CartItem will be deleted.
+    The item is updated or deleted with a single statement
+    (see CartItemManager.decrease_quantity).
     """
 
     # Restriction access for unauthenticated users
@@ -158,22 +256,15 @@ class DecreaseQuantityAPI(APIView):
     def patch(self, request, id, *args, **kwargs):
         """Decrease the quantity of the CartItem object by one."""
 
-        # Retrieve the Cart object from the database or return 404 if it is not found
-        cart = get_object_or_404(Cart, user=request.user)
+        # quantity = quantity - 1, or the deletion of the item if its quantity is 1
+        quantity = CartItem.objects.decrease_quantity(request.user, id)
 
-        # Retrieve the Plant object from the database or return 404 if it's not found
-        plant = get_object_or_404(Plant, id=id)
+        # The cart, the plant or the item does not exist
+        if quantity is None:
+            raise Http404('The product is not in your cart.')
 
-        # Retrieve the CartItem object
-        cart_item = get_object_or_404(CartItem, cart=cart, product=plant)
-
-        # Check if the quantity is equal to 1
-        if cart_item.quantity == 1:
-            # Delete the CartItem if the if statement returns True.
-            cart_item.delete() # Delete the object
+        # The CartItem has been deleted
+        if quantity == 0:
             return Response(status=status.HTTP_204_NO_CONTENT)
 
-        cart_item.quantity -= 1 # Decrease the amount
-        cart_item.save() # Save to the database
-
-        return Response(status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response({'quantity': quantity}, status=status.HTTP_200_OK)
@@ -0,0 +1,151 @@
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from inventory.models import Plant
+from .cache import compute_cart_summary, invalidate_cart_summary
+from .models import Cart, CartItem
+
+
+# Largest number of operations in a single batch
+MAX_CART_OPERATIONS = 200
+
+# Largest quantity of a single operation (the same limit as AddCartItemAPI)
+MAX_OPERATION_QUANTITY = 100
+
+# add: adds the quantity (the item is created if needed), subtract: removes it (the item is
+# deleted when it drops to zero), set: replaces it (0 deletes the item), remove: deletes the item.
+CART_OPERATIONS = ('add', 'subtract', 'set', 'remove')
+
+
+def clean_cart_operation(operation) -> tuple:
+    """
+    Validate an operation, e.g. {"plant_id": "<uuid>", "op": "add", "quantity": 2}, and
+    return (plant id, op, quantity). The quantity defaults to 1 (0 for remove).
+
+    Raises ValidationError.
+    """
+
+    if not isinstance(operation, dict):
+        raise ValidationError('Every operation must be an object.')
+
+    try:
+        plant_id = uuid.UUID(str(operation.get('plant_id')))
+    except ValueError:
+        raise ValidationError(f'"{operation.get("plant_id")}" is not a valid plant id.')
+
+    op = operation.get('op')
+    if op not in CART_OPERATIONS:
+        raise ValidationError(f'The op field must be one of: {", ".join(CART_OPERATIONS)}.')
+
+    if op == 'remove':
+        return plant_id, op, 0
+
+    quantity = operation.get('quantity', 1)
+
+    # bool is a subclass of int, but true is not a quantity
+    if not isinstance(quantity, int) or isinstance(quantity, bool):
+        raise ValidationError('The quantity field must be an integer.')
+
+    minimum = 0 if op == 'set' else 1
+
+    if not minimum <= quantity <= MAX_OPERATION_QUANTITY:
+        raise ValidationError(f'The quantity field must be between {minimum} and {MAX_OPERATION_QUANTITY}.')
+
+    return plant_id, op, quantity
+
+
+def apply_operation(current, op, quantity) -> int:
+    """Return the quantity of an item after the operation (0 means that the item is deleted)."""
+
+    if op == 'add':
+        return current + quantity
+
+    if op == 'subtract':
+        return max(current - quantity, 0)
+
+    if op == 'set':
+        return quantity
+
+    return 0 # remove
+
+
+def apply_cart_operations(user, operations) -> tuple:
+    """
+    Apply a batch of cart operations in one transaction and return (summary, errors).
+
+        summary: the summary of the cart after the batch, as served by CartSummaryAPI.
+        errors: [{"index": 3, "error": "..."}, ...]
+
+    The batch is all or nothing: if any operation is invalid or refers to an unknown
+    plant, the errors are returned and nothing is applied (the summary is None). The
+    operations are applied in order, several of them may change the same plant. Instead
+    of a statement per operation, the whole batch costs a fixed number of queries:
+        1. One query validates every plant id.
+        2. SELECT ... FOR UPDATE of the cart and of the current items of these plants,
+           so concurrent batches of the same user are serialized.
+        3. The final quantities are computed in Python, then written with one bulk
+           INSERT ... ON CONFLICT DO UPDATE (the new and the changed items) and one DELETE
+           (the items that dropped to zero).
+        4. One aggregate query computes the summary.
+
+    Raises Cart.DoesNotExist if the user has no cart.
+    """
+
+    errors = []
+    cleaned = [] # (index, plant id, op, quantity)
+
+    for index, operation in enumerate(operations):
+        try:
+            cleaned.append((index, *clean_cart_operation(operation)))
+        except ValidationError as error:
+            errors.append({'index': index, 'error': ' '.join(error.messages)})
+
+    plant_ids = {plant_id for _, plant_id, _, _ in cleaned}
+    existing = set(Plant.objects.filter(id__in=plant_ids).values_list('id', flat=True))
+
+    for index, plant_id, _, _ in cleaned:
+        if plant_id not in existing:
+            errors.append({'index': index, 'error': f'The plant {plant_id} does not exist.'})
+
+    if errors:
+        errors.sort(key=lambda error: error['index'])
+        return None, errors
+
+    with transaction.atomic():
+        cart = Cart.objects.select_for_update().get(user=user)
+
+        items = cart.cart_items.select_for_update().filter(product_id__in=plant_ids)
+        current = dict(items.values_list('product_id', 'quantity'))
+        quantities = dict(current)
+
+        for _, plant_id, op, quantity in cleaned:
+            quantities[plant_id] = apply_operation(quantities.get(plant_id, 0), op, quantity)
+
+        upserts = [
+            CartItem(cart=cart, product_id=plant_id, quantity=quantity)
+            for plant_id, quantity in quantities.items()
+            if quantity > 0 and quantity != current.get(plant_id)
+        ]
+        deletions = [plant_id for plant_id, quantity in quantities.items() if quantity == 0 and plant_id in current]
+
+        if upserts:
+            # The unique_cart_product constraint turns the existing items into updates
+            CartItem.objects.bulk_create(
+                upserts,
+                update_conflicts=True,
+                unique_fields=['cart', 'product'],
+                update_fields=['quantity'],
+            )
+
+        if deletions:
+            CartItem.objects.remove_from_cart(cart, deletions)
+
+        if upserts or deletions:
+            # Neither bulk_create() nor remove_from_cart() send the signals
+            invalidate_cart_summary(user.pk)
+
+        summary = compute_cart_summary(user.pk)
+
+    return summary, errors
@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F, Subquery
+
+from inventory.cache import CATALOG_VERSION_KEY, get_catalog_version
+from inventory.models import CatalogVersion
+from .models import Cart, CartItem
+
+
+def get_cart_cache():
+    """Return the cache backend that holds the cart summaries."""
+
+    return caches[settings.CART_CACHE_ALIAS]
+
+
+def cart_summary_key(user_id, catalog_version, cart_version) -> str:
+    """
+    Return the cache key of the cart summary of a user.
+
+    The key includes two versions kept in the database: the version of the cart, bumped
+    by every change of its items (see invalidate_cart_summary), and the catalog version,
+    because the total depends on the plant prices (see inventory.cache.invalidate_catalog).
+    A change moves the summary to a new key in every process, the old keys are never
+    read again and expire.
+    """
+
+    return f'cart:summary:{catalog_version}:{user_id}:{cart_version}'
+
+
+def get_cart_versions(user_id):
+    """Return (catalog version, cart version) with a single query, or None if the user has no cart."""
+
+    catalog_version = CatalogVersion.objects.filter(key=CATALOG_VERSION_KEY).values('version')[:1]
+
+    versions = (
+        Cart.objects.filter(user_id=user_id)
+        .annotate(catalog_version=Subquery(catalog_version))
+        .values_list('catalog_version', 'version')
+        .first()
+    )
+
+    # The version row is created by the first read of the catalog version
+    if versions is not None and versions[0] is None:
+        versions = (get_catalog_version(), versions[1])
+
+    return versions
+
+
+def compute_cart_summary(user_id) -> dict:
+    """Compute the summary of the cart of a user with a single aggregate query (zeros if there's no cart)."""
+
+    return CartItem.objects.filter(cart__user_id=user_id).aggregate(**CartItem.get_totals_aggregates())
+
+
+def get_cart_summary(user_id) -> dict:
+    """
+    Return the summary of the cart of a user: the cached one, or the computed one which is then cached.
+
+        {"total_cart_price": Decimal, "total_items_count": int, "items_count": int}
+    """
+
+    versions = get_cart_versions(user_id)
+
+    if versions is None:
+        return compute_cart_summary(user_id) # No cart, nothing to cache
+
+    cache = get_cart_cache()
+    key = cart_summary_key(user_id, *versions)
+
+    summary = cache.get(key)
+
+    if summary is None:
+        summary = compute_cart_summary(user_id)
+        cache.set(key, summary)
+
+    return summary
+
+
+def invalidate_cart_summary(user_id):
+    """
+    Invalidate the cached cart summary of a user after a change of the cart.
+
+    The version of the cart is bumped by a single UPDATE. Inside a transaction, the bump
+    is committed (or rolled back) with the change, so no process can read the new version
+    with the old items. A summary computed from the new items before the bump is stored
+    under the old version, which is never read again.
+    """
+
+    Cart.objects.filter(user_id=user_id).update(version=F('version') + 1)
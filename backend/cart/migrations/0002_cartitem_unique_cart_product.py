@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:54
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_items(apps, schema_editor):
+    """
+    Merge the cart items that hold the same product of the same cart into one item
+    (with the sum of the quantities), so the unique constraint can be created.
+    """
+
+    CartItem = apps.get_model('cart', 'CartItem')
+    items = CartItem.objects.using(schema_editor.connection.alias)
+
+    duplicates = (
+        items.values('cart_id', 'product_id')
+        .annotate(count=Count('id'), quantity=Sum('quantity'))
+        .filter(count__gt=1)
+    )
+
+    for duplicate in duplicates:
+        same_product = items.filter(cart_id=duplicate['cart_id'], product_id=duplicate['product_id']).order_by('added_at', 'id')
+        kept = same_product.first()
+
+        same_product.exclude(id=kept.id).delete()
+        items.filter(id=kept.id).update(quantity=duplicate['quantity'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0001_initial'),
+        ('inventory', '0011_plant_sku_feed_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
@@ -1,4 +1,8 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import NotSupportedError, connections, models, router
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce
 from account.models import User
 from inventory.models import Plant
 from django.utils import timezone
@@ -9,27 +13,44 @@ import uuid
 # Create your models here.
 
 
+# Output field of the cart totals (larger than Plant.price, a total adds up several prices)
+TOTAL_PRICE_FIELD = models.DecimalField(max_digits=14, decimal_places=2)
+
+
 class Cart(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
     
+    # Bumped by every change of the items, part of the key of the cached summary (see cart/cache.py)
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    
     def __str__(self):
         """Return a human-readable string representation of the Plant object."""
         return self.user.email
     
     
+    def get_totals(self) -> dict:
+        """
+        Calculates the totals of the cart with a single aggregate query, whatever the number of items.
+        
+        Returns a dictionary with:
+            - total_cart_price: The sum of the product prices multiplied by the quantities.
+            - total_items_count: The sum of the quantities.
+            - items_count: The number of different products in the cart.
+        """
+        
+        return self.cart_items.aggregate(**CartItem.get_totals_aggregates())
+    
+    
     def get_total(self):
         """Calculates and returns total sum of all items in the cart."""
         
-        # Access all cart_items via related_name
-        total = sum(item.get_total_price() for item in self.cart_items.all())
-        
-        return total
+        return self.get_totals()['total_cart_price'] # Computed by the database, no item is loaded
     
     def get_items_count(self):
         """Returns the amount of all items in the cart."""
 
-        return sum(item.quantity for item in self.cart_items.all()) # This also uses related_name
+        return self.get_totals()['total_items_count']
     
     def clean(self):
         """Validates model fields like: user"""
@@ -47,6 +68,261 @@ class Cart(models.Model):
 
 
 
+class CartItemManager(models.Manager):
+    """
+    Manager of the CartItem model, with the atomic cart mutations.
+    
+    Every mutation is a single statement that returns the new quantity (RETURNING), so
+    concurrent requests on the same item can't overwrite each other's change. Django
+    can't add RETURNING to an UPDATE, so they are written in SQL and the signals are not
+    sent: each of them invalidates the cached cart summary itself (one more UPDATE, of
+    the cart version).
+    """
+    
+    def get_connection(self):
+        """Return the connection to write to. Raises NotSupportedError if it lacks ON CONFLICT or RETURNING."""
+        
+        connection = connections[router.db_for_write(self.model)]
+        
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise NotSupportedError('The cart mutations require PostgreSQL or SQLite (ON CONFLICT and RETURNING).')
+        
+        return connection
+    
+    
+    def add_to_cart(self, cart, product, quantity=1) -> tuple:
+        """
+        Adds the quantity of the product to the cart with a single statement and returns
+        (item id, new quantity, created).
+        
+        INSERT ... ON CONFLICT (cart, product) DO UPDATE SET quantity = quantity + n either
+        creates the item or increases the quantity of the existing one. The database
+        resolves the conflict on the unique_cart_product index, so concurrent adds of
+        the same plant are serialized and none of them is lost or turned into an error.
+        Requires PostgreSQL or SQLite (3.35+, for RETURNING).
+        """
+        
+        connection = self.get_connection()
+        
+        meta = self.model._meta
+        quote_name = connection.ops.quote_name
+        table = quote_name(meta.db_table)
+        
+        fields = [meta.get_field(name) for name in ('id', 'cart', 'product', 'quantity', 'added_at')]
+        values = [uuid.uuid4(), cart.pk, product.pk, quantity, timezone.localdate()]
+        
+        columns = ', '.join(quote_name(field.column) for field in fields)
+        params = [field.get_db_prep_save(value, connection) for field, value in zip(fields, values)]
+        quantity_column = quote_name(meta.get_field('quantity').column)
+        
+        sql = (
+            f'INSERT INTO {table} ({columns}) VALUES ({", ".join(["%s"] * len(fields))}) '
+            f'ON CONFLICT ({quote_name(meta.get_field("cart").column)}, {quote_name(meta.get_field("product").column)}) '
+            f'DO UPDATE SET {quantity_column} = {table}.{quantity_column} + EXCLUDED.{quantity_column} '
+            f'RETURNING {quote_name(meta.pk.column)}, {quantity_column}'
+        )
+        
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            item_id, new_quantity = cursor.fetchone()
+        
+        self.invalidate_summary(cart.user_id)
+        
+        # The existing items have a positive quantity, so only a new item has exactly the added quantity
+        return meta.pk.to_python(item_id), new_quantity, new_quantity == quantity
+    
+    
+    def increase_quantity(self, user, product_id, amount=1):
+        """
+        Increases the quantity of a product in the cart of the user with a single UPDATE
+        (quantity = quantity + amount, keyed by the user's cart and the product) and
+        returns the new quantity, or None if the product is not in the cart.
+        """
+        
+        connection = self.get_connection()
+        
+        new_quantity = self.update_quantity(connection, user, product_id, '+', amount)
+        
+        if new_quantity is not None:
+            self.invalidate_summary(user.pk)
+        
+        return new_quantity
+    
+    
+    def decrease_quantity(self, user, product_id, amount=1):
+        """
+        Decreases the quantity of a product in the cart of the user and returns the new
+        quantity: 0 if the item has been deleted, None if the product is not in the cart.
+        
+        An item whose quantity would drop to zero (or below) is deleted instead. On
+        PostgreSQL both cases are a single statement (see decrease_or_delete). SQLite can't
+        modify rows in a WITH clause, there the usual case costs one statement, UPDATE ...
+        WHERE quantity > amount, and when it matches nothing DELETE ... WHERE quantity <=
+        amount removes the item. A concurrent change of the item (e.g. an increase) can make
+        the statements miss, they are then tried again.
+        """
+        
+        connection = self.get_connection()
+        
+        for attempt in range(3):
+            if connection.vendor == 'postgresql':
+                new_quantity = self.decrease_or_delete(connection, user, product_id, amount)
+            else:
+                new_quantity = self.update_quantity(connection, user, product_id, '-', amount)
+                
+                if new_quantity is None and self.delete_item(connection, user, product_id, max_quantity=amount):
+                    new_quantity = 0
+            
+            if new_quantity is not None:
+                self.invalidate_summary(user.pk)
+                return new_quantity
+            
+            # Nothing matched: the item doesn't exist, unless it just changed
+            if not self.filter(cart__user=user, product_id=product_id).exists():
+                return None
+        
+        return None
+    
+    
+    def decrease_or_delete(self, connection, user, product_id, amount):
+        """
+        Subtracts the amount from the quantity of the item, or deletes the item if its
+        quantity would not stay positive, with a single statement (PostgreSQL only):
+        
+            WITH deleted AS (DELETE ... WHERE quantity <= amount RETURNING 0),
+                 updated AS (UPDATE ... WHERE quantity > amount RETURNING quantity)
+            SELECT ... FROM deleted UNION ALL SELECT ... FROM updated
+        
+        Returns the new quantity, 0 if the item has been deleted, or None if no row matched.
+        """
+        
+        meta = self.model._meta
+        quote_name = connection.ops.quote_name
+        table = quote_name(meta.db_table)
+        quantity_column = quote_name(meta.get_field('quantity').column)
+        
+        condition, params = self.item_condition(connection, user, product_id)
+        
+        sql = (
+            f'WITH deleted AS (DELETE FROM {table} WHERE {condition} AND {quantity_column} <= %s '
+            f'RETURNING 0 AS {quantity_column}), '
+            f'updated AS (UPDATE {table} SET {quantity_column} = {quantity_column} - %s '
+            f'WHERE {condition} AND {quantity_column} > %s RETURNING {quantity_column}) '
+            f'SELECT {quantity_column} FROM deleted UNION ALL SELECT {quantity_column} FROM updated'
+        )
+        
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*params, amount, amount, *params, amount])
+            row = cursor.fetchone()
+        
+        return row[0] if row is not None else None
+    
+    
+    def item_condition(self, connection, user, product_id) -> tuple:
+        """
+        Returns the WHERE clause (and its parameters) that selects the item of the product
+        in the cart of the user, without fetching the cart first.
+        """
+        
+        meta = self.model._meta
+        cart_meta = Cart._meta
+        quote_name = connection.ops.quote_name
+        
+        product_field = meta.get_field('product')
+        user_field = cart_meta.get_field('user')
+        
+        sql = (
+            f'{quote_name(product_field.column)} = %s AND {quote_name(meta.get_field("cart").column)} = '
+            f'(SELECT {quote_name(cart_meta.pk.column)} FROM {quote_name(cart_meta.db_table)} WHERE {quote_name(user_field.column)} = %s)'
+        )
+        params = [product_field.get_db_prep_save(product_id, connection), user_field.get_db_prep_save(user.pk, connection)]
+        
+        return sql, params
+    
+    
+    def update_quantity(self, connection, user, product_id, operator, amount):
+        """
+        Adds (operator '+') or subtracts ('-') the amount from the quantity of the item and
+        returns the new quantity, or None if no row matched. A subtraction only matches an
+        item whose quantity stays positive.
+        """
+        
+        meta = self.model._meta
+        quote_name = connection.ops.quote_name
+        quantity_column = quote_name(meta.get_field('quantity').column)
+        
+        condition, params = self.item_condition(connection, user, product_id)
+        
+        if operator == '-':
+            condition += f' AND {quantity_column} > %s'
+            params.append(amount)
+        
+        sql = (
+            f'UPDATE {quote_name(meta.db_table)} SET {quantity_column} = {quantity_column} {operator} %s '
+            f'WHERE {condition} RETURNING {quantity_column}'
+        )
+        
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [amount, *params])
+            row = cursor.fetchone()
+        
+        return row[0] if row is not None else None
+    
+    
+    def delete_item(self, connection, user, product_id, max_quantity=None) -> bool:
+        """
+        Deletes the item with a single DELETE, only if its quantity is at most max_quantity
+        (when given). Returns True if it has been deleted.
+        """
+        
+        meta = self.model._meta
+        quote_name = connection.ops.quote_name
+        
+        condition, params = self.item_condition(connection, user, product_id)
+        
+        if max_quantity is not None:
+            condition += f' AND {quote_name(meta.get_field("quantity").column)} <= %s'
+            params.append(max_quantity)
+        
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {quote_name(meta.db_table)} WHERE {condition}', params)
+            return cursor.rowcount > 0
+    
+    
+    def remove_from_cart(self, cart, product_ids) -> int:
+        """
+        Deletes the items of the products from the cart with a single DELETE and returns
+        the number of deleted items. Unlike QuerySet.delete(), the items are not fetched
+        first and no signal is sent, the caller invalidates the cart summary.
+        """
+        
+        connection = self.get_connection()
+        
+        meta = self.model._meta
+        quote_name = connection.ops.quote_name
+        
+        cart_field = meta.get_field('cart')
+        product_field = meta.get_field('product')
+        
+        sql = (
+            f'DELETE FROM {quote_name(meta.db_table)} WHERE {quote_name(cart_field.column)} = %s '
+            f'AND {quote_name(product_field.column)} IN ({", ".join(["%s"] * len(product_ids))})'
+        )
+        params = [cart_field.get_db_prep_save(cart.pk, connection)]
+        params += [product_field.get_db_prep_save(product_id, connection) for product_id in product_ids]
+        
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+    
+    
+    def invalidate_summary(self, user_id):
+        """Bumps the version of the cart of the user (see cart/cache.py), the raw statements don't send the signals."""
+        
+        from .cache import invalidate_cart_summary # Imported here to avoid a circular import
+        invalidate_cart_summary(user_id)
+
+
 class CartItem(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='cart_items')
@@ -55,16 +331,36 @@ class CartItem(models.Model):
     added_at = models.DateField(default=timezone.now)
     
     
+    objects = CartItemManager()
+    
+    
     class Meta:
         constraints = [
             # Check constraint to ensure quantity field is greater then zero.
-            models.CheckConstraint(check=models.Q(quantity__gt=0), name='quantity_positive')
+            models.CheckConstraint(check=models.Q(quantity__gt=0), name='quantity_positive'),
+            
+            # A product appears once per cart, adding it again increases the quantity (see add_to_cart)
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
         ]
     
     def __str__(self):
         """Return a human-readable string representation of the Plant object."""
         return self.product.name
     
+    @staticmethod
+    def get_totals_aggregates() -> dict:
+        """Returns the aggregate expressions of the cart totals (see Cart.get_totals)."""
+        
+        return {
+            'total_cart_price': Coalesce(
+                Sum(F('product__price') * F('quantity'), output_field=TOTAL_PRICE_FIELD),
+                Value(Decimal('0.00')),
+                output_field=TOTAL_PRICE_FIELD
+            ),
+            'total_items_count': Coalesce(Sum('quantity'), 0),
+            'items_count': Count('id'),
+        }
+    
     def get_total_price(self):
         """Calculates and returns total sum of the cart item."""
         
@@ -77,12 +373,8 @@ class CartItem(models.Model):
         if self.quantity < 0:
             raise ValidationError('The quantity field cannot be negative.')
         
-        
-        # Only raise an error if we're creating a new CartItem, not updating quantity
-        if self.pk is None:  # Only perform this check for new items (not when updating quantity)
-            # Ensure that the same product is not added twice to the cart
-            if CartItem.objects.filter(cart=self.cart, product=self.product).exists():
-                raise ValidationError('The product is already in your cart.')
+        # The same product can't be added twice to the cart: that's enforced by the
+        # unique_cart_product constraint, without a query before every insert.
         
     
     def save(self, *args, **kwargs):
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_cart_summary
+from .models import Cart, CartItem
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def cart_item_changed(sender, instance, **kwargs):
+    """Invalidate the cached summary of the cart that holds the item."""
+
+    try:
+        # The cart is usually cached on the item by the code that changed it
+        user_id = instance.cart.user_id
+    except Cart.DoesNotExist:
+        return # The cart is being deleted with its items
+
+    invalidate_cart_summary(user_id)
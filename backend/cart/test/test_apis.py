@@ -1,5 +1,6 @@
 from rest_framework.test import APIClient
 from rest_framework import status
+from django.db import connection
 from django.urls import reverse
 
 from inventory.test.base_test import FileUploadTestCase
@@ -25,6 +26,8 @@ class CartItemsListAPITest(FileUploadTestCase):
         - Test the behavior when the cart is empty.
         - Test the behavior when the Cart object does not exist.
         - Test that the API endpoint successfully returns data.
+        - Test that the totals are computed by the database.
+        - Test that the number of queries doesn't depend on the size of the cart.
     """
     
     
@@ -150,7 +153,298 @@ class CartItemsListAPITest(FileUploadTestCase):
         self.assertIn('image', data['items'][0]['product'])
         
         
+    def test_cart_totals(self):
+        """Test that the totals are computed by the database with the values of the items."""
+        
+        CartItem.objects.filter(product=self.plant_obj1).update(quantity=3)
+        
+        # Login user
+        self.client.force_authenticate(user=self.user)
+        
+        data = self.client.get(self.url).json()
+        
+        self.assertEqual(data['total_cart_price'], 61.40) # 3 * 15.00 + 12.90 + 3.50
+        self.assertEqual(data['total_items_count'], 5)
+        
+        
+    def test_constant_number_of_queries(self):
+        """Test that the number of queries doesn't depend on the number of items in the cart."""
+        
+        # Login user
+        self.client.force_authenticate(user=self.user)
+        
+        # The cart, the totals and the items with their plants
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        
+        self.assertEqual(len(response.json()['items']), 3)
+        
+        # Add more plants to the cart
+        for number in range(7):
+            plant = Plant.objects.create(name=f'Plant {number}', price=5.00, image=self.create_valid_image())
+            CartItem.objects.create(cart=self.cart, product=plant, quantity=2)
+        
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        
+        self.assertEqual(len(response.json()['items']), 10)
+        self.assertEqual(response.json()['total_items_count'], 17)
+        
+        
+    def test_empty_cart_number_of_queries(self):
+        """Test that an empty cart is answered after the aggregate query."""
+        
+        self.cart.cart_items.all().delete()
+        
+        # Login user
+        self.client.force_authenticate(user=self.user)
+        
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        
+        self.assertEqual(response.json(), {'message': 'Your cart is empty.'})
+        
+        
+    
+class CartSummaryAPITest(FileUploadTestCase):
+    """
+    Test the functionality of the CartSummaryAPI endpoint (navbar badge).
+    
+    Tests:
+        - Test access restrictions for unauthenticated users.
+        - Test that the summary holds the counts and the total.
+        - Test that the summary is served from the cache.
+        - Test that the summary is invalidated by the changes of the cart and of the prices.
+        - Test that a change made by another worker (with its own cache) invalidates the summary.
+        - Test the summary of a user without a cart.
+    """
+    
+    
+    def setUp(self):
+        
+        super().setUp()  # Call the setUp of FileUploadTestCase to handle media root setup
+        
+        self.client = APIClient()
+        self.url = reverse('cart-summary')
+        
+        self.user = User.objects.create_user(name='test_name', email='test@test.com', password='a12a14t56')
+        self.client.force_authenticate(user=self.user)
+        
+        self.rosa = Plant.objects.create(name='Rosa', price=15.00, image=self.create_valid_image())
+        self.violet = Plant.objects.create(name='Violet', price=12.90, image=self.create_valid_image())
+        
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.rosa, quantity=2)
+        
+        
+    def test_access_restriction_for_unauthenticated_user(self):
+        """Test that unauthenticated users can't access the summary."""
+        
+        self.client.force_authenticate(user=None)
+        
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+        
+        
+    def test_summary(self):
+        """Test that the summary holds the number of items, of lines and the total price."""
+        
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'total_cart_price': 30.0, 'total_items_count': 2, 'items_count': 1})
+        
+        
+    def test_summary_is_cached(self):
+        """Test that the summary is served from the cache, only the versions (part of the key) are queried."""
+        
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        
+        self.assertEqual(response.json()['total_items_count'], 2)
+        
+        
+    def test_invalidation_on_cart_changes(self):
+        """Test that every change of the cart invalidates the summary."""
+        
+        self.client.get(self.url) # Cache the summary
+        
+        self.client.post(reverse('add-cart-item'), {'plant_id': str(self.violet.id)})
+        self.assertEqual(self.client.get(self.url).json()['items_count'], 2)
+        
+        self.client.patch(reverse('increase-cart-item-quantity', kwargs={'id': self.violet.id}))
+        self.assertEqual(self.client.get(self.url).json()['total_items_count'], 4)
+        
+        self.client.patch(reverse('decrease-cart-item-quantity', kwargs={'id': self.rosa.id}))
+        self.assertEqual(self.client.get(self.url).json()['total_items_count'], 3)
+        
+        self.client.delete(reverse('delete-cart-item', kwargs={'id': self.violet.id}))
+        self.assertEqual(self.client.get(self.url).json(), {'total_cart_price': 15.0, 'total_items_count': 1, 'items_count': 1})
+        
+        
+    def test_invalidation_on_price_change(self):
+        """Test that a change of the catalog invalidates the total."""
+        
+        self.client.get(self.url) # Cache the summary
+        
+        self.rosa.price = 10
+        self.rosa.save()
+        
+        self.assertEqual(self.client.get(self.url).json()['total_cart_price'], 20.0)
+        
+        
+    def test_invalidation_by_another_worker(self):
+        """Test that a change of the cart served by another worker invalidates the summary cached by this one."""
+        
+        self.client.get(self.url) # Cache the summary
+        
+        # Another worker
+        with self.separate_process_cache('CART_CACHE_ALIAS'):
+            self.client.patch(reverse('increase-cart-item-quantity', kwargs={'id': self.rosa.id}))
+        
+        self.assertEqual(self.client.get(self.url).json()['total_items_count'], 3)
+        
+        
+    def test_user_without_cart(self):
+        """Test that a user without a cart gets a summary of zeros."""
+        
+        self.cart.delete()
+        
+        self.assertEqual(self.client.get(self.url).json(), {'total_cart_price': 0.0, 'total_items_count': 0, 'items_count': 0})
+        
+        
     
+class CartBatchAPITest(FileUploadTestCase):
+    """
+    Test the functionality of the CartBatchAPI endpoint.
+    
+    Tests:
+        - Test access restrictions for unauthenticated users.
+        - Test that the operations are applied in order and the summary is returned.
+        - Test that the batch costs a fixed number of queries.
+        - Test that an invalid batch is rejected as a whole.
+        - Test the validation of the list of operations.
+        - Test the behavior when the Cart object does not exist.
+    """
+    
+    
+    def setUp(self):
+        
+        super().setUp()  # Call the setUp of FileUploadTestCase to handle media root setup
+        
+        self.client = APIClient()
+        self.url = reverse('cart-batch')
+        
+        self.user = User.objects.create_user(name='test_name', email='test@test.com', password='a12a14t56')
+        self.client.force_authenticate(user=self.user)
+        
+        self.rosa = Plant.objects.create(name='Rosa', price=15.00, image=self.create_valid_image())
+        self.violet = Plant.objects.create(name='Violet', price=12.90, image=self.create_valid_image())
+        self.tulip = Plant.objects.create(name='Tulip', price=5.00, image=self.create_valid_image())
+        
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.rosa, quantity=2)
+        CartItem.objects.create(cart=self.cart, product=self.violet, quantity=3)
+        
+        
+    def get_quantities(self) -> dict:
+        """Return {plant name: quantity} of the items of the cart."""
+        
+        return dict(self.cart.cart_items.values_list('product__name', 'quantity'))
+        
+        
+    def test_access_restriction_for_unauthenticated_user(self):
+        """Test that unauthenticated users can't apply operations."""
+        
+        self.client.force_authenticate(user=None)
+        
+        response = self.client.post(self.url, {'operations': [{'plant_id': str(self.rosa.id), 'op': 'add'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        
+    def test_operations(self):
+        """Test that the operations are applied in order and that the response is the new summary."""
+        
+        self.client.get(reverse('cart-summary')) # Cache the summary
+        
+        operations = [
+            {'plant_id': str(self.tulip.id), 'op': 'add', 'quantity': 2},
+            {'plant_id': str(self.tulip.id), 'op': 'subtract'},
+            {'plant_id': str(self.rosa.id), 'op': 'set', 'quantity': 4},
+            {'plant_id': str(self.violet.id), 'op': 'subtract', 'quantity': 5}, # Dropping below zero deletes the item
+        ]
+        response = self.client.post(self.url, {'operations': operations}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'total_cart_price': 65.0, 'total_items_count': 5, 'items_count': 2})
+        self.assertEqual(self.get_quantities(), {'Rosa': 4, 'Tulip': 1})
+        
+        # The cached summary has been invalidated
+        self.assertEqual(self.client.get(reverse('cart-summary')).json(), response.json())
+        
+        response = self.client.post(self.url, {'operations': [{'plant_id': str(self.rosa.id), 'op': 'remove'}]}, format='json')
+        self.assertEqual(self.get_quantities(), {'Tulip': 1})
+        
+        
+    def test_number_of_queries(self):
+        """Test that the number of queries doesn't depend on the number of operations."""
+        
+        operations = [
+            {'plant_id': str(plant.id), 'op': op}
+            for plant in (self.rosa, self.violet, self.tulip)
+            for op in ('add', 'add', 'subtract')
+        ] + [{'plant_id': str(self.violet.id), 'op': 'set', 'quantity': 0}]
+        
+        # The plants, the cart, the items, the upsert, the delete, the bump of the cart version (key
+        # of the cached summary), the summary, and the savepoint (created and released)
+        with self.assertNumQueries(9):
+            response = self.client.post(self.url, {'operations': operations}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_quantities(), {'Rosa': 3, 'Tulip': 1})
+        
+        
+    def test_invalid_batch_is_not_applied(self):
+        """Test that the errors are reported by position and that nothing is applied."""
+        
+        operations = [
+            {'plant_id': str(self.rosa.id), 'op': 'add'},
+            {'plant_id': 'not-a-uuid', 'op': 'add'},
+            {'plant_id': str(self.rosa.id), 'op': 'double'},
+            {'plant_id': str(self.rosa.id), 'op': 'set', 'quantity': 101},
+            {'plant_id': str(self.rosa.id), 'op': 'add', 'quantity': True},
+            {'plant_id': '00000000-0000-0000-0000-000000000000', 'op': 'add'},
+        ]
+        response = self.client.post(self.url, {'operations': operations}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1, 2, 3, 4, 5])
+        self.assertEqual(self.get_quantities(), {'Rosa': 2, 'Violet': 3})
+        
+        
+    def test_invalid_operations_list(self):
+        """Test that the operations must be a non-empty list of at most max_operations items."""
+        
+        for data in ({}, {'operations': []}, {'operations': 'add'}):
+            response = self.client.post(self.url, data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+        
+        operations = [{'plant_id': str(self.rosa.id), 'op': 'add'}] * 201
+        response = self.client.post(self.url, {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        
+    def test_cart_object_does_not_exist(self):
+        """Test the behavior when the user has no cart."""
+        
+        self.cart.delete()
+        
+        response = self.client.post(self.url, {'operations': [{'plant_id': str(self.rosa.id), 'op': 'add'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        
+        
 class AddCartItemAPITest(FileUploadTestCase):
     """
     Test case for verifying the functionalities of the API endpoint.
@@ -167,6 +461,8 @@ class AddCartItemAPITest(FileUploadTestCase):
         - Test the behavior it the Plant object does not exist.
         - Test the behavior when the plant is already added to the cart.
         - Test successful creation of the cart item.
+        - Test adding a quantity, with a constant number of queries.
+        - Test the validation of the quantity.
     """
     
     def setUp(self):
@@ -254,10 +550,48 @@ class AddCartItemAPITest(FileUploadTestCase):
 
         # Trying to create a CartItem that already exists
         # Make a POST request to the add-cart-item API endpoint
-        response = self.client.post(self.url, {'product_id': str(self.plant.id)})
+        response = self.client.post(self.url, {'plant_id': str(self.plant.id)})
 
-        # Ensure that the CartItem object hasn't been created again.
+        # Ensure that the CartItem object hasn't been created again, its quantity has been increased.
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(self.cart.cart_items.all().count(), 1)
+        self.assertEqual(response.data, {'id': self.cart_item.id, 'quantity': 2})
+        
+        self.cart_item.refresh_from_db()
+        self.assertEqual(self.cart_item.quantity, 2)
+
+
+    def test_add_quantity(self):
+        """Ensure that a new product is added with the requested quantity, in a constant number of queries."""
+
+        # Login user to avoid restrictions
+        self.client.force_authenticate(user=self.user)
+
+        new_plant = Plant.objects.create(name='Violet', price=17.15, image=self.create_valid_image())
+
+        # The cart, the plant, the upsert and the bump of the cart version (key of the cached summary)
+        with self.assertNumQueries(4):
+            response = self.client.post(self.url, {'plant_id': str(new_plant.id), 'quantity': 3})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(CartItem.objects.get(cart=self.cart, product=new_plant).quantity, 3)
+
+        response = self.client.post(self.url, {'plant_id': str(new_plant.id), 'quantity': 2})
+        self.assertEqual(response.data['quantity'], 5)
+
+
+    def test_invalid_quantity(self):
+        """Ensure that the quantity must be an integer between 1 and the maximum."""
+
+        # Login user to avoid restrictions
+        self.client.force_authenticate(user=self.user)
+
+        for quantity in (0, -1, 'two', 101):
+            response = self.client.post(self.url, {'plant_id': str(self.plant.id), 'quantity': quantity})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, quantity)
+
+        self.cart_item.refresh_from_db()
+        self.assertEqual(self.cart_item.quantity, 1)
 
 
     def test_successful_creation_of_cart_item(self):
@@ -420,6 +754,8 @@ class IncreaseQuantityAPITest(FileUploadTestCase):
         - Test the behavior when the Plant object does not exist in the database.
         - Test the behavior when the CartItem object does not exist in the database.
         - Test the successful increase in the quantity of the CartItem object.
+        - Test that the increase is a single statement.
+        - Test that the items of the other carts are not changed.
     """
 
     def setUp(self):
@@ -536,6 +872,34 @@ class IncreaseQuantityAPITest(FileUploadTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 
+    def test_single_statement(self):
+        """Make sure that the quantity is increased by a single UPDATE which returns the new quantity."""
+
+        # Login user to avoid access restrictions
+        self.client.force_authenticate(user=self.user)
+
+        # The UPDATE and the bump of the cart version (key of the cached summary)
+        with self.assertNumQueries(2):
+            response = self.client.patch(self.url)
+
+        self.assertEqual(response.data, {'quantity': 2})
+
+
+    def test_other_carts_are_not_changed(self):
+        """Make sure that only the item of the user's cart is increased."""
+
+        # Another user with the same plant in the cart
+        other_user = User.objects.create_user(name='other', email='other@test.com', password='a12a14t56')
+        other_item = CartItem.objects.create(cart=Cart.objects.create(user=other_user), product=self.plant, quantity=4)
+
+        # Login user to avoid access restrictions
+        self.client.force_authenticate(user=self.user)
+        self.client.patch(self.url)
+
+        other_item.refresh_from_db()
+        self.assertEqual(other_item.quantity, 4)
+
+
 class DecreaseQuantityAPITest(FileUploadTestCase):
     """
     Test case for verifying the functionalities of the DecreaseQuantityAPITest endpoint.
@@ -554,6 +918,7 @@ class DecreaseQuantityAPITest(FileUploadTestCase):
         - Test the behavior when the quantity of the CartItem is equal to 1.
           It should remove the CartItem.
         - Test the successful decrease in the quantity of the CartItem object.
+        - Test the number of statements of a decrease and of a deletion.
     """
 
     def setUp(self):
@@ -687,4 +1052,28 @@ class DecreaseQuantityAPITest(FileUploadTestCase):
         self.assertEqual(self.cart_item.quantity, initial_quantity - 1)
 
         # Assert the status code is 200 (OK)
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+    def test_statements(self):
+        """
+        Make sure that a decrease is a single statement, and a deletion too on PostgreSQL
+        (an UPDATE that misses and a DELETE elsewhere).
+        """
+
+        # Login user to avoid access restrictions
+        self.client.force_authenticate(user=self.user)
+
+        # The UPDATE and the bump of the cart version (key of the cached summary)
+        with self.assertNumQueries(2):
+            response = self.client.patch(self.url)
+
+        self.assertEqual(response.data, {'quantity': 4})
+
+        CartItem.objects.filter(id=self.cart_item.id).update(quantity=1)
+
+        with self.assertNumQueries(2 if connection.vendor == 'postgresql' else 3):
+            response = self.client.patch(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(CartItem.objects.filter(id=self.cart_item.id).exists())
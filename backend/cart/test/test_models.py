@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from django.test import TestCase
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError
@@ -29,6 +31,7 @@ class CartModelTest(FileUploadTestCase):
         - Test the related_name for the user field.
         - Test that the get_total method is working correctly.
         - Test that the get_items_count is working correctly.
+        - Test that the get_totals method uses a single query.
         - Test that the __str__ method represents objects correctly.
         - Test the cart deletion on user deletion.
         - Test that the user has only one cart.
@@ -124,6 +127,18 @@ class CartModelTest(FileUploadTestCase):
         # Test that the number of items in the cart is 4.
         self.assertEqual(self.test_cart1.get_items_count(), 4)
         
+        
+    def test_get_totals(self):
+        """Ensure that the get_totals method computes every total with a single query."""
+        
+        with self.assertNumQueries(1):
+            totals = self.test_cart1.get_totals()
+        
+        self.assertEqual(totals, {'total_cart_price': Decimal('48.49'), 'total_items_count': 4, 'items_count': 2})
+        
+        # An empty cart has zero totals (not None)
+        self.assertEqual(self.test_cart2.get_totals(), {'total_cart_price': Decimal('0.00'), 'total_items_count': 0, 'items_count': 0})
+        
     
     def test_str_method(self):
         """Ensure that the __str__ method represents a Cart object in a human-readable way."""
@@ -176,6 +191,9 @@ class CartItemTest(FileUploadTestCase):
         - Test that the get_total_price method is working correctly
         - Test that the __str__ method represents objectes correctly.
         - Test the CartItem object deletion on the Plant or Cart objects deletion.
+        - Test that a product is stored only once per cart.
+        - Test that add_to_cart creates or increments the item with a single query.
+        - Test increase_quantity and decrease_quantity.
     """
     
     
@@ -297,6 +315,42 @@ class CartItemTest(FileUploadTestCase):
         self.assertEqual(str(self.test_cart_item1), self.test_plant1.name) 
 
 
+    def test_product_is_unique_per_cart(self):
+        """Ensure that the same product can't be stored twice in a cart."""
+        
+        with self.assertRaises(IntegrityError):
+            CartItem.objects.create(cart=self.test_cart1, product=self.test_plant1)
+        
+        
+    def test_add_to_cart(self):
+        """Ensure that add_to_cart creates the item or increases its quantity with a single statement."""
+        
+        # The upsert and the bump of the cart version (key of the cached summary)
+        with self.assertNumQueries(2):
+            item_id, quantity, created = CartItem.objects.add_to_cart(self.test_cart2, self.test_plant2, 2)
+        
+        self.assertEqual((quantity, created), (2, True))
+        self.assertEqual(CartItem.objects.get(id=item_id).quantity, 2)
+        
+        item_id, quantity, created = CartItem.objects.add_to_cart(self.test_cart2, self.test_plant2)
+        
+        self.assertEqual((quantity, created), (3, False))
+        self.assertEqual(CartItem.objects.filter(cart=self.test_cart2, product=self.test_plant2).count(), 1)
+        
+        
+    def test_increase_and_decrease_quantity(self):
+        """Ensure that the quantity changes in place, that an item dropping to zero is deleted and that a missing item returns None."""
+        
+        self.assertEqual(CartItem.objects.increase_quantity(self.test_user1, self.test_plant1.id, 2), 5)
+        self.assertEqual(CartItem.objects.decrease_quantity(self.test_user1, self.test_plant1.id, 4), 1)
+        self.assertEqual(CartItem.objects.decrease_quantity(self.test_user1, self.test_plant1.id, 3), 0)
+        self.assertFalse(CartItem.objects.filter(id=self.test_cart_item1.id).exists())
+        
+        # The item is no longer in the cart, and test_user2 never had it
+        self.assertIsNone(CartItem.objects.decrease_quantity(self.test_user1, self.test_plant1.id))
+        self.assertIsNone(CartItem.objects.increase_quantity(self.test_user2, self.test_plant2.id))
+        
+        
     def test_cart_item_deletion_on_cart_deletion(self):
         """Test that the CartItem object is deleted when the cart object is deleted."""
         
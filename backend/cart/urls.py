@@ -1,8 +1,10 @@
 from django.urls import path
-from .apis import CartItemListAPI, AddCartItemAPI, DeleteCartItemAPI, IncreaseQuantityAPI, DecreaseQuantityAPI
+from .apis import CartItemListAPI, CartSummaryAPI, CartBatchAPI, AddCartItemAPI, DeleteCartItemAPI, IncreaseQuantityAPI, DecreaseQuantityAPI
 
 urlpatterns = [
     path('', CartItemListAPI.as_view(), name='cart-items-list'),
+    path('summary/', CartSummaryAPI.as_view(), name='cart-summary'),
+    path('batch/', CartBatchAPI.as_view(), name='cart-batch'),
     path('add/item/', AddCartItemAPI.as_view(), name='add-cart-item'),
     path('remove/item/<uuid:id>/', DeleteCartItemAPI.as_view(), name='delete-cart-item'),
     path('item/increase-quantity/<uuid:id>/', IncreaseQuantityAPI.as_view(), name='increase-cart-item-quantity'),
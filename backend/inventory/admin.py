@@ -1,6 +1,25 @@
 from django.contrib import admin
 from .models import Plant
+from .forms import PlantAdminForm
 
 # Register your models here.
 
-admin.site.register(Plant) # Add the Plant model to the django admin panel
\ No newline at end of file
+
+class PlantAdmin(admin.ModelAdmin):
+    """Admin pages of the Plant model, the uploads are validated without decoding the image."""
+
+    form = PlantAdminForm
+
+
+    def get_form(self, request, obj=None, change=False, **kwargs):
+        """Return the form class, with the files dropped from the request by MaxSizeUploadHandler."""
+
+        form = super().get_form(request, obj, change, **kwargs)
+
+        # The class is created for this request, so the attribute isn't shared with other requests
+        form.oversized_files = getattr(request, 'oversized_files', {})
+
+        return form
+
+
+admin.site.register(Plant, PlantAdmin) # Add the Plant model to the django admin panel
\ No newline at end of file
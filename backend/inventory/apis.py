@@ -1,35 +1,83 @@
+import re
+import uuid
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.exceptions import ValidationError
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
 
 
 from .models import Plant
-from .serializers import PlantSerializer
+from .serializers import PlantSerializer, PlantListSerializer
+from .pagination import PlantCursorPagination, PlantSearchPagination
+from .filters import PlantFilterBackend, PlantOrderingFilter
+from .search import search_plants
+from .facets import get_plant_facets
+from .autocomplete import plant_name_index
+from .cache import CatalogCacheMixin
+from .conditional import conditional_get, make_etag, set_validators
+from .stock import MAX_STOCK_ADJUSTMENTS, StockConflict, apply_stock_adjustments
+from .exports import EXPORT_TYPES, export_plants
 
 
-class PlantListAPI(APIView):
+class PlantListAPI(CatalogCacheMixin, APIView):
     """
     Handles GET requests and returns a list of Plant objects. 
+    
+    The plants can be filtered and sorted with the query parameters described in
+    PlantFilterBackend and PlantOrderingFilter.
+    
+    If the request contains the 'cursor' or 'page_size' query parameter, the plants
+    are returned one page at a time using keyset pagination (see PlantCursorPagination),
+    otherwise the whole catalog is returned in a single response.
+    
+    The rendered responses are cached under the current catalog version and can be
+    revalidated with conditional requests (see CatalogCacheMixin).
     """
     
     permission_classes = [AllowAny] # Allow access for all users
+    pagination_class = PlantCursorPagination
+    filter_backends = [PlantFilterBackend, PlantOrderingFilter]
+    cache_namespace = 'plant-list'
     
     def get(self, request, *args, **kwargs):
+        """Return a 304 or the cached response if possible, otherwise build and cache the response."""
+        
+        return self.get_catalog_response(request, self.list)
+    
+    
+    def list(self, request):
         """Retrieve the Plant objects from the database and return them as a JSON response."""
         
         plants = Plant.objects.all() # Retrieve all the objects from the database
         
+        # Apply the filters and the ordering passed in the query parameters
+        for backend in self.filter_backends:
+            plants = backend().filter_queryset(request, plants, self)
         
-        # Return 404 if no plants are found, otherwise return serialized data
-        if not plants:
-            return Response({'detail': 'No plants found.'}, status=status.HTTP_404_NOT_FOUND)
+        # Return a single page of plants if the client asked for it
+        paginator = self.pagination_class()
+        if paginator.is_requested(request):
+            page = paginator.paginate_queryset(PlantListSerializer.get_rows(plants), request, view=self)
+            serializer = PlantListSerializer(page)
+            
+            return paginator.get_paginated_response(serializer.data)
         
-        # Serialize the data to convert it into JSON format
-        serializer = PlantSerializer(plants, many=True)
+        # Serialize the data to convert it into JSON format. The list is read as plain rows
+        # (see PlantListSerializer), which is a lot faster than PlantSerializer(many=True).
+        serializer = PlantListSerializer(PlantListSerializer.get_rows(plants))
+        data = serializer.data
         
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Return 404 if the catalog is empty, otherwise return serialized data (an empty list
+        # when the filters match no plant, the sidebar shows "no results" for them)
+        if not data and not Plant.objects.exists():
+            return Response({'detail': 'No plants found.'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response(data, status=status.HTTP_200_OK)
 
 
 class PlantDetailAPI(APIView):
@@ -39,6 +87,9 @@ class PlantDetailAPI(APIView):
     This API endpoint allows clients to retrieve a detailed view of a specific plant 
     using its UUID. It supports a GET request where the plant's unique id is 
     passed as a URL parameter. The response returns the plant's attributes in JSON format.
+    
+    The response carries an ETag and a Last-Modified header derived from the updated_at
+    column, a conditional request for an unchanged plant gets an empty 304 response.
     """
     
     permission_classes = [AllowAny] # Allow access for all users
@@ -50,7 +101,295 @@ class PlantDetailAPI(APIView):
         # Retrieve the object from the database
         plant = get_object_or_404(Plant, id=id)
         
+        # Skip the serialization if the client already has the current version of the plant
+        etag = make_etag('plant', plant.id, plant.updated_at.isoformat())
+        last_modified = int(plant.updated_at.timestamp())
+        
+        not_modified = conditional_get(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        
         # Serialize the plant object into a JSON response
         serializer = PlantSerializer(plant)
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        
+        return set_validators(response, etag, last_modified)
+
+
+class PlantBatchAPI(CatalogCacheMixin, APIView):
+    """
+    PlantBatchAPI returns the details of several plants identified by their UUIDs.
+    
+    The UUIDs are passed in the 'ids' query parameter, separated by commas
+    (e.g. ?ids=<uuid>,<uuid>) or as repeated parameters. All the plants are read with
+    a single query, so a page that shows many specific plants (cart, wishlist, recently
+    viewed) needs one request instead of one request per plant.
+    
+    The response holds the found plants in the order of the request and the ids
+    of the plants that do not exist:
+        {"results": [...], "missing": ["<uuid>", ...]}
+    """
+    
+    permission_classes = [AllowAny] # Allow access for all users
+    cache_namespace = 'plant-batch'
+    
+    max_ids = 100 # Upper limit for the number of ids in a single request
+    
+    
+    def get(self, request, *args, **kwargs):
+        """Return a 304 or the cached response if possible, otherwise build and cache the response."""
+        
+        return self.get_catalog_response(request, self.batch)
+    
+    
+    def batch(self, request):
+        """Retrieve the requested plants and return them in the order of the ids."""
+        
+        ids = self.get_ids(request)
+        
+        rows = PlantListSerializer.get_rows(Plant.objects.filter(id__in=ids))
+        plants = {plant['id']: plant for plant in PlantListSerializer(rows).data}
+        
+        # The serialized ids are strings, look them up with the same representation
+        results = [plants[str(plant_id)] for plant_id in ids if str(plant_id) in plants]
+        missing = [str(plant_id) for plant_id in ids if str(plant_id) not in plants]
+        
+        return Response({'results': results, 'missing': missing}, status=status.HTTP_200_OK)
+    
+    
+    def get_cache_params(self, request) -> dict:
+        """Return the requested ids in a canonical form: without duplicates, in the request order."""
+        
+        return {'ids': ','.join(str(plant_id) for plant_id in self.get_ids(request))}
+    
+    
+    def get_ids(self, request) -> list:
+        """
+        Return the UUIDs passed in the 'ids' query parameter, without duplicates, in the request order.
+        
+        Raises ValidationError if the parameter is missing, holds too many ids (duplicates
+        included) or an invalid UUID.
+        """
+        
+        values = [
+            value.strip()
+            for param in request.query_params.getlist('ids')
+            for value in param.split(',')
+            if value.strip()
+        ]
+        
+        if not values:
+            raise ValidationError({'ids': 'This query parameter is required.'})
+        
+        # Checked before any value is parsed, the duplicates count too
+        if len(values) > self.max_ids:
+            raise ValidationError({'ids': f'Ensure this parameter has no more than {self.max_ids} ids.'})
+        
+        ids = []
+        
+        for value in values:
+            try:
+                ids.append(uuid.UUID(value))
+            except ValueError:
+                raise ValidationError({'ids': f'"{value}" is not a valid UUID.'})
+        
+        # dict.fromkeys() drops the duplicates and keeps the order of the first occurrences
+        return list(dict.fromkeys(ids))
+
+
+class PlantFacetsAPI(CatalogCacheMixin, APIView):
+    """
+    PlantFacetsAPI returns the counts displayed by the catalog sidebar.
+    
+    The response holds the number of plants, the number of plants in stock and on
+    discount, the minimum and maximum price, a price histogram and the rating
+    distribution. Everything is computed with a single aggregate query (see
+    get_plant_facets), optionally restricted by the filters of PlantFilterBackend.
+    
+    The responses are cached under the current catalog version (see CatalogCacheMixin).
+    """
+    
+    permission_classes = [AllowAny] # Allow access for all users
+    filter_backends = [PlantFilterBackend]
+    cache_namespace = 'plant-facets'
+    
+    
+    def get(self, request, *args, **kwargs):
+        """Return a 304 or the cached response if possible, otherwise build and cache the response."""
+        
+        return self.get_catalog_response(request, self.facets)
+    
+    
+    def facets(self, request):
+        """Compute the facets of the plants that match the filters."""
+        
+        plants = Plant.objects.all()
+        
+        # Apply the filters passed in the query parameters
+        for backend in self.filter_backends:
+            plants = backend().filter_queryset(request, plants, self)
+        
+        return Response(get_plant_facets(plants), status=status.HTTP_200_OK)
+
+
+class PlantSearchAPI(APIView):
+    """
+    PlantSearchAPI handles a GET request and returns the plants that match a search query.
+    
+    The query is passed in the 'q' query parameter and is matched against the name and
+    the description of the plants. The results are ordered by relevance and paginated
+    (see PlantSearchPagination). The catalog filters of PlantFilterBackend can be used
+    to narrow down the results.
+    """
+    
+    permission_classes = [AllowAny] # Allow access for all users
+    pagination_class = PlantSearchPagination
+    filter_backends = [PlantFilterBackend]
+    
+    
+    def get(self, request, *args, **kwargs):
+        """Search the plants and return a single page of the results."""
+        
+        query = request.query_params.get('q', '').strip()
+        
+        # The search query is required
+        if not query:
+            raise ValidationError({'q': 'This query parameter is required.'})
+        
+        plants = Plant.objects.all()
+        
+        # Apply the filters passed in the query parameters
+        for backend in self.filter_backends:
+            plants = backend().filter_queryset(request, plants, self)
+        
+        plants = search_plants(plants, query) # Match and rank the plants
+        
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(plants, request, view=self)
+        serializer = PlantSerializer(page, many=True)
+        
+        return paginator.get_paginated_response(serializer.data)
+
+
+class PlantAutocompleteAPI(APIView):
+    """
+    PlantAutocompleteAPI handles a GET request and returns the plants whose name starts
+    with the typed prefix, best rated first.
+    
+    The lookup is answered by the in-memory PlantNameIndex, so the keystrokes of the
+    type-ahead field do not reach the database. The prefix is passed in the 'q' query
+    parameter and the number of suggestions in the 'limit' query parameter.
+    """
+    
+    authentication_classes = [] # No authentication is required
+    permission_classes = [AllowAny] # Allow access for all users
+    
+    default_limit = 10 # Number of suggestions returned when the limit is not provided
+    max_limit = 25 # Upper limit for the limit query parameter
+    
+    
+    def get(self, request, *args, **kwargs):
+        """Return the suggestions for the prefix passed in the query parameters."""
+        
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        
+        limit = max(0, min(limit, self.max_limit)) # Clamp the limit to [0, max_limit]
+        suggestions = plant_name_index.search(request.query_params.get('q', ''), limit)
+        
+        return Response(suggestions, status=status.HTTP_200_OK)
+
+
+class PlantStockAPI(APIView):
+    """
+    PlantStockAPI handles a POST request that adjusts the stock of many plants at once,
+    for the warehouse systems. Only the staff users can access it.
+    
+    Every adjustment identifies a plant by its 'id' or its 'sku' and either adds a
+    'delta' to the stock or sets the 'stock_count':
+        {"adjustments": [{"sku": "MON-1", "delta": -3}, {"id": "<uuid>", "stock_count": 10}]}
+    
+    The batch is applied in one transaction with a couple of statements (see
+    stock.apply_stock_adjustments). The adjustments that can't be applied (unknown
+    plant, negative stock, invalid values) are reported with their position in the
+    batch, the others are applied:
+        {"results": [{"index": 0, "id": "<uuid>", "sku": "MON-1", "stock_count": 12}],
+         "errors": [{"index": 1, "error": "..."}]}
+    
+    A batch that keeps conflicting with concurrent transactions is not applied at all and
+    gets a 409 response, it can be sent again.
+    """
+    
+    permission_classes = [IsAdminUser] # Staff users only
+    
+    max_adjustments = MAX_STOCK_ADJUSTMENTS # Upper limit for the number of adjustments in a single request
+    
+    
+    def post(self, request, *args, **kwargs):
+        """Apply the adjustments and return the new stock of the adjusted plants and the errors."""
+        
+        adjustments = request.data.get('adjustments') if isinstance(request.data, dict) else None
+        
+        if not isinstance(adjustments, list) or not adjustments:
+            raise ValidationError({'adjustments': 'A non-empty list of adjustments is required.'})
+        
+        if len(adjustments) > self.max_adjustments:
+            raise ValidationError({'adjustments': f'Ensure this field has no more than {self.max_adjustments} adjustments.'})
+        
+        try:
+            results, errors = apply_stock_adjustments(adjustments)
+        except StockConflict as error:
+            # Nothing was applied, the client can send the same batch again
+            return Response({'detail': str(error)}, status=status.HTTP_409_CONFLICT)
+        
+        return Response({'results': results, 'errors': errors}, status=status.HTTP_200_OK)
+
+
+class PlantExportAPI(APIView):
+    """
+    PlantExportAPI streams the whole catalog as CSV or JSONL, for the nightly exports of
+    the analytics and the feed partners. Only the staff users can access it.
+    
+    The plants are read in chunks and written to the response as they come (see
+    exports.py), so the memory used doesn't depend on the size of the catalog. The
+    response is gzipped on the fly when the client accepts it.
+    
+    Query parameters:
+        - type: 'csv' (default) or 'jsonl'.
+        - after: id of the last plant received, to resume an interrupted export. The
+          plants are exported in the order of their ids.
+    """
+    
+    permission_classes = [IsAdminUser] # Staff users only
+    
+    accepts_gzip = re.compile(r'\bgzip\b') # Same check as django.middleware.gzip
+    
+    
+    def get(self, request, *args, **kwargs):
+        """Stream the export of the catalog."""
+        
+        export_type = request.query_params.get('type', 'csv')
+        
+        if export_type not in EXPORT_TYPES:
+            raise ValidationError({'type': f'Choose one of: {", ".join(EXPORT_TYPES)}.'})
+        
+        after = request.query_params.get('after')
+        
+        if after is not None:
+            try:
+                after = uuid.UUID(after)
+            except ValueError:
+                raise ValidationError({'after': f'"{after}" is not a valid UUID.'})
+        
+        compress = bool(self.accepts_gzip.search(request.headers.get('Accept-Encoding', '')))
+        
+        response = StreamingHttpResponse(export_plants(export_type, after=after, compress=compress), content_type=EXPORT_TYPES[export_type])
+        response['Content-Disposition'] = f'attachment; filename="plants.{export_type}"'
+        patch_vary_headers(response, ['Accept-Encoding'])
+        
+        if compress:
+            response['Content-Encoding'] = 'gzip'
         
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        return response
@@ -0,0 +1,372 @@
+import heapq
+import logging
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from .cache import bump_version, get_version_state
+
+
+logger = logging.getLogger(__name__)
+
+# Key of the CatalogVersion row bumped by the changes of the plant names and ratings
+PLANT_NAMES_VERSION_KEY = 'plant-names'
+
+
+def get_plant_names_version() -> int:
+    """Return the current version of the plant names, as seen by every process."""
+
+    return get_version_state(PLANT_NAMES_VERSION_KEY)[0]
+
+
+def invalidate_plant_names():
+    """
+    Mark the autocomplete indexes of every process as stale after plants have been
+    created, renamed, re-rated or deleted. Must be called in the transaction of the change.
+
+    The other changes of the catalog (stock, prices, images) don't affect the index and
+    don't call it, so they don't make every process reload the index.
+    """
+
+    bump_version(PLANT_NAMES_VERSION_KEY)
+
+
+class PlantNameIndex:
+    """
+    In-memory sorted prefix index of the plant names used by the autocomplete endpoint.
+
+    Every word of a name is stored as a separate key (the rest of the name starting at
+    that word, case-folded) in a sorted list, so a prefix lookup is a binary search
+    followed by a scan of the adjacent keys. 'fe' matches both "Fern" and "Boston Fern".
+
+    The short prefixes (up to top_prefix_length characters) match a large part of the
+    catalog, scanning their keys on every keystroke would hold the lock for a long time.
+    The best ranked plants of every short prefix are precomputed instead (top_size of
+    them, enough for any limit of the endpoint), and kept up to date by the incremental
+    updates. Only the longer prefixes, which match few keys, are scanned.
+
+    The index is loaded from the database with a single query the first time it is used,
+    then it is kept up to date incrementally by the post_save and post_delete signals of
+    the Plant model (see signals.py). Each process holds its own copy of the index, which
+    remembers the version of the plant names it reflects (see invalidate_plant_names).
+    That version is read from the database at most once every check_interval seconds, not
+    on every keystroke. When it changed without going through this process (another
+    worker, an import, a shell), the index is loaded again.
+    """
+
+    check_interval = 5 # Seconds between two checks of the plant names version
+    top_prefix_length = 3 # Prefixes up to this length are answered from the precomputed rankings
+    top_size = 25 # Number of plants ranked for every short prefix (the max limit of the endpoint)
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._version = None # Version of the plant names of the content, None if it is not tracked
+        self._checked_at = 0 # time.monotonic() of the last check of the version
+
+        # Sorted keys and the ids of the plants they belong to (parallel lists)
+        self._keys = []
+        self._ids = []
+
+        # Plant id -> (name, rating)
+        self._plants = {}
+
+        # Short prefix -> ids of the best ranked plants that match it, best first
+        self._top = {}
+
+
+    @staticmethod
+    def get_keys(name) -> list:
+        """Return the index keys of a plant name: the name starting at every word."""
+
+        folded = name.casefold()
+        keys = []
+
+        for position, char in enumerate(folded):
+            # A word starts at the beginning of the name or right after a space
+            if not char.isspace() and (position == 0 or folded[position - 1].isspace()):
+                keys.append(folded[position:])
+
+        return keys
+
+
+    @classmethod
+    def get_short_prefixes(cls, name) -> set:
+        """Return the short prefixes (see top_prefix_length) matched by a plant name."""
+
+        return {
+            key[:length]
+            for key in cls.get_keys(name)
+            for length in range(1, min(len(key), cls.top_prefix_length) + 1)
+        }
+
+
+    def _rank(self, plant_id) -> tuple:
+        """Return the sort key of a plant: best rated first, the names break the ties."""
+
+        name, rating = self._plants[plant_id]
+
+        return (-rating, name.casefold())
+
+
+    def load(self, rows, version=None):
+        """Replace the content of the index with the given (id, name, rating) rows."""
+
+        plants = {}
+        entries = []
+
+        for plant_id, name, rating in rows:
+            plants[plant_id] = (name, rating)
+            entries.extend((key, plant_id) for key in self.get_keys(name))
+
+        entries.sort(key=lambda entry: entry[0])
+
+        # Rank the plants of every short prefix: the plants are visited best first, so every
+        # prefix keeps the first top_size plants that match it
+        top = defaultdict(list)
+        ranked = sorted(plants.items(), key=lambda plant: (-plant[1][1], plant[1][0].casefold()))
+
+        for plant_id, (name, _) in ranked:
+            for prefix in self.get_short_prefixes(name):
+                ranking = top[prefix]
+
+                if len(ranking) < self.top_size:
+                    ranking.append(plant_id)
+
+        top = dict(top)
+
+        with self._lock:
+            self._plants = plants
+            self._keys = [key for key, _ in entries]
+            self._ids = [plant_id for _, plant_id in entries]
+            self._top = top
+            self._loaded = True
+            self._version = version
+
+        logger.info('Plant name index loaded: %s', self.stats())
+
+
+    def is_stale(self) -> bool:
+        """
+        Return True if the index hasn't been loaded yet or reflects an older version of the
+        plant names. The version is only read if the last check is older than check_interval.
+        """
+
+        if not self._loaded:
+            return True
+
+        if self._version is None or time.monotonic() - self._checked_at < self.check_interval:
+            return False
+
+        if self._version != get_plant_names_version():
+            return True
+
+        self._checked_at = time.monotonic()
+
+        return False
+
+
+    def ensure_loaded(self):
+        """Load the index from the database if it hasn't been loaded yet or is stale."""
+
+        if not self.is_stale():
+            return
+
+        from .models import Plant # Imported here to avoid a circular import
+
+        with self._lock:
+            if self.is_stale():
+                # Read the version first, a change made during the load will trigger another one
+                version = get_plant_names_version()
+                self.load(Plant.objects.values_list('id', 'name', 'rating').iterator(), version)
+                self._checked_at = time.monotonic()
+
+
+    def reset(self):
+        """Drop the content of the index, it will be loaded again on the next lookup."""
+
+        with self._lock:
+            self._plants = {}
+            self._keys = []
+            self._ids = []
+            self._top = {}
+            self._loaded = False
+            self._version = None
+            self._checked_at = 0
+
+
+    def add(self, plant_id, name, rating, version=None):
+        """
+        Add a plant to the index or replace the stored name and rating of the plant.
+        The version is the version of the plant names that includes the change.
+        """
+
+        with self._lock:
+            if not self._loaded:
+                return # The plant will be read from the database when the index is loaded
+
+            self._adopt_version(version)
+            incomplete = self._remove_plant(plant_id)
+            self._plants[plant_id] = (name, rating)
+
+            for key in self.get_keys(name):
+                position = bisect_left(self._keys, key)
+                self._keys.insert(position, key)
+                self._ids.insert(position, plant_id)
+
+            self._complete_rankings(incomplete)
+
+            for prefix in self.get_short_prefixes(name):
+                ranking = self._top.setdefault(prefix, [])
+
+                if plant_id not in ranking:
+                    insort(ranking, plant_id, key=self._rank)
+                    del ranking[self.top_size:]
+
+
+    def remove(self, plant_id, version=None):
+        """Remove a plant from the index. The version is the version of the plant names that includes the change."""
+
+        with self._lock:
+            if not self._loaded:
+                return
+
+            self._adopt_version(version)
+            incomplete = self._remove_plant(plant_id)
+            self._complete_rankings(incomplete)
+
+
+    def _adopt_version(self, version):
+        """
+        Move the index to the version of the plant names of an incremental update.
+
+        A change bumps the version once (see invalidate_plant_names). If the version moved
+        further, other changes happened in between and the index stays stale, so it is
+        loaded again on the next check.
+        """
+
+        if version is None or self._version is None:
+            return
+
+        if version - self._version <= 1:
+            self._version = version
+
+
+    def _remove_plant(self, plant_id) -> list:
+        """
+        Remove a plant from the sorted lists and from the rankings of the short prefixes.
+
+        Returns the prefixes whose ranking was full before the removal: the plant that
+        should take the freed place is not known, see _complete_rankings().
+        """
+
+        if plant_id not in self._plants:
+            return []
+
+        name, _ = self._plants[plant_id]
+        incomplete = []
+
+        for prefix in self.get_short_prefixes(name):
+            ranking = self._top.get(prefix, [])
+
+            if plant_id in ranking:
+                if len(ranking) == self.top_size:
+                    incomplete.append(prefix)
+
+                ranking.remove(plant_id)
+
+        for key in self.get_keys(name):
+            position = bisect_left(self._keys, key)
+
+            # Several plants can share the same key, find the one that belongs to this plant
+            while position < len(self._keys) and self._keys[position] == key:
+                if self._ids[position] == plant_id:
+                    del self._keys[position]
+                    del self._ids[position]
+                    break
+                position += 1
+
+        del self._plants[plant_id]
+
+        return incomplete
+
+
+    def _complete_rankings(self, prefixes):
+        """
+        Rank the plants of the prefixes again by scanning their keys. Only needed when
+        one of the best ranked plants of a prefix is removed, renamed or re-rated.
+        """
+
+        for prefix in prefixes:
+            self._top[prefix] = heapq.nsmallest(self.top_size, self._scan(prefix), key=self._rank)
+
+
+    def _scan(self, prefix) -> set:
+        """Return the ids of every plant that has a key starting with the prefix."""
+
+        matches = set()
+        position = bisect_left(self._keys, prefix)
+
+        while position < len(self._keys) and self._keys[position].startswith(prefix):
+            matches.add(self._ids[position])
+            position += 1
+
+        return matches
+
+
+    def search(self, prefix, limit=10) -> list:
+        """Return up to 'limit' plants whose name (or a word of it) starts with the prefix, best rated first."""
+
+        prefix = prefix.strip().casefold()
+        if not prefix or limit <= 0:
+            return []
+
+        self.ensure_loaded()
+
+        # The short prefixes are already ranked, the others match few enough keys to be scanned
+        ranked = len(prefix) <= self.top_prefix_length and limit <= self.top_size
+
+        with self._lock:
+            plant_ids = self._top.get(prefix, [])[:limit] if ranked else self._scan(prefix)
+            best = [(plant_id, *self._plants[plant_id]) for plant_id in plant_ids]
+
+        if not ranked:
+            # Best rated first, the names break the ties
+            best = heapq.nsmallest(limit, best, key=lambda plant: (-plant[2], plant[1].casefold()))
+
+        return [{'id': plant_id, 'name': name, 'rating': rating} for plant_id, name, rating in best]
+
+
+    def memory_usage(self) -> int:
+        """Return the approximate number of bytes used by the index."""
+
+        with self._lock:
+            size = sys.getsizeof(self._keys) + sys.getsizeof(self._ids) + sys.getsizeof(self._plants)
+            size += sum(sys.getsizeof(key) for key in self._keys)
+
+            # The rankings only hold references to the ids
+            size += sys.getsizeof(self._top)
+            size += sum(sys.getsizeof(prefix) + sys.getsizeof(ranking) for prefix, ranking in self._top.items())
+
+            # The ids are shared between the lists and the dictionary, count them once
+            for plant_id, plant in self._plants.items():
+                size += sys.getsizeof(plant_id) + sys.getsizeof(plant)
+                size += sys.getsizeof(plant[0]) + sys.getsizeof(plant[1])
+
+        return size
+
+
+    def stats(self) -> dict:
+        """Return the number of plants, the number of keys and the memory footprint of the index."""
+
+        return {
+            'plants': len(self._plants),
+            'keys': len(self._keys),
+            'memory_bytes': self.memory_usage(),
+        }
+
+
+# The index shared by the whole process
+plant_name_index = PlantNameIndex()
@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+from .models import Plant
+
+
+def check_benchmark_allowed(confirmed):
+    """
+    Refuse to run a benchmark outside of development (DEBUG off) unless it was confirmed
+    with --yes. The benchmarks roll their rows back, but they write to the configured
+    database and hold locks until then.
+
+    Raises CommandError.
+    """
+
+    if not (settings.DEBUG or confirmed):
+        raise CommandError('DEBUG is off, this may be a shared database. Pass --yes to run the benchmark anyway.')
+
+
+def create_benchmark_plants(size) -> list:
+    """
+    Insert 'size' plants with varied values, without calling Plant.save() (or sending the
+    signals) for each of them, and return their ids. The other plants are left untouched,
+    the benchmarks only read the rows they created.
+    """
+
+    plants = Plant.objects.bulk_create(
+        (
+            Plant(
+                name=f'Benchmark plant {number}',
+                description=f'Description of the benchmark plant number {number}.',
+                price=Decimal(number % 500) + Decimal('0.99'),
+                discount_percentage=number % 50,
+                stock_count=number % 7,
+                image=f'plants/benchmark_{number}.jpg',
+                rating=number % 6,
+            )
+            for number in range(size)
+        ),
+        batch_size=1000,
+    )
+
+    # The ids are generated in Python (uuid4), so bulk_create() sets them on every backend
+    return [plant.id for plant in plants]
@@ -0,0 +1,304 @@
+import hashlib
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.db.models.functions import Now
+from django.http import HttpResponse
+from django.utils import timezone
+
+from .conditional import conditional_get, make_etag, set_validators
+
+
+# Key of the CatalogVersion row bumped by every change of the catalog
+CATALOG_VERSION_KEY = 'catalog'
+
+
+def new_version() -> int:
+    """
+    Return the initial value of a CatalogVersion row, taken from the clock (in microseconds).
+
+    A row that is created again (deleted, rolled back, restored from an old backup)
+    doesn't go back to a version whose data may still be held in memory.
+    """
+
+    return time.time_ns() // 1000
+
+
+def get_version_state(key) -> tuple:
+    """Return (version, updated_at) of a CatalogVersion row with a single query, the row is created if needed."""
+
+    from .models import CatalogVersion # Imported here to avoid a circular import
+
+    state = CatalogVersion.objects.filter(key=key).values_list('version', 'updated_at').first()
+
+    if state is None:
+        row, _ = CatalogVersion.objects.get_or_create(key=key, defaults={'version': new_version(), 'updated_at': timezone.now()})
+        state = (row.version, row.updated_at)
+
+    return state
+
+
+def bump_version(key):
+    """
+    Increment a CatalogVersion row with a single UPDATE, in the current transaction.
+
+    The other processes see the new version when the transaction is committed, together
+    with the change. The row stays locked until then, so the concurrent changes of the
+    same data are serialized on it.
+    """
+
+    from .models import CatalogVersion # Imported here to avoid a circular import
+
+    updated = CatalogVersion.objects.filter(key=key).update(version=F('version') + 1, updated_at=Now())
+
+    if not updated:
+        # First change ever, the row doesn't exist yet
+        CatalogVersion.objects.get_or_create(key=key, defaults={'version': new_version(), 'updated_at': timezone.now()})
+
+
+def get_catalog_cache():
+    """Return the cache backend that holds the cached catalog responses."""
+
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def get_catalog_version() -> int:
+    """Return the current version of the catalog, as seen by every process."""
+
+    return get_version_state(CATALOG_VERSION_KEY)[0]
+
+
+def get_catalog_last_modified() -> int:
+    """Return the timestamp (in seconds) of the last change of the catalog."""
+
+    return int(get_version_state(CATALOG_VERSION_KEY)[1].timestamp())
+
+
+def bump_catalog_version():
+    """Increment the version of the catalog, which invalidates every cached catalog response."""
+
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def invalidate_catalog():
+    """
+    Invalidate the cached catalog responses after a change of the Plant table.
+
+    The version is bumped by the transaction of the change (see bump_version), so every
+    process moves to the new version exactly when it can see the new data, and a rolled
+    back change leaves no bump behind. The responses cached under the previous version
+    are never served again, the cache drops them when they expire.
+    """
+
+    bump_catalog_version()
+
+
+def catalog_cache_key(namespace, *parts, version=None) -> str:
+    """Return the cache key of a catalog response for the given (by default the current) catalog version."""
+
+    if version is None:
+        version = get_catalog_version()
+
+    digest = hashlib.sha1('\n'.join(str(part) for part in parts).encode()).hexdigest()
+
+    return f'inventory:{namespace}:{version}:{digest}'
+
+
+class CacheStats:
+    """Thread-safe hit and miss counters of a cache (per process)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+
+    def record_hit(self):
+        """Count a request answered from the cache."""
+
+        with self._lock:
+            self.hits += 1
+
+
+    def record_miss(self):
+        """Count a request that had to be rendered."""
+
+        with self._lock:
+            self.misses += 1
+
+
+    def as_dict(self) -> dict:
+        """Return the counters and the hit ratio."""
+
+        with self._lock:
+            total = self.hits + self.misses
+
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+
+    def reset(self):
+        """Set the counters back to zero."""
+
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+# Counters of the cached catalog responses
+catalog_cache_stats = CacheStats()
+
+
+class CatalogCacheMixin:
+    """
+    Caches the rendered JSON responses of an APIView under the current catalog version.
+
+    The first request renders the response as usual and stores the encoded bytes, the
+    following requests for the same URL get the stored bytes back without querying or
+    serializing anything, until the catalog version is bumped (see invalidate_catalog).
+    Only the JSON representation is cached (not the browsable API).
+
+    The URL is reduced to its canonical form (see get_canonical_url): only the query
+    parameters that the view recognises, normalized and sorted. Unknown parameters or
+    other spellings of the same values (e.g. ?junk=1, min_price=10.50 and 10.5) share
+    the same entry, rather than each storing its own copy of the catalog.
+
+    The responses also carry a strong ETag derived from the catalog version and the URL,
+    and the time of the last catalog change as Last-Modified, so clients that already
+    have the current representation get an empty 304 response.
+
+    The version is read from the database on every request (a primary key lookup), so a
+    change made by any process (another worker, a management command) moves every process
+    to new cache keys and ETags. The cache itself may be private to each process.
+    """
+
+    cache_namespace = None # Set by the subclasses, e.g. 'plant-list'
+
+
+    def get_catalog_response(self, request, build_response):
+        """
+        Return a 304 response, the cached response or the response built by build_response(request),
+        whichever comes first.
+        """
+
+        # The version is read once (a single query), before the data, so the key and the ETag
+        # of a response rendered from the data of an older version never point to a newer version.
+        self.catalog_version, updated_at = get_version_state(CATALOG_VERSION_KEY)
+
+        etag = self.get_etag(request)
+        last_modified = int(updated_at.timestamp())
+
+        not_modified = conditional_get(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = self.get_cached_response(request)
+        if response is None:
+            response = self.cache_response(request, build_response(request))
+
+        if response.status_code == 200:
+            set_validators(response, etag, last_modified)
+
+        return response
+
+
+    def get_cache_params(self, request) -> dict:
+        """
+        Return the canonical values of the query parameters that change the response.
+
+        By default, the ones of the filter backends and of the pagination class of the view
+        that provide a get_cache_params(request) method. Raises ValidationError for the
+        invalid values, like the filters would.
+        """
+
+        params = {}
+        components = [*getattr(self, 'filter_backends', ()), getattr(self, 'pagination_class', None)]
+
+        for component in components:
+            if component is not None and hasattr(component, 'get_cache_params'):
+                params.update(component().get_cache_params(request))
+
+        return params
+
+
+    def get_canonical_url(self, request) -> str:
+        """
+        Return the absolute URL of the request with the canonical query parameters only, sorted.
+
+        The host is kept, the links of the paginated responses include it. It is one of
+        ALLOWED_HOSTS, so it can't create an unbounded number of entries.
+        """
+
+        if not hasattr(self, 'canonical_url'):
+            query = urlencode(sorted(self.get_cache_params(request).items()))
+            self.canonical_url = request.build_absolute_uri(request.path + (f'?{query}' if query else ''))
+
+        return self.canonical_url
+
+
+    def get_etag(self, request) -> str:
+        """Return the ETag of the canonical URL for the catalog version of the request."""
+
+        return make_etag(self.cache_namespace, self.catalog_version, self.get_canonical_url(request))
+
+
+    def get_cache_key(self, request) -> str:
+        """Return the cache key of the canonical URL."""
+
+        return catalog_cache_key(self.cache_namespace, self.get_canonical_url(request), version=self.catalog_version)
+
+
+    def is_cacheable(self, request) -> bool:
+        """Return True if the response to the request can be cached."""
+
+        return request.method == 'GET' and request.accepted_renderer.format == 'json'
+
+
+    def get_cached_response(self, request):
+        """Return the cached response for the request or None on a cache miss."""
+
+        if not self.is_cacheable(request):
+            return None
+
+        self.cache_key = self.get_cache_key(request)
+        cached = get_catalog_cache().get(self.cache_key)
+
+        if cached is None:
+            catalog_cache_stats.record_miss()
+            return None
+
+        catalog_cache_stats.record_hit()
+        content, content_type = cached
+
+        response = HttpResponse(content, content_type=content_type)
+        response['X-Cache'] = 'HIT'
+
+        return response
+
+
+    def cache_response(self, request, response):
+        """
+        Store the rendered content of a successful response once it has been rendered.
+        Must be called after get_cached_response() returned None for the same request.
+        """
+
+        key = getattr(self, 'cache_key', None)
+
+        if key is None or response.status_code != 200:
+            return response
+
+        response['X-Cache'] = 'MISS'
+
+        def store(rendered_response):
+            get_catalog_cache().set(key, (rendered_response.content, rendered_response['Content-Type']))
+
+        response.add_post_render_callback(store)
+
+        return response
@@ -0,0 +1,48 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def make_etag(*parts) -> str:
+    """Return a strong, quoted ETag built from the given parts."""
+
+    digest = hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+    return f'"{digest}"'
+
+
+def set_validators(response, etag=None, last_modified=None):
+    """
+    Add the ETag and Last-Modified headers to the response.
+
+    The response is also marked with 'Cache-Control: no-cache', so clients and proxies
+    may keep a copy but must revalidate it with a conditional request before using it.
+    """
+
+    if etag is not None:
+        response['ETag'] = etag
+
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+
+    patch_cache_control(response, no_cache=True)
+
+    return response
+
+
+def conditional_get(request, etag=None, last_modified=None):
+    """
+    Evaluate the If-None-Match / If-Modified-Since (and If-Match / If-Unmodified-Since)
+    headers of the request against the validators of the current representation.
+
+    Returns a 304 (or 412) response with the validators if a precondition applies,
+    otherwise None and the full response has to be built.
+    """
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    if response is not None:
+        set_validators(response, etag, last_modified)
+
+    return response
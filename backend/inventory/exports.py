@@ -0,0 +1,128 @@
+import csv
+import json
+import zlib
+
+from .models import Plant
+
+
+# Columns of the export files, in this order
+EXPORT_COLUMNS = (
+    'id', 'sku', 'name', 'description', 'price', 'discount_percentage', 'discounted_price',
+    'stock_count', 'rating', 'image', 'updated_at',
+)
+
+EXPORT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+# Rows fetched from the database at a time (a server-side cursor on PostgreSQL)
+EXPORT_CHUNK_SIZE = 2000
+
+# The output is grouped into blocks of about this size, rather than sent row by row
+EXPORT_BLOCK_SIZE = 64 * 1024
+
+
+def iter_export_rows(after=None, chunk_size=EXPORT_CHUNK_SIZE, using=None):
+    """
+    Yield every plant as a dictionary of the EXPORT_COLUMNS (strings, integers or None), ordered by id.
+
+    The plants are read with QuerySet.iterator(), so only chunk_size rows are held in
+    memory whatever the size of the catalog. The order by id makes the export resumable:
+    after is the id of the last plant received, the export continues with the next one.
+    """
+
+    plants = Plant.objects.using(using).order_by('id')
+
+    if after is not None:
+        plants = plants.filter(id__gt=after)
+
+    storage_url = Plant._meta.get_field('image').storage.url
+
+    for row in plants.values_list(*EXPORT_COLUMNS).iterator(chunk_size=chunk_size):
+        plant = dict(zip(EXPORT_COLUMNS, row))
+
+        plant['id'] = str(plant['id'])
+        plant['price'] = f"{plant['price']:.2f}"
+        plant['discounted_price'] = f"{plant['discounted_price']:.2f}"
+        plant['image'] = storage_url(plant['image']) if plant['image'] else None
+        plant['updated_at'] = plant['updated_at'].isoformat()
+
+        yield plant
+
+
+class Echo:
+    """File-like object whose write() returns the written value, so csv.writer can build lines for a generator."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    """Yield the header, then one CSV line per row. Missing values (None) are empty cells."""
+
+    writer = csv.writer(Echo())
+
+    yield writer.writerow(EXPORT_COLUMNS)
+
+    for row in rows:
+        yield writer.writerow([row[column] for column in EXPORT_COLUMNS])
+
+
+def render_jsonl(rows):
+    """Yield one JSON object per line."""
+
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+RENDERERS = {
+    'csv': render_csv,
+    'jsonl': render_jsonl,
+}
+
+
+def join_blocks(chunks, block_size=EXPORT_BLOCK_SIZE):
+    """Yield the text chunks encoded in UTF-8 and joined into blocks of about block_size bytes."""
+
+    block = []
+    size = 0
+
+    for chunk in chunks:
+        chunk = chunk.encode()
+        block.append(chunk)
+        size += len(chunk)
+
+        if size >= block_size:
+            yield b''.join(block)
+            block = []
+            size = 0
+
+    if block:
+        yield b''.join(block)
+
+
+def gzip_blocks(blocks, level=6):
+    """Compress a stream of byte blocks into a single gzip stream, block by block."""
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS) # 16 + : gzip header and trailer
+
+    for block in blocks:
+        compressed = compressor.compress(block)
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
+
+
+def export_plants(export_type, after=None, compress=False, chunk_size=EXPORT_CHUNK_SIZE, using=None):
+    """
+    Return a generator of the bytes of the catalog export, in CSV or JSONL, optionally gzipped.
+
+    Nothing is read before the generator is consumed, the memory used is constant.
+    """
+
+    rows = iter_export_rows(after=after, chunk_size=chunk_size, using=using)
+    blocks = join_blocks(RENDERERS[export_type](rows))
+
+    return gzip_blocks(blocks) if compress else blocks
@@ -0,0 +1,68 @@
+from django.db.models import Count, Max, Min, Q
+
+
+# Edges of the price histogram, the last bucket has no upper bound
+PRICE_HISTOGRAM_EDGES = (0, 10, 25, 50, 100, 250, 500, 1000)
+
+# Possible values of the rating (see the constraint of the Plant model)
+RATINGS = range(0, 6)
+
+
+def get_price_buckets() -> list:
+    """Return the (lower, upper) bounds of the price histogram buckets, the last upper bound is None."""
+
+    upper_bounds = PRICE_HISTOGRAM_EDGES[1:] + (None,)
+
+    return list(zip(PRICE_HISTOGRAM_EDGES, upper_bounds))
+
+
+def get_plant_facets(queryset) -> dict:
+    """
+    Return the facet counts of the catalog sidebar for the plants in the queryset.
+
+    Every facet is a filtered aggregate (COUNT(*) FILTER (WHERE ...) on PostgreSQL, a CASE
+    expression on the other databases) of the same aggregate query, so all the facets are
+    computed in a single pass over the matching rows. The prices are the discounted prices,
+    the amounts used by the price filters.
+    """
+
+    buckets = get_price_buckets()
+
+    aggregates = {
+        'count': Count('id'),
+        'in_stock': Count('id', filter=Q(stock_count__gt=0)),
+        'on_discount': Count('id', filter=Q(discount_percentage__gt=0)),
+        'min_price': Min('discounted_price'),
+        'max_price': Max('discounted_price'),
+    }
+
+    for index, (lower, upper) in enumerate(buckets):
+        condition = Q(discounted_price__gte=lower)
+        if upper is not None:
+            condition &= Q(discounted_price__lt=upper)
+
+        aggregates[f'price_{index}'] = Count('id', filter=condition)
+
+    for rating in RATINGS:
+        aggregates[f'rating_{rating}'] = Count('id', filter=Q(rating=rating))
+
+    # The ordering is irrelevant for an aggregate and would only slow it down
+    result = queryset.order_by().aggregate(**aggregates)
+
+    return {
+        'count': result['count'],
+        'in_stock': result['in_stock'],
+        'on_discount': result['on_discount'],
+        'price': {
+            'min': result['min_price'],
+            'max': result['max_price'],
+            'histogram': [
+                {'min': lower, 'max': upper, 'count': result[f'price_{index}']}
+                for index, (lower, upper) in enumerate(buckets)
+            ],
+        },
+        'rating': [
+            {'rating': rating, 'count': result[f'rating_{rating}']}
+            for rating in RATINGS
+        ],
+    }
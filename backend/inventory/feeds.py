@@ -0,0 +1,193 @@
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from .autocomplete import invalidate_plant_names
+from .cache import invalidate_catalog
+from .imports import PlantImporter, clean_offer, clean_sku, offer_fingerprint
+from .models import Plant
+from .signals import bulk_plant_deletion
+
+
+# Columns written when the offer of a plant changes
+OFFER_FIELDS = ('price', 'discount_percentage', 'stock_count', 'feed_fingerprint', 'updated_at')
+
+
+class PlantFeedSync:
+    """
+    Applies a full supplier feed (price, discount and stock of every SKU) to the catalog,
+    writing only the plants whose values changed.
+
+    The fingerprint of every plant (the hash of the last feed values applied to it) is
+    loaded once, then every feed record is hashed and compared with it. Unchanged records
+    cost nothing. The changed ones are written with one bulk UPDATE per batch, the unknown
+    SKUs are inserted like import_plants does (they need the name and the image), and the
+    plants missing from the feed are reported, or deleted with delete_missing.
+
+    A change made to a plant outside of the feed (e.g. in the admin) doesn't change its
+    fingerprint, so it is only overwritten when the feed record of the plant changes.
+
+    The catalog caches are invalidated through the versions in the database (see
+    inventory/cache.py), so the web processes see the changes although the sync runs in a
+    process of its own.
+
+    The sync is meant to run inside a transaction, so a failed sync leaves nothing behind.
+    """
+
+    def __init__(self, using='default', batch_size=5000, skip_invalid=False, delete_missing=False, dry_run=False):
+        self.using = using
+        self.batch_size = batch_size
+        self.delete_missing = delete_missing
+        self.dry_run = dry_run
+
+        # New SKUs are validated and inserted by the importer, which also collects the errors
+        self.importer = PlantImporter(using=using, batch_size=batch_size, skip_invalid=skip_invalid)
+
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.missing = [] # SKUs of the catalog that are not in the feed
+
+
+    @property
+    def errors(self) -> list:
+        """(line number, message) of the skipped records."""
+
+        return self.importer.errors
+
+
+    def get_fingerprints(self) -> dict:
+        """Return {sku: (plant id, fingerprint)} for every plant that has a SKU, in a single query."""
+
+        rows = Plant.objects.using(self.using).filter(sku__isnull=False).values_list('sku', 'id', 'feed_fingerprint')
+
+        return {sku: (plant_id, fingerprint) for sku, plant_id, fingerprint in rows.iterator()}
+
+
+    def compare(self, numbered_rows, fingerprints, seen):
+        """
+        Yield ('update', Plant) or ('insert', values) for every feed record that changes the catalog.
+        The SKUs of the records are added to seen.
+        """
+
+        now = timezone.now()
+
+        for line_number, row in numbered_rows:
+            try:
+                if isinstance(row, ValidationError):
+                    raise row # The line couldn't be parsed
+
+                sku = clean_sku(row)
+                if sku is None:
+                    raise ValidationError('Missing required fields: sku.')
+
+                if sku in seen:
+                    raise ValidationError(f'The SKU {sku} appears more than once in the feed.')
+
+                # An invalid record still marks its plant as present, it must not be deleted as missing
+                seen.add(sku)
+
+                if sku in fingerprints:
+                    price, discount_percentage, stock_count = clean_offer(row)
+                    fingerprint = offer_fingerprint(price, discount_percentage, stock_count)
+                    plant_id, stored_fingerprint = fingerprints[sku]
+
+                    change = None if fingerprint == stored_fingerprint else ('update', Plant(
+                        id=plant_id,
+                        price=price,
+                        discount_percentage=discount_percentage,
+                        stock_count=stock_count,
+                        feed_fingerprint=fingerprint,
+                        updated_at=now,
+                    ))
+                else:
+                    change = ('insert', self.importer.clean_row(row, now))
+            except ValidationError as error:
+                self.importer.report_error(line_number, error)
+                continue
+
+            if change is None:
+                self.unchanged += 1
+            else:
+                yield change
+
+
+    def apply(self, changes):
+        """Write a batch of changes: one bulk UPDATE for the changed plants and one insert for the new ones."""
+
+        updates = [plant for action, plant in changes if action == 'update']
+        inserts = [values for action, values in changes if action == 'insert']
+
+        if not self.dry_run:
+            if updates:
+                Plant.objects.using(self.using).bulk_update(updates, OFFER_FIELDS)
+
+            if inserts:
+                self.importer.insert(inserts)
+
+        self.updated += len(updates)
+        self.inserted += len(inserts)
+
+
+    def delete_plants(self, plant_ids):
+        """
+        Delete the plants (and the rows that depend on them, e.g. their cart items) without
+        the per-plant invalidation of the post_delete handler: run() invalidates the catalog
+        and the plant names once for the whole sync.
+        """
+
+        with bulk_plant_deletion():
+            Plant.objects.using(self.using).filter(id__in=plant_ids).delete()
+
+
+    def run(self, numbered_rows, progress=None) -> dict:
+        """
+        Apply the (line number, record) pairs of the feed, e.g. from read_plant_rows().
+        progress(summary) is called after every batch. Returns the summary of the changes.
+        """
+
+        fingerprints = self.get_fingerprints()
+        seen = set()
+
+        changes = self.compare(numbered_rows, fingerprints, seen)
+
+        while batch := list(islice(changes, self.batch_size)):
+            self.apply(batch)
+
+            if progress is not None:
+                progress(self.summary())
+
+        self.missing = sorted(sku for sku in fingerprints if sku not in seen)
+
+        if self.delete_missing and self.missing and not self.dry_run:
+            missing_ids = [fingerprints[sku][0] for sku in self.missing]
+
+            # Deleted in chunks, a single IN clause can't hold every id on every database
+            for start in range(0, len(missing_ids), self.batch_size):
+                self.delete_plants(missing_ids[start:start + self.batch_size])
+
+            self.deleted = len(missing_ids)
+
+        if not self.dry_run and (self.updated or self.inserted or self.deleted):
+            invalidate_catalog()
+
+        # The offers of the updated plants are not in the autocomplete index
+        if not self.dry_run and (self.inserted or self.deleted):
+            invalidate_plant_names()
+
+        return self.summary()
+
+
+    def summary(self) -> dict:
+        """Return the number of inserted, updated, unchanged, deleted, missing and invalid records."""
+
+        return {
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'deleted': self.deleted,
+            'missing': len(self.missing),
+            'invalid': len(self.errors),
+        }
@@ -0,0 +1,179 @@
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal, InvalidOperation
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Plant
+
+
+class PlantFilterBackend(BaseFilterBackend):
+    """
+    Filters the Plant queryset with the same filters as the storefront sidebar.
+
+    Query parameters:
+        - in_stock: Only return plants with stock_count greater than 0.
+        - on_discount: Only return plants with discount_percentage greater than 0.
+        - min_price: Only return plants that cost at least this amount.
+        - max_price: Only return plants that cost at most this amount.
+
+    The price filters are applied to the discounted price, the amount the customer pays.
+    They are rounded to cents towards the prices they include (min_price up, max_price down),
+    which selects the same rows, and a price the column cannot hold is rejected.
+
+    Every filter is translated into a WHERE condition, so the matching rows are
+    selected by the database (see the indexes declared on the Plant model).
+    """
+
+    true_values = ('1', 'true', 'yes', 'on')
+
+    # Rounding of the price filters to the cents of the discounted_price column
+    price_rounding = {'min_price': ROUND_CEILING, 'max_price': ROUND_FLOOR}
+
+
+    def filter_queryset(self, request, queryset, view=None):
+        """Return the queryset restricted by the filters passed in the query parameters."""
+
+        params = request.query_params
+
+        if self.get_boolean(params, 'in_stock'):
+            queryset = queryset.filter(stock_count__gt=0)
+
+        if self.get_boolean(params, 'on_discount'):
+            queryset = queryset.filter(discount_percentage__gt=0)
+
+        min_price = self.get_price(params, 'min_price')
+        if min_price is not None:
+            queryset = queryset.filter(discounted_price__gte=min_price)
+
+        max_price = self.get_price(params, 'max_price')
+        if max_price is not None:
+            queryset = queryset.filter(discounted_price__lte=max_price)
+
+        return queryset
+
+
+    def get_cache_params(self, request) -> dict:
+        """
+        Return the filters of the request in a canonical form, for the cache keys of the
+        responses (see CatalogCacheMixin): only the enabled filters, the prices normalized.
+        """
+
+        params = request.query_params
+        cache_params = {}
+
+        for name in ('in_stock', 'on_discount'):
+            if self.get_boolean(params, name):
+                cache_params[name] = 'true'
+
+        for name in ('min_price', 'max_price'):
+            number = self.get_price(params, name)
+            if number is not None:
+                cache_params[name] = format(number.normalize(), 'f') # 10.50 and 10.5 are the same filter
+
+        return cache_params
+
+
+    def get_boolean(self, params, name) -> bool:
+        """Return True if the query parameter is set to one of the true values."""
+
+        return params.get(name, '').lower() in self.true_values
+
+
+    def get_decimal(self, params, name):
+        """
+        Return the query parameter converted into a Decimal or None if it is not provided.
+
+        Raises ValidationError if the value is not a valid number.
+        """
+
+        value = params.get(name)
+        if value in (None, ''):
+            return None
+
+        try:
+            number = Decimal(value)
+        except InvalidOperation:
+            raise ValidationError({name: 'A valid number is required.'})
+
+        if not number.is_finite():
+            raise ValidationError({name: 'A valid number is required.'})
+
+        return number
+
+
+    def get_price(self, params, name):
+        """
+        Return the price query parameter rounded to the cents of the discounted_price
+        column, or None if it is not provided.
+
+        Raises ValidationError if the value is not a valid number or is out of the range
+        of the column (e.g. 1e999999, which the database would refuse to compare).
+        """
+
+        number = self.get_decimal(params, name)
+        if number is None:
+            return None
+
+        field = Plant._meta.get_field('discounted_price').output_field
+        integer_digits = field.max_digits - field.decimal_places
+
+        # Checked before the quantize(), which fails on the numbers with too many digits
+        if number.adjusted() >= integer_digits:
+            raise ValidationError({name: f'Ensure that there are no more than {integer_digits} digits before the decimal point.'})
+
+        return number.quantize(Decimal(1).scaleb(-field.decimal_places), rounding=self.price_rounding[name])
+
+
+class PlantOrderingFilter(BaseFilterBackend):
+    """
+    Orders the Plant queryset by one of the storefront sort keys.
+
+    The 'ordering' query parameter accepts the following values:
+        - price / -price: "Low to High" / "High to Low" (by the discounted price)
+        - rating / -rating: "Lowest Rated" / "Top Rated"
+        - name / -name: "A to Z" / "Z to A"
+
+    Every ordering ends with the primary key in the same direction, which makes the
+    key unique (required by the keyset pagination) and lets the database read the
+    composite indexes declared on the Plant model in either direction.
+    """
+
+    ordering_param = 'ordering'
+
+    orderings = {
+        'price': ('discounted_price', 'id'),
+        '-price': ('-discounted_price', '-id'),
+        'rating': ('rating', 'id'),
+        '-rating': ('-rating', '-id'),
+        'name': ('name', 'id'),
+        '-name': ('-name', '-id'),
+    }
+    default_ordering = '-rating'
+
+
+    def get_ordering(self, request) -> tuple:
+        """Return the ordering fields that match the ordering query parameter."""
+
+        key = request.query_params.get(self.ordering_param, self.default_ordering)
+
+        return self.orderings.get(key, self.orderings[self.default_ordering])
+
+
+    def get_cache_params(self, request) -> dict:
+        """Return the ordering of the request in a canonical form (an unknown value is the default ordering)."""
+
+        if self.ordering_param not in request.query_params:
+            return {}
+
+        key = request.query_params[self.ordering_param]
+
+        return {self.ordering_param: key if key in self.orderings else self.default_ordering}
+
+
+    def filter_queryset(self, request, queryset, view=None):
+        """Order the queryset if the client asked for a specific ordering."""
+
+        if self.ordering_param not in request.query_params:
+            return queryset
+
+        return queryset.order_by(*self.get_ordering(request))
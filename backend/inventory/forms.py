@@ -0,0 +1,48 @@
+from django import forms
+from .models import Plant
+from .validators import get_image_size_message
+
+
+class PlantAdminForm(forms.ModelForm):
+    """
+    PlantAdminForm is the ModelForm of the Plant admin pages.
+
+    The image is received as a plain file: forms.ImageField (the default form field of
+    a models.ImageField) copies the whole upload into memory and decodes it with Pillow.
+    The content is checked by Plant.clean instead, which only reads the header of the
+    file (see validators.read_image_header).
+
+    An image larger than MAX_UPLOAD_SIZE is dropped from the request while it is received
+    (see uploadhandlers.MaxSizeUploadHandler). PlantAdmin copies the fields dropped from
+    the request into oversized_files, so the form reports the size of the file instead of
+    a missing field.
+
+    Attributes:
+        - image: The uploaded image (PNG, JPG or JPEG).
+        - oversized_files: {field name: max size} of the files dropped from the request.
+    """
+
+    image = forms.FileField()
+
+    oversized_files = {}
+
+    class Meta:
+        model = Plant
+        fields = '__all__'
+
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # The image was sent, clean_image reports its size rather than the field as required
+        if 'image' in self.oversized_files:
+            self.fields['image'].required = False
+
+
+    def clean_image(self):
+        """Reject the image dropped from the request because it was too large."""
+
+        if 'image' in self.oversized_files:
+            raise forms.ValidationError(get_image_size_message(self.oversized_files['image']))
+
+        return self.cleaned_data['image']
@@ -0,0 +1,321 @@
+import base64
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+# Only PIL and the lazy settings are imported at module level: the worker processes are
+# spawned and import this module to run render_images(), before Django is set up.
+
+
+logger = logging.getLogger(__name__)
+
+
+# Widths (in pixels) of the generated images, chosen for the list cards and the detail page
+VARIANT_WIDTHS = (320, 640, 1280)
+
+# Generated formats: name -> (Pillow format, file extension, save options).
+# WebP is served to the browsers that support it, JPEG is the fallback.
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Directory of the generated images, next to the uploaded images
+VARIANTS_DIRECTORY = 'plants/variants'
+
+# Largest side (in pixels) and quality of the inline placeholder
+PLACEHOLDER_SIZE = 20
+PLACEHOLDER_QUALITY = 50
+
+
+def get_variant_widths(source_width) -> list:
+    """
+    Return the widths to generate for a source image of the given width.
+    Images are never upscaled, a source narrower than every width gets a single variant of its own width.
+    """
+
+    widths = [width for width in VARIANT_WIDTHS if width < source_width]
+
+    if len(widths) < len(VARIANT_WIDTHS):
+        widths.append(source_width) # The largest variant is the source resized to nothing bigger
+
+    return widths
+
+
+def render_images(source) -> dict:
+    """
+    Decode the source image (a path or the content as bytes) and encode every variant and the placeholder.
+
+    Runs in a worker process. Returns a dictionary:
+        {'variants': {(format name, width): encoded bytes}, 'placeholder': data URI}
+    Raises OSError (PIL.UnidentifiedImageError) if the source is not a readable image.
+    """
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    with Image.open(source) as image:
+        # Let the JPEG decoder scale down while decoding, much faster than decoding the full image
+        image.draft('RGB', (max(VARIANT_WIDTHS), max(VARIANT_WIDTHS)))
+        image = ImageOps.exif_transpose(image)
+
+        has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        return {
+            'variants': render_variants(image, has_alpha),
+            'placeholder': render_placeholder(image, has_alpha),
+        }
+
+
+def render_variants(image, has_alpha) -> dict:
+    """Encode every variant of the decoded image. Returns a dictionary {(format name, width): encoded bytes}."""
+
+    variants = {}
+
+    for width in get_variant_widths(image.width):
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.Resampling.LANCZOS) if width != image.width else image
+
+        for format_name, (pillow_format, _, options) in VARIANT_FORMATS.items():
+            # JPEG has no transparency, flatten it on a white background
+            output = flatten(resized) if pillow_format == 'JPEG' and has_alpha else resized
+
+            buffer = io.BytesIO()
+            output.save(buffer, pillow_format, **options)
+            variants[(format_name, width)] = buffer.getvalue()
+
+    return variants
+
+
+def render_placeholder(image, has_alpha) -> str:
+    """
+    Return the low-quality placeholder of the decoded image: a tiny WebP (at most
+    PLACEHOLDER_SIZE pixels wide or high) as a data URI of about 100 to 300 characters.
+
+    The storefront paints it, stretched and blurred, while the real image is loading.
+    """
+
+    placeholder = flatten(image) if has_alpha else image.copy()
+    placeholder.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.Resampling.BOX)
+
+    buffer = io.BytesIO()
+    placeholder.save(buffer, 'WEBP', quality=PLACEHOLDER_QUALITY)
+
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def flatten(image):
+    """Return an RGB copy of an RGBA image, on a white background."""
+
+    flat = Image.new('RGB', image.size, 'white')
+    flat.paste(image, mask=image.getchannel('A'))
+
+    return flat
+
+
+def get_variant_urls(variants, url) -> dict:
+    """
+    Return the srcset-style map of the stored variants: {format: {width: url}}.
+    'url' converts a storage name into a URL (e.g. storage.url).
+    """
+
+    return {
+        format_name: {width: url(name) for width, name in variants.get(format_name, {}).items()}
+        for format_name in VARIANT_FORMATS
+        if variants.get(format_name)
+    }
+
+
+def store_variants(plant_id, source_name, rendered):
+    """
+    Save the rendered variants and record them on the plant, together with the placeholder.
+
+    The plant is only updated if it still has the same image, otherwise the variants are
+    obsolete. The files are not deleted here, they may be shared with other plants (see storage.py).
+    """
+
+    from .cache import invalidate_catalog # Imported here, see the comment at the top
+    from .models import Plant
+
+    storage = Plant._meta.get_field('image').storage
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+
+    variants = {'source': source_name}
+    for (format_name, width), content in rendered.get('variants', {}).items():
+        extension = VARIANT_FORMATS[format_name][1]
+        name = storage.save(f'{VARIANTS_DIRECTORY}/{stem}_{width}.{extension}', ContentFile(content))
+        variants.setdefault(format_name, {})[str(width)] = name
+
+    with transaction.atomic():
+        previous = (
+            Plant.objects.select_for_update()
+            .filter(id=plant_id, image=source_name)
+            .values_list('image_variants', flat=True)
+            .first()
+        )
+
+        # The plant may have been deleted or may have got another image in the meantime
+        if previous is not None:
+            Plant.objects.filter(id=plant_id).update(
+                image_variants=variants,
+                image_placeholder=rendered.get('placeholder', ''),
+                updated_at=timezone.now()
+            )
+            invalidate_catalog() # The cached responses hold the previous variants
+
+    # The files that are no longer referenced are removed by the collect_plant_images command
+    return variants if previous is not None else None
+
+
+def get_variant_names(variants) -> set:
+    """Return the storage names of the files of the stored variants (the value of Plant.image_variants)."""
+
+    return {
+        name
+        for format_name in VARIANT_FORMATS
+        for name in (variants or {}).get(format_name, {}).values()
+    }
+
+
+def generate_plant_variants(plant_id):
+    """
+    Generate and store the variants of the current image of a plant in the current process.
+    Used by the management command and as the synchronous mode of schedule_plant_variants().
+    """
+
+    from .models import Plant # Imported here, see the comment at the top
+
+    source_name = Plant.objects.filter(id=plant_id).values_list('image', flat=True).first()
+    if not source_name:
+        return None
+
+    storage = Plant._meta.get_field('image').storage
+
+    try:
+        with storage.open(source_name) as source:
+            rendered = render_images(source.read())
+    except OSError:
+        logger.warning('The image of the plant %s is not readable, no variants are generated', plant_id)
+        rendered = {} # Remember the image, so it is not processed again on every save
+
+    return store_variants(plant_id, source_name, rendered)
+
+
+class VariantPool:
+    """
+    Process pool that renders the image variants off the request path.
+
+    The pool is started on the first use. Decoding and encoding the images is CPU-bound
+    work, so it runs in separate processes (PLANT_IMAGE_WORKERS) instead of threads.
+    The encoded variants are then stored by a thread of the web process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        """Return the process pool, starting it if needed."""
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=settings.PLANT_IMAGE_WORKERS,
+                    # Forking a multi-threaded web process is unsafe, start fresh interpreters
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+
+            return self._executor
+
+
+    def submit(self, plant_id, source_name):
+        """Render the variants of the image in the pool and store them once they are ready."""
+
+        from .models import Plant # Imported here, see the comment at the top
+
+        storage = Plant._meta.get_field('image').storage
+
+        # Local files are read by the workers, the other storages are read here
+        try:
+            source = storage.path(source_name)
+        except NotImplementedError:
+            with storage.open(source_name) as file:
+                source = file.read()
+
+        future = self.get_executor().submit(render_images, source)
+        future.add_done_callback(lambda future: self.store(future, plant_id, source_name))
+
+        return future
+
+
+    def store(self, future, plant_id, source_name):
+        """Store the variants rendered by a worker (runs in a thread of the web process)."""
+
+        try:
+            try:
+                rendered = future.result()
+            except OSError:
+                logger.warning('The image of the plant %s is not readable, no variants are generated', plant_id)
+                rendered = {} # Remember the image, so it is not processed again on every save
+
+            store_variants(plant_id, source_name, rendered)
+        except Exception:
+            logger.exception('Could not generate the image variants of the plant %s', plant_id)
+        finally:
+            close_old_connections() # The thread has its own database connection
+
+
+    def shutdown(self):
+        """Stop the worker processes."""
+
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+# The pool shared by the whole process
+variant_pool = VariantPool()
+
+
+def needs_variants(plant) -> bool:
+    """
+    Return True if the variants of the plant were not generated from its current image,
+    or if the image was readable but the placeholder is missing (plants processed before it existed).
+    """
+
+    if not plant.image.name:
+        return False
+
+    variants = plant.image_variants or {}
+
+    if variants.get('source') != plant.image.name:
+        return True
+
+    return not plant.image_placeholder and bool(get_variant_names(variants))
+
+
+def schedule_plant_variants(plant_id, source_name):
+    """
+    Generate the variants of a plant image, in the process pool or right away if
+    PLANT_IMAGE_VARIANTS_ASYNC is False. Must be called after the image has been committed.
+    """
+
+    if settings.PLANT_IMAGE_VARIANTS_ASYNC:
+        return variant_pool.submit(plant_id, source_name)
+
+    try:
+        return generate_plant_variants(plant_id)
+    except Exception:
+        logger.exception('Could not generate the image variants of the plant %s', plant_id)
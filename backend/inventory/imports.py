@@ -0,0 +1,372 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import uuid
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.utils import timezone
+
+from .autocomplete import invalidate_plant_names
+from .cache import invalidate_catalog
+from .models import Plant
+from .search import update_search_vectors
+from .validators import IMAGE_FORMATS, get_image_size_message
+
+
+# Columns of an import file, the others are ignored. Only the name, the price and the image are required.
+IMPORT_FIELDS = ('sku', 'name', 'description', 'price', 'discount_percentage', 'stock_count', 'image', 'rating')
+REQUIRED_FIELDS = ('name', 'price', 'image')
+
+# Columns written by the import, the generated discounted_price and the search vector are filled in by the database
+COPY_FIELDS = (
+    'id', 'sku', 'name', 'description', 'price', 'discount_percentage', 'stock_count', 'image', 'rating',
+    'feed_fingerprint', 'updated_at', 'image_variants', 'image_placeholder',
+)
+
+PRICE_QUANTUM = Decimal('0.01')
+
+
+def guess_plant_file_format(path) -> str:
+    """
+    Return the format of an import or feed file ('csv' or 'jsonl') from its extension.
+
+    Raises ValidationError if the extension is not known.
+    """
+
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension in ('.csv', '.jsonl'):
+        return extension[1:]
+
+    raise ValidationError('Cannot guess the format of the file, use --format csv or --format jsonl.')
+
+
+def open_plant_file(path):
+    """Open an import or feed file as text, or the standard input for '-' (without closing it afterwards)."""
+
+    if path == '-':
+        return open(sys.stdin.fileno(), encoding='utf-8', newline='', closefd=False)
+
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_plant_rows(file, file_format):
+    """
+    Yield (line number, row) for every plant of a CSV (with a header) or JSONL file, one at a time.
+
+    The rows are dictionaries of strings (CSV) or JSON values (JSONL), they are validated
+    by clean_plant_row().
+    """
+
+    if file_format == 'csv':
+        reader = csv.DictReader(file)
+
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield line_number, ValidationError(f'Invalid JSON: {error}')
+                continue
+
+            if not isinstance(row, dict):
+                yield line_number, ValidationError('Every line must be a JSON object.')
+                continue
+
+            yield line_number, row
+    else:
+        raise ValueError(f'Unknown import format: {file_format!r}')
+
+
+def to_integer(value, field):
+    """Convert an integer column (e.g. "12" or 12), a missing or empty value is 0."""
+
+    if value is None or value == '':
+        return 0
+
+    # int() would truncate a float (JSON) or accept a boolean
+    if isinstance(value, (float, bool)):
+        raise ValidationError(f'The {field} field must be an integer.')
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f'The {field} field must be an integer.')
+
+
+def clean_sku(row):
+    """Return the SKU of a row, or None if it has none."""
+
+    sku = row.get('sku')
+    if sku in (None, ''):
+        return None
+
+    sku = str(sku).strip()
+
+    if len(sku) > Plant._meta.get_field('sku').max_length:
+        raise ValidationError('The sku field cannot be longer than 64 characters.')
+
+    return sku or None
+
+
+def clean_offer(row) -> tuple:
+    """
+    Validate the values of a row that the supplier feed keeps changing and return
+    (price, discount_percentage, stock_count). Raises ValidationError.
+    """
+
+    if row.get('price') in (None, ''):
+        raise ValidationError('Missing required fields: price.')
+
+    try:
+        price = Decimal(str(row['price'])).quantize(PRICE_QUANTUM)
+    except InvalidOperation:
+        raise ValidationError('The price field must be a decimal number.')
+
+    # NaN goes through quantize(), but can't be compared
+    if not price.is_finite():
+        raise ValidationError('The price field must be a decimal number.')
+
+    if price <= 0:
+        raise ValidationError('The price field must be greater than 0.')
+
+    # Same limit as the column: 10 digits, 2 of them after the decimal point
+    if len(price.as_tuple().digits) > Plant._meta.get_field('price').max_digits:
+        raise ValidationError('Price cannot be longer than 10 digits.')
+
+    discount_percentage = to_integer(row.get('discount_percentage'), 'discount_percentage')
+
+    if not (0 <= discount_percentage <= 100):
+        raise ValidationError('The discount_percentage field must be within 0 and 100 (inclusive).')
+
+    stock_count = to_integer(row.get('stock_count'), 'stock_count')
+
+    if stock_count < 0:
+        raise ValidationError('The stock_count field cannot be negative.')
+
+    return price, discount_percentage, stock_count
+
+
+def offer_fingerprint(price, discount_percentage, stock_count) -> str:
+    """Return the hash of the cleaned feed values of a plant, stored in Plant.feed_fingerprint."""
+
+    return hashlib.sha256(f'{price}|{discount_percentage}|{stock_count}'.encode()).hexdigest()
+
+
+def clean_plant_row(row, storage, image_sizes):
+    """
+    Validate an import row and return the values of the plant in the order of COPY_FIELDS
+    (without the last three, set by the importer).
+
+    Performs the same checks as Plant.clean() (and the database constraints) on plain
+    values, without creating a model instance. The image is the name of a file already
+    in the plant image storage. Its size is read once per distinct name (image_sizes
+    caches it, imported catalogs usually share images). Raises ValidationError.
+    """
+
+    missing = [field for field in REQUIRED_FIELDS if row.get(field) in (None, '')]
+    if missing:
+        raise ValidationError(f'Missing required fields: {", ".join(missing)}.')
+
+    sku = clean_sku(row)
+
+    name = str(row['name']).strip()
+
+    if len(name) < 3:
+        raise ValidationError('The name cannot be empty or contain fewer than 3 characters.')
+
+    if len(name) > Plant._meta.get_field('name').max_length:
+        raise ValidationError('The name field cannot be longer than 100 characters.')
+
+    description = row.get('description')
+    description = str(description) if description not in (None, '') else None
+
+    if description is not None and len(description) > 1500:
+        raise ValidationError('The description field cannot be longer than 1500 characters.')
+
+    price, discount_percentage, stock_count = clean_offer(row)
+
+    rating = to_integer(row.get('rating'), 'rating')
+
+    if rating < 0 or rating > 5:
+        raise ValidationError('The rating field must be between 0 and 5 (inclusive)')
+
+    image = str(row['image'])
+
+    if os.path.splitext(image)[1].lower() not in IMAGE_FORMATS:
+        raise ValidationError('Only PNG, JPG and JPEG images are allowed.')
+
+    if image not in image_sizes:
+        try:
+            image_sizes[image] = storage.size(image)
+        except OSError:
+            image_sizes[image] = None
+
+    if image_sizes[image] is None:
+        raise ValidationError(f'The image {image} does not exist in the storage.')
+
+    if image_sizes[image] > settings.MAX_UPLOAD_SIZE:
+        raise ValidationError(get_image_size_message(settings.MAX_UPLOAD_SIZE))
+
+    # The fingerprint of a plant without SKU is never compared, the feed can't address it
+    fingerprint = offer_fingerprint(price, discount_percentage, stock_count) if sku else ''
+
+    return (uuid.uuid4(), sku, name, description, price, discount_percentage, stock_count, image, rating, fingerprint)
+
+
+def copy_value(value) -> str:
+    """Encode a value for the text format of PostgreSQL COPY."""
+
+    if value is None:
+        return '\\N'
+
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+def copy_plants(connection, rows):
+    """
+    Insert the rows (values in the order of COPY_FIELDS) with a single PostgreSQL COPY.
+
+    Raises the django.db exceptions, e.g. IntegrityError for a duplicate SKU.
+    """
+
+    buffer = io.StringIO()
+
+    for row in rows:
+        buffer.write('\t'.join(copy_value(value) for value in row))
+        buffer.write('\n')
+
+    buffer.seek(0)
+
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(quote_name(Plant._meta.get_field(field).column) for field in COPY_FIELDS)
+
+    # copy_expert() is not wrapped by Django: translate the psycopg2 errors (e.g. a duplicate
+    # SKU) into the django.db exceptions like the other queries
+    with connection.cursor() as cursor, connection.wrap_database_errors:
+        cursor.copy_expert(f'COPY {quote_name(Plant._meta.db_table)} ({columns}) FROM STDIN', buffer)
+
+
+def bulk_create_plants(connection, rows):
+    """Insert the rows with a multi-row INSERT, on the databases without COPY (e.g. SQLite)."""
+
+    plants = [Plant(**dict(zip(COPY_FIELDS, row))) for row in rows]
+
+    Plant.objects.using(connection.alias).bulk_create(plants)
+
+
+class PlantImporter:
+    """
+    Loads plants into the catalog in batches, without calling Plant.save() for every row.
+
+    The rows are validated by clean_plant_row() and inserted batch by batch: with COPY on
+    PostgreSQL (the fastest way to load rows, no SQL to parse per row), with bulk_create
+    elsewhere. Only one batch is held in memory at a time. The search vectors of a batch
+    are built by one UPDATE after the insert, the catalog caches are invalidated once at
+    the end. The invalidation bumps the versions in the database (see inventory/cache.py),
+    so the web processes see it although the command runs in a process of its own, with
+    its own caches. The image variants are not generated, that's left to generate_image_variants.
+
+    The importer is meant to run inside a transaction, so a failed import leaves nothing behind.
+    """
+
+    def __init__(self, using='default', batch_size=5000, skip_invalid=False):
+        self.connection = connections[using]
+        self.batch_size = batch_size
+        self.skip_invalid = skip_invalid
+        self.storage = Plant._meta.get_field('image').storage
+
+        self.imported = 0
+        self.errors = [] # (line number, message) of the skipped rows
+        self._image_sizes = {}
+
+
+    def insert(self, rows):
+        """Insert a batch of cleaned rows and build their search vectors."""
+
+        if self.connection.vendor == 'postgresql':
+            copy_plants(self.connection, rows)
+        else:
+            bulk_create_plants(self.connection, rows)
+
+        update_search_vectors(Plant.objects.using(self.connection.alias).filter(id__in=[row[0] for row in rows]))
+        self.imported += len(rows)
+
+
+    def clean_row(self, row, now) -> tuple:
+        """Return the values of a new plant in the order of COPY_FIELDS. Raises ValidationError."""
+
+        if isinstance(row, ValidationError):
+            raise row # The line couldn't be parsed
+
+        values = clean_plant_row(row, self.storage, self._image_sizes)
+
+        return (*values, now, {}, '') # No image variants and placeholder yet
+
+
+    def report_error(self, line_number, error):
+        """Raise the error with its line number, or record it with skip_invalid."""
+
+        message = f'Line {line_number}: {" ".join(error.messages)}'
+
+        if not self.skip_invalid:
+            raise ValidationError(message)
+
+        self.errors.append((line_number, message))
+
+
+    def clean(self, numbered_rows):
+        """
+        Yield the cleaned values of the rows. An invalid row raises ValidationError
+        (with its line number), or is recorded in self.errors with skip_invalid.
+        """
+
+        now = timezone.now()
+
+        for line_number, row in numbered_rows:
+            try:
+                values = self.clean_row(row, now)
+            except ValidationError as error:
+                self.report_error(line_number, error)
+                continue
+
+            yield values
+
+
+    def run(self, numbered_rows, progress=None) -> int:
+        """
+        Import the (line number, row) pairs, e.g. from read_plant_rows(). progress(imported)
+        is called after every batch. Returns the number of imported plants.
+        """
+
+        cleaned = self.clean(numbered_rows)
+
+        while batch := list(islice(cleaned, self.batch_size)):
+            self.insert(batch)
+
+            if progress is not None:
+                progress(self.imported)
+
+        if self.imported:
+            invalidate_catalog()
+            invalidate_plant_names()
+
+        return self.imported
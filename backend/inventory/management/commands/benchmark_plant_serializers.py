@@ -0,0 +1,87 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from inventory.benchmarks import check_benchmark_allowed, create_benchmark_plants
+from inventory.models import Plant
+from inventory.serializers import PlantSerializer, PlantListSerializer
+
+
+class Command(BaseCommand):
+    """
+    Compare the throughput (rows per second) of PlantSerializer and PlantListSerializer.
+
+    For every size, the plants are inserted inside a transaction that is rolled back at
+    the end, and only these plants are serialized: the rest of the catalog is neither
+    read nor changed. The measured time covers the query, the serialization and the JSON
+    rendering, which is what a list request pays for. The command also checks that both
+    serializers render the same bytes.
+
+    The rows are written to the configured database, so the command refuses to run when
+    DEBUG is off, unless --yes is passed.
+
+    Usage:
+        python manage.py benchmark_plant_serializers
+        python manage.py benchmark_plant_serializers --sizes 1000 10000 --repeat 5
+        python manage.py benchmark_plant_serializers --yes (DEBUG off)
+    """
+
+    help = 'Benchmark the plant serializers at different catalog sizes (rows per second).'
+
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+            help='Numbers of plants to serialize (default: 1000 10000 100000).'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Number of runs per size, the best run is reported (default: 3).'
+        )
+        parser.add_argument(
+            '--yes', action='store_true',
+            help='Run even though DEBUG is off (the rows are rolled back, but written to the configured database).'
+        )
+
+
+    def handle(self, *args, **options):
+        if options['repeat'] <= 0 or any(size <= 0 for size in options['sizes']):
+            raise CommandError('The sizes and the number of runs must be positive.')
+
+        check_benchmark_allowed(options['yes'])
+
+        renderer = JSONRenderer()
+
+        serializers = {
+            'PlantSerializer': lambda queryset: PlantSerializer(queryset, many=True).data,
+            'PlantListSerializer': lambda queryset: PlantListSerializer(PlantListSerializer.get_rows(queryset)).data,
+        }
+
+        self.stdout.write(f"{'rows':>8}  {'serializer':<20}  {'rows/s':>12}  {'seconds':>8}")
+
+        for size in options['sizes']:
+            with transaction.atomic():
+                ids = create_benchmark_plants(size)
+                queryset = Plant.objects.filter(id__in=ids).order_by('id')
+
+                rendered = {}
+                for name, serialize in serializers.items():
+                    best = None
+
+                    for _ in range(options['repeat']):
+                        start = time.perf_counter()
+                        rendered[name] = renderer.render(serialize(queryset.all()))
+                        elapsed = time.perf_counter() - start
+
+                        best = elapsed if best is None else min(best, elapsed)
+
+                    self.stdout.write(f'{size:>8}  {name:<20}  {size / best:>12,.0f}  {best:>8.3f}')
+
+                if len(set(rendered.values())) != 1:
+                    raise CommandError(f'The serializers rendered different JSON for {size} plants.')
+
+                # Leave the database as it was
+                transaction.set_rollback(True)
+
@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.models import Plant
+from inventory.storage import get_reference_counts, walk_storage
+
+
+class Command(BaseCommand):
+    """
+    Delete the plant images and image variants that are no longer referenced by any plant.
+
+    The stored files are shared between the plants that have the same image, so they are
+    not deleted when a plant changes or is deleted (see ContentAddressedStorage). This
+    command compares the files of the storage with the references held by the database
+    and deletes the orphans. The files modified recently are spared, they may belong to
+    an upload whose transaction is not committed yet.
+
+    Usage:
+        python manage.py collect_plant_images --dry-run
+        python manage.py collect_plant_images --min-age 3600
+    """
+
+    help = 'Delete the plant image files that are no longer referenced by any plant.'
+
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='List the orphaned files without deleting them.'
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=24 * 60 * 60,
+            help='Only delete the files that were not modified for this number of seconds (default: one day).'
+        )
+
+
+    def handle(self, *args, **options):
+        if options['min_age'] < 0:
+            raise CommandError('The minimum age cannot be negative.')
+
+        field = Plant._meta.get_field('image')
+        storage = field.storage
+        cutoff = timezone.now() - timedelta(seconds=options['min_age'])
+
+        # Read the references first, a file stored afterwards is spared by its age
+        references = get_reference_counts()
+        deleted = 0
+        freed = 0
+
+        for name in walk_storage(storage, field.upload_to.rstrip('/')):
+            if references[name] or storage.get_modified_time(name) > cutoff:
+                continue
+
+            size = storage.size(name)
+
+            if options['dry_run']:
+                self.stdout.write(name)
+            else:
+                storage.delete(name)
+
+            deleted += 1
+            freed += size
+
+        action = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(f'{action} {deleted} orphaned files ({freed / 1024 / 1024:.1f} MB).')
@@ -0,0 +1,91 @@
+import sys
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from inventory.exports import EXPORT_CHUNK_SIZE, EXPORT_TYPES, export_plants
+
+
+class Command(BaseCommand):
+    """
+    Export the whole catalog to a CSV or JSONL file, e.g. for the nightly analytics export.
+
+    The plants are streamed from the database in chunks and written as they come, so the
+    memory used is constant. The output is gzipped with --gzip or when the file name
+    ends with '.gz'. An interrupted export can be resumed with --after and the id of
+    the last exported plant (the plants are exported in the order of their ids).
+
+    Usage:
+        python manage.py export_plants --output plants.csv.gz
+        python manage.py export_plants --type jsonl --output - | gzip > plants.jsonl.gz
+        python manage.py export_plants --output rest.csv --after 3f2a...
+    """
+
+    help = 'Export the plants to a CSV or JSONL file with constant memory.'
+
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type', choices=list(EXPORT_TYPES), default='csv',
+            help='Format of the export (default: csv).'
+        )
+        parser.add_argument(
+            '--output', default='-',
+            help='The file to write, or - for the standard output (default).'
+        )
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Compress the output (implied by an output name ending with .gz).'
+        )
+        parser.add_argument(
+            '--after', type=uuid.UUID,
+            help='Resume after the plant with this id.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+            help=f'Number of rows fetched from the database at a time (default: {EXPORT_CHUNK_SIZE}).'
+        )
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database to export from (default: "default").'
+        )
+
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError('The chunk size must be positive.')
+
+        output = options['output']
+        compress = options['gzip'] or output.endswith('.gz')
+
+        blocks = export_plants(
+            options['type'],
+            after=options['after'],
+            compress=compress,
+            chunk_size=options['chunk_size'],
+            using=options['database'],
+        )
+
+        started = time.perf_counter()
+        written = 0
+
+        try:
+            file = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        except OSError as error:
+            raise CommandError(f'Cannot write {output}: {error}')
+
+        try:
+            for block in blocks:
+                file.write(block)
+                written += len(block)
+        finally:
+            if output == '-':
+                file.flush()
+            else:
+                file.close()
+
+        # The summary goes to stderr, stdout may hold the export itself
+        elapsed = time.perf_counter() - started
+        self.stderr.write(f'Exported {written / 1024 / 1024:.1f} MB in {elapsed:.1f}s.', style_func=None)
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from inventory.images import generate_plant_variants, needs_variants
+from inventory.models import Plant
+
+
+class Command(BaseCommand):
+    """
+    Generate the resized images and the placeholders of the plants whose variants are
+    missing or outdated, e.g. the plants created before the variants (or the placeholders)
+    existed or written without Plant.save().
+
+    Usage:
+        python manage.py generate_image_variants
+        python manage.py generate_image_variants --all
+    """
+
+    help = 'Generate the missing WebP and JPEG variants and placeholders of the plant images.'
+
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Regenerate the variants of every plant, e.g. after a change of the widths or the formats.'
+        )
+
+
+    def handle(self, *args, **options):
+        plants = Plant.objects.only('id', 'image', 'image_variants', 'image_placeholder').order_by('id')
+        generated = 0
+
+        for plant in plants.iterator():
+            if options['all'] or needs_variants(plant):
+                generate_plant_variants(plant.id)
+                generated += 1
+
+        self.stdout.write(f'Generated the image variants of {generated} plants.')
@@ -0,0 +1,96 @@
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+
+from inventory.imports import PlantImporter, guess_plant_file_format, open_plant_file, read_plant_rows
+
+
+class Command(BaseCommand):
+    """
+    Import a supplier catalog from a CSV or JSONL file, without calling Plant.save() per row.
+
+    The file is streamed and loaded in batches (COPY on PostgreSQL, bulk_create elsewhere),
+    so the memory used doesn't depend on the size of the file. The image column holds the
+    names of files already in the plant image storage (e.g. 'plants/3f/3f2a...c9.jpg').
+    The plants with a SKU can be kept up to date afterwards by sync_plant_feed.
+    The whole import runs in one transaction: an invalid row stops it and nothing is
+    imported, unless --skip-invalid is given.
+
+    The image variants of the imported plants are generated afterwards by
+    generate_image_variants.
+
+    Usage:
+        python manage.py import_plants catalog.csv
+        python manage.py import_plants catalog.jsonl --batch-size 10000 --skip-invalid
+        gunzip -c catalog.csv.gz | python manage.py import_plants - --format csv
+    """
+
+    help = 'Import plants from a CSV or JSONL file with bulk inserts.'
+
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The file to import, or - to read the standard input.')
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help='Format of the file (default: guessed from the extension).'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of rows inserted at once (default: 5000).'
+        )
+        parser.add_argument(
+            '--skip-invalid', action='store_true',
+            help='Report and skip the invalid rows instead of cancelling the import.'
+        )
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database to import into (default: "default").'
+        )
+
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('The batch size must be positive.')
+
+        try:
+            file_format = options['format'] or guess_plant_file_format(options['path'])
+        except ValidationError as error:
+            raise CommandError(' '.join(error.messages))
+
+        importer = PlantImporter(
+            using=options['database'],
+            batch_size=options['batch_size'],
+            skip_invalid=options['skip_invalid'],
+        )
+
+        started = time.perf_counter()
+
+        def progress(imported):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{imported} plants imported ({imported / elapsed:.0f} rows/s)')
+
+        try:
+            with open_plant_file(options['path']) as file, transaction.atomic(using=options['database']):
+                importer.run(read_plant_rows(file, file_format), progress if options['verbosity'] > 1 else None)
+        except ValidationError as error:
+            raise CommandError(f'{" ".join(error.messages)} Nothing was imported.')
+        except IntegrityError as error:
+            raise CommandError(f'The import conflicts with the catalog (duplicate SKU?): {error}. Nothing was imported.')
+        except OSError as error:
+            raise CommandError(f'Cannot read {options["path"]}: {error}')
+
+        for line_number, message in importer.errors:
+            self.stderr.write(f'Skipped {message}')
+
+        elapsed = time.perf_counter() - started
+        rate = importer.imported / elapsed if elapsed else 0
+
+        self.stdout.write(
+            f'Imported {importer.imported} plants in {elapsed:.1f}s ({rate:.0f} rows/s), '
+            f'skipped {len(importer.errors)} invalid rows.'
+        )
+
+        if importer.imported:
+            self.stdout.write('Run generate_image_variants to create the resized images of the new plants.')
@@ -0,0 +1,105 @@
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from inventory.feeds import PlantFeedSync
+from inventory.imports import guess_plant_file_format, open_plant_file, read_plant_rows
+
+
+class Command(BaseCommand):
+    """
+    Apply the hourly supplier feed (CSV or JSONL) to the catalog.
+
+    Every record needs a sku, a price, and optionally a discount_percentage and a
+    stock_count. Only the plants whose values changed since the last feed are written,
+    the new SKUs are inserted (their records also need a name and an image, like with
+    import_plants) and the plants missing from the feed are reported, or deleted with
+    --delete-missing. The sync runs in one transaction: an invalid record stops it and
+    nothing is written, unless --skip-invalid is given.
+
+    Usage:
+        python manage.py sync_plant_feed feed.csv
+        python manage.py sync_plant_feed feed.jsonl --dry-run
+        python manage.py sync_plant_feed feed.csv --delete-missing --skip-invalid
+    """
+
+    help = 'Apply a supplier price and stock feed, writing only the plants that changed.'
+
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The feed file, or - to read the standard input.')
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help='Format of the file (default: guessed from the extension).'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of changed rows written at once (default: 5000).'
+        )
+        parser.add_argument(
+            '--skip-invalid', action='store_true',
+            help='Report and skip the invalid records instead of cancelling the sync.'
+        )
+        parser.add_argument(
+            '--delete-missing', action='store_true',
+            help='Delete the plants whose SKU is not in the feed.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report the changes without writing them.'
+        )
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database to sync (default: "default").'
+        )
+
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('The batch size must be positive.')
+
+        try:
+            file_format = options['format'] or guess_plant_file_format(options['path'])
+        except ValidationError as error:
+            raise CommandError(' '.join(error.messages))
+
+        sync = PlantFeedSync(
+            using=options['database'],
+            batch_size=options['batch_size'],
+            skip_invalid=options['skip_invalid'],
+            delete_missing=options['delete_missing'],
+            dry_run=options['dry_run'],
+        )
+
+        started = time.perf_counter()
+
+        def progress(summary):
+            self.stdout.write(self.format_summary(summary))
+
+        try:
+            with open_plant_file(options['path']) as file, transaction.atomic(using=options['database']):
+                summary = sync.run(read_plant_rows(file, file_format), progress if options['verbosity'] > 1 else None)
+        except ValidationError as error:
+            raise CommandError(f'{" ".join(error.messages)} Nothing was changed.')
+        except OSError as error:
+            raise CommandError(f'Cannot read {options["path"]}: {error}')
+
+        for line_number, message in sync.errors:
+            self.stderr.write(f'Skipped {message}')
+
+        if options['verbosity'] > 1:
+            for sku in sync.missing:
+                self.stdout.write(f'Missing from the feed: {sku}')
+
+        elapsed = time.perf_counter() - started
+        prefix = 'Dry run, would apply: ' if options['dry_run'] else ''
+
+        self.stdout.write(f'{prefix}{self.format_summary(summary)} in {elapsed:.1f}s.')
+
+
+    def format_summary(self, summary) -> str:
+        """Return the diff summary as text, e.g. '3 inserted, 300 updated, ...'."""
+
+        return ', '.join(f'{count} {change}' for change, count in summary.items())
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_plant_rating_plant_inventory_rating_between_0_and_5'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='plant',
+            index=models.Index(fields=['-rating', 'id'], name='plant_rating_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plant',
+            index=models.Index(fields=['price', 'id'], name='plant_price_id_idx'),
+        ),
+    ]
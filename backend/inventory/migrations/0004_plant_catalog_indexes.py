@@ -0,0 +1,41 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_plant_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='plant',
+            name='plant_rating_id_idx',
+        ),
+        migrations.AddIndex(
+            model_name='plant',
+            index=models.Index(fields=['rating', 'id'], name='plant_rating_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plant',
+            index=models.Index(fields=['name', 'id'], name='plant_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plant',
+            index=models.Index(condition=models.Q(('stock_count__gt', 0)), fields=['price', 'id'], name='plant_in_stock_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plant',
+            index=models.Index(condition=models.Q(('stock_count__gt', 0)), fields=['rating', 'id'], name='plant_in_stock_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plant',
+            index=models.Index(condition=models.Q(('stock_count__gt', 0)), fields=['name', 'id'], name='plant_in_stock_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plant',
+            index=models.Index(condition=models.Q(('discount_percentage__gt', 0)), fields=['price', 'id'], name='plant_on_discount_price_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:10
+
+import django.db.models.expressions
+import django.db.models.functions.math
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_plant_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='plant',
+            name='plant_price_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='plant',
+            name='plant_in_stock_price_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='plant',
+            name='plant_on_discount_price_idx',
+        ),
+        migrations.AddField(
+            model_name='plant',
+            name='discounted_price',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('price'), '*', django.db.models.expressions.CombinedExpression(models.Value(100), '-', models.F('discount_percentage'))), '*', models.Value(Decimal('0.01'))), 2), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddIndex(
+            model_name='plant',
+            index=models.Index(fields=['discounted_price', 'id'], name='plant_discounted_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plant',
+            index=models.Index(condition=models.Q(('stock_count__gt', 0)), fields=['discounted_price', 'id'], name='plant_in_stock_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plant',
+            index=models.Index(condition=models.Q(('discount_percentage__gt', 0)), fields=['discounted_price', 'id'], name='plant_on_discount_price_idx'),
+        ),
+    ]
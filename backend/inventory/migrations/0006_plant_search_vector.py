@@ -0,0 +1,63 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+SEARCH_INDEX = django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='plant_search_vector_idx')
+
+
+def create_search_index(apps, schema_editor):
+    """Create the GIN index and fill the search vectors of the existing plants (PostgreSQL only)."""
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    Plant = apps.get_model('inventory', 'Plant')
+    schema_editor.add_index(Plant, SEARCH_INDEX)
+
+    Plant.objects.using(schema_editor.connection.alias).update(
+        search_vector=(
+            SearchVector('name', weight='A', config='english')
+            + SearchVector('description', weight='B', config='english')
+        )
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    """Drop the GIN index (PostgreSQL only)."""
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    Plant = apps.get_model('inventory', 'Plant')
+    schema_editor.remove_index(Plant, SEARCH_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_plant_discounted_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plant',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # GIN indexes only exist on PostgreSQL, the other databases keep the index in the state only
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='plant',
+                    index=SEARCH_INDEX,
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_index, drop_search_index),
+            ],
+        ),
+    ]
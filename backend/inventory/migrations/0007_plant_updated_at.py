@@ -0,0 +1,20 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_plant_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plant',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_plant_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plant',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
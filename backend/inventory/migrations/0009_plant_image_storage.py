@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:31
+
+import inventory.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_plant_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='plant',
+            name='image',
+            field=models.ImageField(storage=inventory.storage.get_plant_image_storage, upload_to='plants/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_plant_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plant',
+            name='image_placeholder',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+    ]
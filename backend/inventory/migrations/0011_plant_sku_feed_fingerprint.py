@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_plant_image_placeholder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plant',
+            name='feed_fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='plant',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
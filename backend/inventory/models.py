@@ -1,8 +1,17 @@
 import uuid
+from decimal import Decimal, ROUND_HALF_UP
 
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.conf import settings
+from django.db import models, router
+from django.db.models.functions import Round
 from django.core.exceptions import ValidationError
 
+from .search import plant_search_vector_from_values, supports_full_text_search
+from .validators import get_image_size_message, read_image_header
+from .storage import get_plant_image_storage
+
 import os
 
 # Create your models here.
@@ -17,11 +26,61 @@ class Plant(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     discount_percentage = models.PositiveIntegerField(default=0)
     stock_count = models.PositiveIntegerField(default=0)
-    image = models.ImageField(upload_to='plants/', blank=False, null=False)
+    image = models.ImageField(upload_to='plants/', storage=get_plant_image_storage, blank=False, null=False) # Named by content hash
     rating = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    # Identifier of the plant in the supplier feed (see feeds.py), and the hash of the
+    # price, discount and stock of the last feed record applied to the plant
+    sku = models.CharField(max_length=64, unique=True, blank=True, null=True)
+    feed_fingerprint = models.CharField(max_length=64, blank=True, default='', editable=False)
+    
+    # Storage names of the resized copies of the image, generated in the background
+    # (see images.py): {"source": <image name>, "webp": {<width>: <name>}, "jpeg": {...}}
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    
+    # Tiny blurred version of the image as a data URI, displayed while the image is loading
+    image_placeholder = models.TextField(default='', blank=True, editable=False)
+    
+    # The price the customer actually pays. It is computed and stored by the database
+    # whenever the price or the discount_percentage changes, so it can be indexed and
+    # used for filtering and sorting. Rounded to cents, like get_discounted_price().
+    discounted_price = models.GeneratedField(
+        # Multiplying by 0.01 instead of dividing by 100 avoids an integer division on SQLite
+        expression=Round(models.F('price') * (100 - models.F('discount_percentage')) * Decimal('0.01'), 2),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True
+    )
+    
+    # Weighted full-text search vector of the name and the description (PostgreSQL only).
+    # It is rebuilt by save() and stays empty on databases without full-text search.
+    search_vector = SearchVectorField(null=True, editable=False)
+    
+    # Fields held by the autocomplete index (see autocomplete.py). Their values loaded from
+    # the database are remembered, so a save can tell whether the index must be updated.
+    autocomplete_fields = ('name', 'rating')
     
     
     class Meta:
+        indexes = [
+            # Composite keys used by the ordering and the keyset pagination of the plant list.
+            # Each of them can be scanned in both directions (e.g. "Low to High" and "High to Low").
+            models.Index(fields=['discounted_price', 'id'], name='plant_discounted_price_id_idx'),
+            models.Index(fields=['rating', 'id'], name='plant_rating_id_idx'),
+            models.Index(fields=['name', 'id'], name='plant_name_id_idx'),
+            
+            # Partial indexes for the "In stock" filter combined with each ordering
+            models.Index(fields=['discounted_price', 'id'], condition=models.Q(stock_count__gt=0), name='plant_in_stock_price_idx'),
+            models.Index(fields=['rating', 'id'], condition=models.Q(stock_count__gt=0), name='plant_in_stock_rating_idx'),
+            models.Index(fields=['name', 'id'], condition=models.Q(stock_count__gt=0), name='plant_in_stock_name_idx'),
+            
+            # Partial index for the "On discount" filter, which usually selects a small part of the catalog
+            models.Index(fields=['discounted_price', 'id'], condition=models.Q(discount_percentage__gt=0), name='plant_on_discount_price_idx'),
+            
+            # Full-text search index (created only on PostgreSQL, see migration 0006)
+            GinIndex(fields=['search_vector'], name='plant_search_vector_idx'),
+        ]
+        
         constraints = [
             # Check constraint to ensure price is greater than 0
             models.CheckConstraint(check=models.Q(price__gt=0), name='price_positive'),
@@ -43,15 +102,64 @@ class Plant(models.Model):
         ]
     
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Create the instance from a database row and remember the values of its autocomplete fields."""
+        
+        instance = super().from_db(db, field_names, values)
+        instance.remember_autocomplete_values(cls.autocomplete_fields)
+        
+        return instance
+    
+    
     def __str__(self):
         """Return a human-readable string representation of the Plant object."""
         return self.name
     
     
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        """Reload the fields from the database (also used to load the deferred fields) and remember the autocomplete ones."""
+        
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self.remember_autocomplete_values(self.autocomplete_fields if fields is None else fields)
+    
+    
+    def remember_autocomplete_values(self, fields):
+        """Remember the current values of the given (and loaded) autocomplete fields as the values in the database."""
+        
+        saved_values = getattr(self, '_autocomplete_values', {})
+        saved_values.update(
+            (field, self.__dict__[field]) for field in self.autocomplete_fields if field in fields and field in self.__dict__
+        )
+        
+        self._autocomplete_values = saved_values
+    
+    
+    def autocomplete_values_changed(self, update_fields=None) -> bool:
+        """
+        Return True if the name or the rating differ from the values in the database, or
+        if these values are unknown (the plant wasn't loaded from the database). Only the
+        update_fields are compared when they are given.
+        """
+        
+        fields = [field for field in self.autocomplete_fields if update_fields is None or field in update_fields]
+        saved_values = getattr(self, '_autocomplete_values', {})
+        
+        return any(field not in saved_values or saved_values[field] != getattr(self, field) for field in fields)
+    
+    
     def get_discounted_price(self):
-        """Calculate and return discounted price."""
+        """
+        Calculate and return discounted price.
         
-        return self.price - (self.price * self.discount_percentage / 100)
+        Saved plants also have the same value in the discounted_price column, 
+        this method is useful for the objects that are not saved yet.
+        """
+        
+        price = Decimal(str(self.price)) # The price can be a float if the object is not saved yet
+        discounted_price = price * (100 - self.discount_percentage) / 100
+        
+        return discounted_price.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
     
     
     @property
@@ -98,12 +206,16 @@ class Plant(models.Model):
         if file_extension not in valid_image_format:
             raise ValidationError('Only PNG, JPG and JPEG images are allowed.')
         
-        # Check the image field size (limit to 10 MB)
-        max_size = 10 * 1024 * 1024 # Declare max_size variable for the image field 
+        # Check the image field size, the limit also enforced while the upload is received (see uploadhandlers.py)
+        max_size = settings.MAX_UPLOAD_SIZE
     
         # Check if the image field size does not exceed the maximum allowed size
         if self.image.size > max_size:
-            raise ValidationError(f'The image field file cannot exceed {max_size / 1024 / 1024}MB.')
+            raise ValidationError(get_image_size_message(max_size))
+        
+        # Check the content of a new upload (magic bytes, dimensions), only its header is read
+        if not self.image._committed:
+            read_image_header(self.image.file, file_extension)
 
         # Make sure that the rating field is positive and less than or equal to five.
         if self.rating < 0 or self.rating > 5:
@@ -114,7 +226,51 @@ class Plant(models.Model):
         """Ensure that the 'clean' method is called before the instance would be saved."""
         
         self.clean() # Call the 'clean' method
+        adding = self._state.adding
+        
+        # Rebuild the search vector in the same statement that saves the plant
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        update_fields = kwargs.get('update_fields')
+        rebuild_search_vector = supports_full_text_search(using) and (
+            update_fields is None or {'name', 'description'} & set(update_fields)
+        )
+        
+        if rebuild_search_vector:
+            self.search_vector = plant_search_vector_from_values(self.name, self.description)
+            
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_vector'}
+        
         super().save(*args, **kwargs)
         
+        # The search vector now holds an expression, mark it as deferred so it's reloaded on access
+        if rebuild_search_vector:
+            self.__dict__.pop('search_vector', None)
+        
+        # The database returns the generated columns only on INSERT. After an UPDATE,
+        # mark the discounted_price as deferred so it is reloaded on the next access.
+        if not adding:
+            self.__dict__.pop('discounted_price', None)
         
-        
\ No newline at end of file
+        # The post_save signal has compared the autocomplete fields, the saved values are now in the database
+        self.remember_autocomplete_values(self.autocomplete_fields if update_fields is None else update_fields)
+
+
+
+class CatalogVersion(models.Model):
+    """
+    Version counters of the catalog data held in memory by the processes.
+    
+    A counter is bumped by the same transaction as the change it reflects (see
+    cache.bump_version). It lives in the database rather than in a cache, so a change
+    made by any process (a web worker, a management command, a shell) is seen by all
+    the others, and a rolled back change doesn't leave a bump behind.
+    """
+    
+    key = models.CharField(max_length=50, primary_key=True) # e.g. 'plant-names'
+    version = models.BigIntegerField()
+    updated_at = models.DateTimeField()
+    
+    def __str__(self):
+        """Return a human-readable string representation of the CatalogVersion object."""
+        return f'{self.key}: {self.version}'
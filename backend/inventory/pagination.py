@@ -0,0 +1,237 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .filters import PlantOrderingFilter
+
+
+class PlantCursorPagination(BasePagination):
+    """
+    Keyset (cursor) pagination for the Plant catalog.
+
+    Rows are ordered by a stable composite key that always ends with the primary key,
+    so every position in the catalog is unique. The cursor is an opaque token holding
+    the key of the last row of the previous page, and the next page is fetched with a
+    `WHERE (key) > (cursor)` condition instead of an OFFSET. Because of that, page N
+    costs exactly the same as page 1, no matter how large the catalog grows.
+
+    Query parameters:
+        - cursor: The opaque token returned as `next_cursor` by the previous page.
+        - page_size: The number of plants per page (capped by `max_page_size`).
+        - ordering: One of the sort keys accepted by PlantOrderingFilter.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    page_size = 24 # Number of plants returned when the page_size is not provided
+    max_page_size = 100 # Upper limit for the page_size query parameter
+
+    # Provides the available orderings. Every ordering ends with the primary
+    # key to make the key unique, otherwise rows with equal values would be skipped.
+    ordering_filter_class = PlantOrderingFilter
+
+    invalid_cursor_message = 'Invalid cursor'
+
+
+    def is_requested(self, request) -> bool:
+        """Return True if the client asked for a paginated response."""
+
+        return any(
+            param in request.query_params
+            for param in (self.cursor_query_param, self.page_size_query_param)
+        )
+
+
+    def get_cache_params(self, request) -> dict:
+        """Return the pagination parameters of the request in a canonical form (the page size clamped)."""
+
+        if not self.is_requested(request):
+            return {}
+
+        return {
+            self.cursor_query_param: request.query_params.get(self.cursor_query_param, ''),
+            self.page_size_query_param: str(self.get_page_size(request)),
+        }
+
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return a single page of the ordered queryset that starts right after the cursor."""
+
+        self.request = request
+
+        # The links are built from the canonical URL of the cached views, so a cached page
+        # doesn't carry the unknown query parameters of the request that rendered it
+        get_canonical_url = getattr(view, 'get_canonical_url', None)
+        self.base_url = get_canonical_url(request) if get_canonical_url else request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request)
+
+        queryset = queryset.order_by(*self.ordering)
+
+        # Continue right after the last row of the previous page
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+
+        # Fetch one extra row to find out if there is a next page
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        return self.page
+
+
+    def get_paginated_response(self, data):
+        """Wrap the serialized page together with the links to the next page."""
+
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.get_next_cursor(),
+            'results': data,
+        })
+
+
+    def get_page_size(self, request) -> int:
+        """Return the page_size query parameter clamped to (0, max_page_size]."""
+
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+
+    def get_ordering(self, request) -> tuple:
+        """Return the ordering fields that match the ordering query parameter."""
+
+        return self.ordering_filter_class().get_ordering(request)
+
+
+    def get_keyset_filter(self, position) -> Q:
+        """
+        Build the condition that selects the rows placed after the given position.
+
+        For the ordering (a, b, c) this expands to:
+            a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        where '>' becomes '<' for the fields in descending order.
+        """
+
+        keyset_filter = Q()
+        equal_prefix = Q()
+
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+
+            keyset_filter |= equal_prefix & Q(**{f'{name}__{lookup}': value})
+            equal_prefix &= Q(**{name: value})
+
+        return keyset_filter
+
+
+    def get_next_cursor(self):
+        """Return the opaque cursor that points to the last row of the page."""
+
+        if not self.has_next:
+            return None
+
+        last = self.page[-1]
+
+        # The page holds model instances or, for the values() querysets, dictionaries
+        if isinstance(last, dict):
+            position = [str(last[field.lstrip('-')]) for field in self.ordering]
+        else:
+            position = [str(getattr(last, field.lstrip('-'))) for field in self.ordering]
+
+        return self.encode_cursor(position)
+
+
+    def get_next_link(self):
+        """Return the absolute URL of the next page or None if this is the last page."""
+
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+
+    def encode_cursor(self, position) -> str:
+        """Encode the ordering name and the position into an opaque URL-safe token."""
+
+        payload = json.dumps({'o': list(self.ordering), 'p': position}, separators=(',', ':'))
+
+        return urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+    def decode_cursor(self, request, model):
+        """
+        Decode the cursor query parameter and return the position it points to.
+        Every value is converted to the Python type of the matching model field
+        and checked against its validators.
+
+        Raises NotFound if the cursor is malformed or was issued for another ordering.
+        """
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            padding = '=' * (-len(encoded) % 4)
+            payload = json.loads(urlsafe_b64decode(encoded + padding))
+            ordering, position = payload['o'], payload['p']
+        except (BinasciiError, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # The cursor must belong to the same ordering as the current request
+        if ordering != list(self.ordering) or not isinstance(position, list):
+            raise NotFound(self.invalid_cursor_message)
+
+        if len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        values = [] # Position converted into the types of the ordering fields
+        for field_name, value in zip(self.ordering, position):
+            field = model._meta.get_field(field_name.lstrip('-'))
+
+            # Generated columns are converted by the field that describes their type
+            if field.generated:
+                field = field.output_field
+
+            # The validators bound the value to the column (e.g. the digits of a DecimalField,
+            # the range of an IntegerField), the database would fail on e.g. 1e999999
+            try:
+                value = field.to_python(value)
+                field.run_validators(value)
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+
+            values.append(value)
+
+        return values
+
+
+class PlantSearchPagination(PageNumberPagination):
+    """
+    Page number pagination for the search results.
+
+    Search results are ordered by their rank, which is computed for every match,
+    so they are paginated by page number instead of by a keyset.
+    """
+
+    page_size = 24 # Number of plants returned when the page_size is not provided
+    page_size_query_param = 'page_size'
+    max_page_size = 100 # Upper limit for the page_size query parameter
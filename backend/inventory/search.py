@@ -0,0 +1,88 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+
+
+# Text search configuration used to build and to query the search vectors
+SEARCH_CONFIG = 'english'
+
+
+def supports_full_text_search(using) -> bool:
+    """Return True if the database behind the given alias has PostgreSQL full-text search."""
+
+    return connections[using].vendor == 'postgresql'
+
+
+def plant_search_vector():
+    """
+    Return the expression that builds the weighted search vector of a plant from its columns.
+
+    The name has the highest weight (A), so matches in the name are ranked above
+    the matches found only in the description (B).
+    """
+
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def plant_search_vector_from_values(name, description):
+    """
+    Return the same weighted search vector as plant_search_vector(), but built from values.
+
+    Unlike column references, values can be used when a row is inserted, so the vector
+    is written by the same INSERT/UPDATE statement that saves the plant.
+    """
+
+    return (
+        SearchVector(Value(name or ''), weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Value(description or ''), weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset) -> int:
+    """
+    Rebuild the search vectors of every plant in the queryset with a single UPDATE.
+
+    Used by the code paths that write plants without calling Plant.save(). Does nothing
+    on databases without full-text search. Returns the number of updated rows.
+    """
+
+    if not supports_full_text_search(queryset.db):
+        return 0
+
+    return queryset.update(search_vector=plant_search_vector())
+
+
+def search_plants(queryset, query):
+    """
+    Return the plants that match the search query, annotated with a 'rank' and ordered by it.
+
+    On PostgreSQL the query is matched against the stored search vector (backed by a GIN
+    index) and ranked with ts_rank. Other databases fall back to a case-insensitive
+    substring match where the name matches are ranked above the description matches.
+    """
+
+    if supports_full_text_search(queryset.db):
+        search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+
+        return (
+            queryset
+            .filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F('search_vector'), search_query))
+            .order_by('-rank', 'id')
+        )
+
+    # Portable fallback: every word must appear in the name or in the description
+    for word in query.split():
+        queryset = queryset.filter(Q(name__icontains=word) | Q(description__icontains=word))
+
+    # Mirror the default weights of ts_rank: 1.0 for A (name) and 0.4 for B (description)
+    return queryset.annotate(
+        rank=Case(
+            When(name__icontains=query, then=Value(1.0)),
+            default=Value(0.4),
+            output_field=FloatField()
+        )
+    ).order_by('-rank', 'id')
@@ -1,22 +1,96 @@
-from rest_framework.serializers import ModelSerializer, SerializerMethodField
+from decimal import Decimal
+
+from rest_framework.serializers import ModelSerializer, SerializerMethodField, DecimalField
 from .models import Plant
+from .images import get_variant_urls
 
 
 class PlantSerializer(ModelSerializer):
     """Serializer for the Plant model."""
 
     # Declare custom fields
-    discounted_price = SerializerMethodField()
+    # The discounted_price is read from the column generated by the database
+    # and rendered as a number, the same way as the former method field.
+    discounted_price = DecimalField(max_digits=10, decimal_places=2, read_only=True, coerce_to_string=False)
     in_stock = SerializerMethodField()
+    image_variants = SerializerMethodField()
     
     class Meta:
         model=Plant
-        fields='__all__'
-
-    def get_discounted_price(self, obj):
-        """Return the discounted price of the plant."""
-        return obj.get_discounted_price()
+        fields=[
+            'id', 'discounted_price', 'in_stock', 'name', 'description', 'price',
+            'discount_percentage', 'stock_count', 'image', 'image_variants',
+            'image_placeholder', 'rating'
+        ]
 
     def get_in_stock(self, obj):
         """Return whether the plant is in stock."""
-        return obj.in_stock
\ No newline at end of file
+        return obj.in_stock
+    
+    def get_image_variants(self, obj):
+        """Return the URLs of the resized images: {format: {width: url}}, empty until they are generated."""
+        return get_variant_urls(obj.image_variants, obj.image.storage.url)
+
+
+class PlantListSerializer:
+    """
+    Fast serializer for the plant lists, produces the same data as PlantSerializer(many=True).
+
+    PlantSerializer builds a model instance for every row and runs every value through the
+    DRF field machinery (Decimal quantization, ImageFieldFile and URL building, method
+    fields). For a large list that cost dominates the response time, so the list endpoints
+    read plain rows with values() and convert them with the minimal code that gives the
+    same representation: the JSON rendered from both serializers is byte-identical
+    (see test_serializers.py, which must be updated together with PlantSerializer).
+    
+    Usage:
+        serializer = PlantListSerializer(PlantListSerializer.get_rows(queryset))
+        serializer.data
+    """
+    
+    # Columns read from the database, in the order of the fields of PlantSerializer
+    columns = (
+        'id', 'discounted_price', 'name', 'description', 'price',
+        'discount_percentage', 'stock_count', 'image', 'image_variants',
+        'image_placeholder', 'rating'
+    )
+    
+    # Quantum of the decimal fields (decimal_places=2)
+    price_quantum = Decimal('0.01')
+    
+    
+    def __init__(self, rows):
+        self.rows = rows
+    
+    
+    @classmethod
+    def get_rows(cls, queryset):
+        """Return the queryset as dictionaries holding only the serialized columns."""
+        
+        return queryset.values(*cls.columns)
+    
+    
+    @property
+    def data(self) -> list:
+        """Return the serialized plants."""
+        
+        quantum = self.price_quantum
+        storage_url = Plant._meta.get_field('image').storage.url
+        
+        return [
+            {
+                'id': str(row['id']),
+                'discounted_price': row['discounted_price'].quantize(quantum),
+                'in_stock': row['stock_count'] > 0,
+                'name': row['name'],
+                'description': row['description'],
+                'price': '{:f}'.format(row['price'].quantize(quantum)),
+                'discount_percentage': row['discount_percentage'],
+                'stock_count': row['stock_count'],
+                'image': storage_url(row['image']) if row['image'] else None,
+                'image_variants': get_variant_urls(row['image_variants'], storage_url),
+                'image_placeholder': row['image_placeholder'],
+                'rating': row['rating'],
+            }
+            for row in self.rows
+        ]
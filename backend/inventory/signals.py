@@ -0,0 +1,72 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .autocomplete import get_plant_names_version, invalidate_plant_names, plant_name_index
+from .cache import invalidate_catalog
+from .images import needs_variants, schedule_plant_variants
+from .models import Plant
+
+
+# Set while the plants are deleted in bulk (see bulk_plant_deletion)
+_bulk_deletion = threading.local()
+
+
+@contextmanager
+def bulk_plant_deletion():
+    """
+    Skip the per-plant work of plant_deleted while many plants are deleted at once. The
+    caller invalidates the catalog and the plant names once for the whole deletion.
+    The other handlers (e.g. of the deleted cart items) still run.
+    """
+
+    previous = getattr(_bulk_deletion, 'active', False)
+    _bulk_deletion.active = True
+
+    try:
+        yield
+    finally:
+        _bulk_deletion.active = previous
+
+
+@receiver(post_save, sender=Plant)
+def plant_saved(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Invalidate the cached catalog, then update the autocomplete index (if the name or
+    the rating changed) and generate the image variants once the transaction is committed.
+    """
+
+    invalidate_catalog()
+
+    plant_id, name, rating = instance.id, instance.name, instance.rating
+
+    # The stock, price and image edits don't make every process reload the index
+    if created or instance.autocomplete_values_changed(update_fields):
+        invalidate_plant_names()
+
+        # The version read after the commit includes the bump of invalidate_plant_names()
+        transaction.on_commit(lambda: plant_name_index.add(plant_id, name, rating, version=get_plant_names_version()))
+
+    # Generate the resized images once the new image is committed
+    if needs_variants(instance):
+        image_name = instance.image.name
+        transaction.on_commit(lambda: schedule_plant_variants(plant_id, image_name))
+
+
+@receiver(post_delete, sender=Plant)
+def plant_deleted(sender, instance, **kwargs):
+    """Invalidate the cached catalog and remove the plant from the autocomplete index once the transaction is committed."""
+
+    if getattr(_bulk_deletion, 'active', False):
+        return # Invalidated once by the bulk deletion
+
+    invalidate_catalog()
+    invalidate_plant_names()
+
+    plant_id = instance.id
+
+    # The version read after the commit includes the bump of invalidate_plant_names()
+    transaction.on_commit(lambda: plant_name_index.remove(plant_id, version=get_plant_names_version()))
@@ -0,0 +1,206 @@
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.db import OperationalError, transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, Value, When
+from django.db.models.functions import Now
+
+from .cache import invalidate_catalog
+from .models import Plant
+
+
+# Largest number of adjustments in a single batch
+MAX_STOCK_ADJUSTMENTS = 5000
+
+# Largest value of the stock_count column (a positive 32-bit integer on every database)
+MAX_STOCK_COUNT = 2147483647
+
+# Number of times a batch is attempted when it runs into a concurrent batch
+STOCK_ATTEMPTS = 3
+
+# SQLSTATEs of the errors caused only by a concurrent transaction: deadlock_detected and
+# serialization_failure. The statement can succeed when it is run again.
+CONFLICT_SQLSTATES = ('40P01', '40001')
+
+
+class StockConflict(Exception):
+    """Raised when a batch of adjustments keeps conflicting with concurrent batches."""
+
+
+def is_conflict(error) -> bool:
+    """Return True if the database error was caused by a concurrent transaction."""
+
+    # Django wraps the error of the driver, which holds the SQLSTATE
+    return getattr(error.__cause__, 'pgcode', None) in CONFLICT_SQLSTATES
+
+
+def is_integer(value) -> bool:
+    """Return True for JSON integers (booleans are integers in Python, but not here)."""
+
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def clean_stock_adjustment(adjustment) -> tuple:
+    """
+    Validate an adjustment and return (key, value, operation, amount):
+        - key: 'id' or 'sku', the field that identifies the plant, and value its value.
+        - operation: 'delta' (added to the current stock) or 'stock_count' (replaces it).
+
+    Raises ValidationError.
+    """
+
+    if not isinstance(adjustment, dict):
+        raise ValidationError('Every adjustment must be an object.')
+
+    keys = [key for key in ('id', 'sku') if adjustment.get(key) not in (None, '')]
+    if len(keys) != 1:
+        raise ValidationError('Every adjustment needs either an "id" or a "sku".')
+
+    key = keys[0]
+    value = adjustment[key]
+
+    if key == 'id':
+        try:
+            value = uuid.UUID(str(value))
+        except ValueError:
+            raise ValidationError(f'"{value}" is not a valid UUID.')
+    else:
+        value = str(value)
+
+    operations = [operation for operation in ('delta', 'stock_count') if operation in adjustment]
+    if len(operations) != 1:
+        raise ValidationError('Every adjustment needs either a "delta" or a "stock_count".')
+
+    operation = operations[0]
+    amount = adjustment[operation]
+
+    if not is_integer(amount):
+        raise ValidationError(f'The {operation} field must be an integer.')
+
+    if operation == 'stock_count' and amount < 0:
+        raise ValidationError('The stock_count field cannot be negative.')
+
+    return key, value, operation, amount
+
+
+def write_stock_adjustments(cleaned) -> tuple:
+    """
+    Lock the plants of the cleaned adjustments (see clean_stock_adjustment), apply them in
+    one transaction and return (results, errors) (see apply_stock_adjustments).
+    """
+
+    results = []
+    errors = []
+
+    ids = [value for _, key, value, _, _ in cleaned if key == 'id']
+    skus = [value for _, key, value, _, _ in cleaned if key == 'sku']
+
+    with transaction.atomic():
+        # Locked in the order of their ids: two batches that share plants wait for each
+        # other instead of each holding a lock the other one needs
+        plants = Plant.objects.select_for_update().filter(Q(id__in=ids) | Q(sku__in=skus)).order_by('id')
+        current = {}
+
+        for plant_id, sku, stock_count in plants.values_list('id', 'sku', 'stock_count'):
+            current[('id', plant_id)] = (plant_id, sku, stock_count)
+            if sku is not None:
+                current[('sku', sku)] = (plant_id, sku, stock_count)
+
+        whens = []
+        adjusted = set()
+
+        for index, key, value, operation, amount in cleaned:
+            if (key, value) not in current:
+                errors.append({'index': index, 'error': f'The plant {value} does not exist.'})
+                continue
+
+            plant_id, sku, stock_count = current[(key, value)]
+
+            # The same plant addressed by its id and by its SKU
+            if plant_id in adjusted:
+                errors.append({'index': index, 'error': f'The plant {value} is adjusted more than once in the batch.'})
+                continue
+
+            new_stock_count = stock_count + amount if operation == 'delta' else amount
+
+            if new_stock_count < 0:
+                errors.append({'index': index, 'error': f'The stock_count of the plant {value} cannot become negative ({stock_count} in stock).'})
+                continue
+
+            if new_stock_count > MAX_STOCK_COUNT:
+                errors.append({'index': index, 'error': f'The stock_count of the plant {value} cannot exceed {MAX_STOCK_COUNT}.'})
+                continue
+
+            adjusted.add(plant_id)
+            whens.append(When(id=plant_id, then=F('stock_count') + amount if operation == 'delta' else Value(amount)))
+            results.append({'index': index, 'id': str(plant_id), 'sku': sku, 'stock_count': new_stock_count})
+
+        if whens:
+            Plant.objects.filter(id__in=adjusted).update(
+                stock_count=Case(*whens, default=F('stock_count'), output_field=PositiveIntegerField()),
+                updated_at=Now(),
+            )
+            invalidate_catalog()
+
+    return results, errors
+
+
+def apply_stock_adjustments(adjustments) -> tuple:
+    """
+    Apply a batch of stock adjustments in one transaction and return (results, errors).
+
+        results: [{"index": 0, "id": "<uuid>", "sku": "...", "stock_count": 12}, ...]
+        errors: [{"index": 3, "error": "..."}, ...]
+
+    An adjustment either adds a delta to the stock ({"sku": "MON-1", "delta": -3}) or sets
+    it ({"id": "<uuid>", "stock_count": 10}). The invalid adjustments, the unknown plants
+    and the adjustments that would make the stock negative are reported in the errors, the
+    others are applied. Plant.save() (and its image checks) is not involved, the whole
+    batch costs two statements:
+        1. SELECT ... FOR UPDATE of the adjusted plants, so the current stock can't change
+           until the commit and the result of every delta can be checked against the
+           valid_stock_count constraint beforehand.
+        2. A single UPDATE with one CASE branch per plant (F('stock_count') + delta for the
+           deltas), which also sets updated_at.
+
+    The plants are locked in the order of their ids, so concurrent batches don't deadlock
+    each other. A batch that still fails because of a concurrent transaction (e.g. with a
+    plant saved in the admin) is attempted again, up to STOCK_ATTEMPTS times, then
+    StockConflict is raised.
+    """
+
+    errors = []
+    cleaned = [] # (index, key, value, operation, amount)
+    seen = set()
+
+    for index, adjustment in enumerate(adjustments):
+        try:
+            key, value, operation, amount = clean_stock_adjustment(adjustment)
+
+            if (key, value) in seen:
+                raise ValidationError(f'The plant {value} is adjusted more than once in the batch.')
+        except ValidationError as error:
+            errors.append({'index': index, 'error': ' '.join(error.messages)})
+            continue
+
+        seen.add((key, value))
+        cleaned.append((index, key, value, operation, amount))
+
+    if not cleaned:
+        return [], errors
+
+    for attempt in range(1, STOCK_ATTEMPTS + 1):
+        try:
+            results, failures = write_stock_adjustments(cleaned)
+            break
+        except OperationalError as error:
+            if not is_conflict(error):
+                raise
+
+            if attempt == STOCK_ATTEMPTS:
+                raise StockConflict('The stock is being adjusted by concurrent requests, try again.') from error
+
+    errors.extend(failures)
+    errors.sort(key=lambda error: error['index'])
+
+    return results, errors
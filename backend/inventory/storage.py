@@ -0,0 +1,116 @@
+import hashlib
+import os
+from collections import Counter
+
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage, storages
+
+
+# Alias of the plant images storage in the STORAGES setting
+PLANT_IMAGES_STORAGE = 'plant_images'
+
+
+def get_plant_image_storage():
+    """
+    Return the storage of the plant images (and of their variants).
+
+    Passed to the image field as a callable, so the backend is read from the STORAGES
+    setting at runtime and changing it doesn't require a migration.
+    """
+
+    return storages[PLANT_IMAGES_STORAGE]
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names every file after the SHA-256 of its content.
+
+    'plants/monstera.jpg' is stored as 'plants/3f/3f2a...c9.jpg' (the first two characters
+    of the hash are a subdirectory, so no directory grows too large). Uploading the same
+    content again, for the same or another plant, returns the name of the stored file
+    instead of writing a copy with a collision suffix. Since a name always designates the
+    same content, the files can be cached by the browsers forever.
+
+    Several plants can reference the same file, so the files are never deleted when a
+    plant changes or is deleted. The files that are no longer referenced are removed by
+    the collect_plant_images management command (see get_reference_counts).
+    """
+
+    hash_chunk_size = 64 * 1024
+
+
+    def __init__(self, **kwargs):
+        # Two identical uploads may race for the same name, they write the same bytes
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(**kwargs)
+
+
+    def save(self, name, content, max_length=None):
+        """Save the content under its hashed name, or just return the name if the content is already stored."""
+
+        if name is None:
+            name = content.name
+
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        name = self.get_hashed_name(name, content)
+
+        if self.exists(name):
+            # Refresh the modification time, so the garbage collection (which spares the
+            # recent files) doesn't delete a file that is about to be referenced again
+            os.utime(self.path(name))
+            return name
+
+        return super().save(name, content, max_length)
+
+
+    def get_hashed_name(self, name, content) -> str:
+        """Return the name of the content: the directory of the name, the hash of the content and the extension."""
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks(self.hash_chunk_size):
+            digest.update(chunk if isinstance(chunk, bytes) else chunk.encode())
+
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+
+        return os.path.join(directory, digest[:2], digest + extension).replace('\\', '/')
+
+
+def get_reference_counts() -> Counter:
+    """
+    Return the number of plants that reference every stored file: the images and their variants.
+
+    The counts are read from the database (Plant.image and Plant.image_variants), so they
+    are always consistent with the plants and can't drift like a separate counter.
+    """
+
+    from .images import get_variant_names # Imported here to avoid a circular import
+    from .models import Plant
+
+    counts = Counter()
+
+    for image, variants in Plant.objects.values_list('image', 'image_variants').iterator():
+        if image:
+            counts[image] += 1
+
+        counts.update(get_variant_names(variants))
+
+    return counts
+
+
+def walk_storage(storage, path):
+    """Yield the names of all the files stored under the path, recursively."""
+
+    if not storage.exists(path):
+        return
+
+    directories, files = storage.listdir(path)
+
+    for file_name in files:
+        yield f'{path}/{file_name}'
+
+    for directory in directories:
+        yield from walk_storage(storage, f'{path}/{directory}')
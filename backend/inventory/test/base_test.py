@@ -1,12 +1,16 @@
+import io
 import os
 import tempfile
 import shutil
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from PIL import Image
 
 
+# The image variants are generated right away, so the tests don't start worker processes
+@override_settings(PLANT_IMAGE_VARIANTS_ASYNC=False)
 class FileUploadTestCase(TestCase):
     """
     A base test case class for handling file uploads in Django tests.
@@ -17,10 +21,13 @@ class FileUploadTestCase(TestCase):
     Usage:
         - Inherit from this class in your test class
         - Use the 'create_valid_image' method to generate an image in one 
-            of the following formats: PNG, JPEG, or JPG.
+            of the following formats: PNG, JPEG, or JPG. Without content, the
+            image is a real JPEG, so it can be decoded by Pillow.
         - Use the 'create_invalid_format_image' method to generate an image 
             in an incorrect format (in this case, GIF).
         - Use the 'create_large_image' method to generate an image file of 15MB.
+        - Use the 'separate_process_cache' method to run a block with the cache
+            of another process.
         - The test's `MEDIA_ROOT` will be automatically handled and cleaned up
           after each test.
     """
@@ -53,8 +60,13 @@ class FileUploadTestCase(TestCase):
         shutil.rmtree(self.test_media_dir)
         
         
-    def create_valid_image(self, name="test_image.jpg", content=b"fake_image_data"):
-        """Helper method to create a valid image."""
+    def create_valid_image(self, name="test_image.jpg", content=None, size=(64, 48)):
+        """Helper method to create a valid image (a real JPEG of the given size by default)."""
+        
+        if content is None:
+            buffer = io.BytesIO()
+            Image.new('RGB', size, 'green').save(buffer, 'JPEG')
+            content = buffer.getvalue()
         
         return SimpleUploadedFile(name, content, content_type="image/jpeg")
     
@@ -71,4 +83,21 @@ class FileUploadTestCase(TestCase):
         size_mb = 15 # Simulate 15 MB
         content = b"0" * (size_mb * 1024 * 1024)  # Create a raw binary string of 'size_mb' MB
         
-        return SimpleUploadedFile(name, content, content_type="image/jpg")
\ No newline at end of file
+        return SimpleUploadedFile(name, content, content_type="image/jpg")
+    
+    
+    def separate_process_cache(self, alias_setting):
+        """
+        Helper method to run a block as another process (a web worker, a management command)
+        would: the cache named by the alias_setting (e.g. 'CATALOG_CACHE_ALIAS') is a separate
+        local-memory cache, only the database is shared.
+        
+        Usage:
+            with self.separate_process_cache('CATALOG_CACHE_ALIAS'):
+                ...
+        """
+        
+        alias = 'other-process'
+        caches = {**settings.CACHES, alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': alias}}
+        
+        return override_settings(CACHES=caches, **{alias_setting: alias})
@@ -1,10 +1,22 @@
+from decimal import Decimal
+import gzip
 import uuid
+from unittest import skipUnless
+from unittest.mock import patch
 
 from rest_framework.test import APIClient
 from rest_framework import status
+from django.db import OperationalError, connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from account.models import User
 from inventory.models import Plant
 from inventory.serializers import PlantSerializer
+from inventory.apis import PlantBatchAPI, PlantStockAPI
+from inventory.pagination import PlantCursorPagination
+from inventory.autocomplete import get_plant_names_version, invalidate_plant_names, plant_name_index
+from inventory.cache import catalog_cache_stats, get_catalog_version, invalidate_catalog
+from inventory import stock
 from .base_test import FileUploadTestCase # Custom class for file handling
 
 
@@ -75,6 +87,231 @@ class PlantListAPITest(FileUploadTestCase):
         self.assertEqual(response.data['detail'], 'No plants found.')
         
         
+class PlantListPaginationAPITest(FileUploadTestCase):
+    """
+    Test the keyset (cursor) pagination mode of the PlantListAPI endpoint.
+    
+    - Verify that the first page contains page_size plants and a next cursor.
+    - Verify that following the cursors walks the whole catalog without duplicates.
+    - Verify that the price ordering is respected across pages.
+    - Verify that the page_size is capped by max_page_size.
+    - Test the behavior when the cursor is invalid.
+    """
+    
+    
+    def setUp(self):
+        
+        super().setUp() # Call the setUp of FileUploadTestCase to handle media root setup
+        
+        self.client = APIClient() # Create a new instance of the APIClient
+        self.url = reverse('plant-list') # Get the URL endpoint
+        
+        # Create a few Plant objects, several of them share the same rating
+        for index in range(7):
+            Plant.objects.create(
+                name=f'Plant {index}',
+                price=10 + index,
+                rating=index % 3,
+                image=self.create_valid_image()
+            )
+    
+    
+    def test_first_page(self):
+        """Test that the first page contains page_size plants and a cursor to the next page."""
+        
+        response = self.client.get(self.url, {'page_size': 3})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIsNotNone(response.data['next_cursor'])
+        self.assertIn('cursor=', response.data['next'])
+        
+        
+    def test_walk_all_pages(self):
+        """Test that following the cursors returns every plant exactly once in the right order."""
+        
+        ids = [] # Collect the ids of all the returned plants
+        params = {'page_size': 3}
+        
+        # Follow the next cursors until the last page is reached
+        while True:
+            response = self.client.get(self.url, params)
+            ids.extend(plant['id'] for plant in response.data['results'])
+            
+            if response.data['next_cursor'] is None:
+                break
+            
+            params = {'page_size': 3, 'cursor': response.data['next_cursor']}
+        
+        # The plants must be ordered by rating and id (both descending)
+        expected = [str(pk) for pk in Plant.objects.order_by('-rating', '-id').values_list('id', flat=True)]
+        self.assertEqual(ids, expected)
+        
+        
+    def test_price_ordering(self):
+        """Test that the price ordering is respected across pages."""
+        
+        response = self.client.get(self.url, {'page_size': 4, 'ordering': 'price'})
+        next_page = self.client.get(
+            self.url,
+            {'page_size': 4, 'ordering': 'price', 'cursor': response.data['next_cursor']}
+        )
+        
+        prices = [float(plant['price']) for plant in response.data['results'] + next_page.data['results']]
+        self.assertEqual(prices, [10, 11, 12, 13, 14, 15, 16])
+        
+        
+    def test_page_size_is_capped(self):
+        """Test that the page_size query parameter cannot exceed max_page_size."""
+        
+        # Lower the limit to make it smaller than the number of plants
+        with patch.object(PlantCursorPagination, 'max_page_size', 5):
+            response = self.client.get(self.url, {'page_size': 10_000})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 5)
+        
+        
+    def test_invalid_cursor(self):
+        """Test that an invalid cursor returns a 404 response."""
+        
+        # A cursor that cannot be decoded
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        
+        # A cursor issued for another ordering
+        first_page = self.client.get(self.url, {'page_size': 2, 'ordering': 'price'})
+        response = self.client.get(self.url, {'cursor': first_page.data['next_cursor'], 'ordering': 'rating'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        
+        # A crafted cursor with a position the columns cannot hold
+        pagination = PlantCursorPagination()
+        pagination.ordering = ('discounted_price', 'id')
+        for price in ('1e999999', '1e-999999', '123456789.00'):
+            cursor = pagination.encode_cursor([price, str(uuid.uuid4())])
+            response = self.client.get(self.url, {'cursor': cursor, 'ordering': 'price'})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        
+        
+class PlantListFilteringAPITest(FileUploadTestCase):
+    """
+    Test the server-side filtering and sorting of the PlantListAPI endpoint.
+    
+    - Test the in_stock filter.
+    - Test the on_discount filter.
+    - Test the min_price and max_price filters.
+    - Test the behavior when the price filter is not a number.
+    - Test the price filters that are out of the range of the price column.
+    - Test every sort key.
+    - Test that the price ordering uses the discounted price.
+    - Test that the filters are combined with the keyset pagination.
+    """
+    
+    
+    def setUp(self):
+        
+        super().setUp() # Call the setUp of FileUploadTestCase to handle media root setup
+        
+        self.client = APIClient() # Create a new instance of the APIClient
+        self.url = reverse('plant-list') # Get the URL endpoint
+        
+        # Create a few Plant objects
+        self.rosa = Plant.objects.create(name='Rosa', price=12.50, rating=3, stock_count=5, image=self.create_valid_image())
+        self.violet = Plant.objects.create(name='Violet', price=10.00, rating=4, discount_percentage=10, image=self.create_valid_image())
+        self.aloe = Plant.objects.create(name='Aloe', price=52.10, rating=5, stock_count=1, discount_percentage=20, image=self.create_valid_image())
+        
+        
+    def get_names(self, params):
+        """Make a GET request with the given query parameters and return the names of the plants."""
+        
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        return [plant['name'] for plant in response.data]
+        
+        
+    def test_in_stock_filter(self):
+        """Test that only the plants with a positive stock_count are returned."""
+        
+        self.assertCountEqual(self.get_names({'in_stock': 'true'}), ['Rosa', 'Aloe'])
+        
+        
+    def test_on_discount_filter(self):
+        """Test that only the discounted plants are returned."""
+        
+        self.assertCountEqual(self.get_names({'on_discount': 'true'}), ['Violet', 'Aloe'])
+        self.assertCountEqual(self.get_names({'on_discount': 'true', 'in_stock': 'true'}), ['Aloe'])
+        
+        
+    def test_price_filters(self):
+        """Test that the min_price and max_price filters are inclusive and use the discounted price."""
+        
+        # Discounted prices: Rosa 12.50, Violet 9.00, Aloe 41.68
+        self.assertCountEqual(self.get_names({'min_price': '12.50'}), ['Rosa', 'Aloe'])
+        self.assertCountEqual(self.get_names({'max_price': '12.50'}), ['Rosa', 'Violet'])
+        self.assertCountEqual(self.get_names({'min_price': 10, 'max_price': 45}), ['Rosa', 'Aloe'])
+        self.assertCountEqual(self.get_names({'min_price': '9.00', 'max_price': '9.00'}), ['Violet'])
+        
+        
+    def test_invalid_price_filter(self):
+        """Test that a price filter that is not a number returns a 400 response."""
+        
+        response = self.client.get(self.url, {'min_price': 'cheap'})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('min_price', response.data)
+        
+        
+    def test_price_filter_range(self):
+        """Test that a price out of the range of the column returns a 400 response and that the cents are rounded."""
+        
+        for params in ({'min_price': '1e999999'}, {'max_price': '-1e999999'}, {'max_price': '100000000'}):
+            response = self.client.get(self.url, params)
+            
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(next(iter(params)), response.data)
+        
+        # Discounted prices: Rosa 12.50, Violet 9.00, Aloe 41.68
+        self.assertCountEqual(self.get_names({'min_price': '1e-999999'}), ['Rosa', 'Violet', 'Aloe'])
+        self.assertCountEqual(self.get_names({'max_price': '1e-999999'}), [])
+        self.assertCountEqual(self.get_names({'min_price': '12.491', 'max_price': '12.509'}), ['Rosa'])
+        
+        
+    def test_sort_keys(self):
+        """Test that every sort key returns the plants in the expected order."""
+        
+        self.assertEqual(self.get_names({'ordering': 'price'}), ['Violet', 'Rosa', 'Aloe'])
+        self.assertEqual(self.get_names({'ordering': '-price'}), ['Aloe', 'Rosa', 'Violet'])
+        self.assertEqual(self.get_names({'ordering': 'rating'}), ['Rosa', 'Violet', 'Aloe'])
+        self.assertEqual(self.get_names({'ordering': '-rating'}), ['Aloe', 'Violet', 'Rosa'])
+        self.assertEqual(self.get_names({'ordering': 'name'}), ['Aloe', 'Rosa', 'Violet'])
+        self.assertEqual(self.get_names({'ordering': '-name'}), ['Violet', 'Rosa', 'Aloe'])
+        
+        
+    def test_price_sort_uses_discounted_price(self):
+        """Test that the price ordering follows the price the customer pays."""
+        
+        # The most expensive plant becomes the third one after the discount (60.00 - 50% = 30.00)
+        Plant.objects.create(name='Fern', price=60, discount_percentage=50, image=self.create_valid_image())
+        
+        self.assertEqual(self.get_names({'ordering': 'price'}), ['Violet', 'Rosa', 'Fern', 'Aloe'])
+        
+        
+    def test_filters_with_pagination(self):
+        """Test that the filters and the ordering are applied to the paginated response."""
+        
+        response = self.client.get(self.url, {'in_stock': 'true', 'ordering': '-price', 'page_size': 1})
+        self.assertEqual([plant['name'] for plant in response.data['results']], ['Aloe'])
+        
+        # Request the next page
+        response = self.client.get(
+            self.url,
+            {'in_stock': 'true', 'ordering': '-price', 'page_size': 1, 'cursor': response.data['next_cursor']}
+        )
+        self.assertEqual([plant['name'] for plant in response.data['results']], ['Rosa'])
+        self.assertIsNone(response.data['next_cursor'])
+        
+        
 class PlantDetailAPITest(FileUploadTestCase):
     """
     Test the behavior of the PlantDetailAPITest endpoint.
@@ -174,4 +411,892 @@ class PlantDetailAPITest(FileUploadTestCase):
 
         # Make a GET request to the plant detail API endpoint with the plant's UUID
         response = self.client.get(reverse('plant-detail', args=[self.plant_1.id]))
-        self.assertEqual(response.data['discounted_price'], 13.5) # 15.00 - 10% = 13.5
\ No newline at end of file
+        self.assertEqual(response.data['discounted_price'], 13.5) # 15.00 - 10% = 13.5
+
+
+class PlantBatchAPITest(FileUploadTestCase):
+    """
+    Test the behavior of the PlantBatchAPI endpoint.
+    
+    - Verify that the plants are returned in the order of the request.
+    - Verify that the missing ids are reported.
+    - Verify that the plants are read with a single query.
+    - Verify that the duplicated ids are returned once.
+    - Test the behavior when the ids are missing, invalid or too many.
+    """
+    
+    
+    def setUp(self):
+        
+        super().setUp() # Call the setUp of FileUploadTestCase to handle media root setup
+        
+        self.client = APIClient() # Create a new instance of the APIClient
+        self.url = reverse('plant-batch') # Get the URL endpoint
+        
+        # Create a few Plant objects
+        self.plants = [
+            Plant.objects.create(name=f'Plant {number}', price=10.00 + number, image=self.create_valid_image())
+            for number in range(3)
+        ]
+        
+        
+    def test_request_order(self):
+        """Ensure that the plants are returned in the order of the ids."""
+        
+        ids = [self.plants[2].id, self.plants[0].id, self.plants[1].id]
+        response = self.client.get(self.url, {'ids': ','.join(str(plant_id) for plant_id in ids)})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([plant['id'] for plant in response.data['results']], [str(plant_id) for plant_id in ids])
+        self.assertEqual(response.data['missing'], [])
+        
+        # The plants are serialized the same way as by the detail endpoint
+        self.assertEqual(response.data['results'][1], PlantSerializer(Plant.objects.get(id=ids[1])).data)
+    
+    
+    def test_missing_ids(self):
+        """Ensure that the ids of the plants that do not exist are reported."""
+        
+        missing_id = str(uuid.uuid4())
+        response = self.client.get(self.url, {'ids': [str(self.plants[0].id), missing_id]})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([plant['id'] for plant in response.data['results']], [str(self.plants[0].id)])
+        self.assertEqual(response.data['missing'], [missing_id])
+    
+    
+    def test_single_query(self):
+        """Ensure that all the plants are read with a single query (after the catalog version)."""
+        
+        ids = ','.join(str(plant.id) for plant in self.plants)
+        
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'ids': ids})
+        
+        self.assertEqual(len(response.data['results']), 3)
+    
+    
+    def test_duplicated_ids(self):
+        """Ensure that a plant requested twice is returned once."""
+        
+        plant_id = str(self.plants[0].id)
+        response = self.client.get(self.url, {'ids': f'{plant_id},{plant_id.upper()}'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+    
+    
+    def test_invalid_ids(self):
+        """Ensure that a missing parameter, an invalid UUID and too many ids return 400."""
+        
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'ids': 'not-a-uuid'}).status_code, status.HTTP_400_BAD_REQUEST)
+        
+        too_many = ','.join(str(uuid.uuid4()) for _ in range(PlantBatchAPI.max_ids + 1))
+        response = self.client.get(self.url, {'ids': too_many})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ids', response.data)
+        
+        # The limit is checked before the values are parsed (and counts the duplicates)
+        too_many = ','.join(['not-a-uuid'] * (PlantBatchAPI.max_ids + 1))
+        response = self.client.get(self.url, {'ids': too_many})
+        
+        self.assertIn('no more than', str(response.data['ids']))
+
+
+class PlantFacetsAPITest(FileUploadTestCase):
+    """
+    Test the behavior of the PlantFacetsAPI endpoint.
+    
+    - Verify the counts, the price range, the price histogram and the rating distribution.
+    - Verify that the facets are computed with a single query.
+    - Verify that the facets follow the active filters.
+    - Verify that an out-of-range price filter is rejected.
+    - Verify that the response is cached until the catalog changes.
+    - Test the behavior when the catalog is empty.
+    """
+    
+    
+    def setUp(self):
+        
+        super().setUp() # Call the setUp of FileUploadTestCase to handle media root setup
+        
+        self.client = APIClient() # Create a new instance of the APIClient
+        self.url = reverse('plant-facets') # Get the URL endpoint
+        
+        # Discounted prices: 5.00, 20.00, 1200.00
+        Plant.objects.create(name='Cactus', price=Decimal('5.00'), stock_count=0, rating=2, image=self.create_valid_image())
+        Plant.objects.create(name='Fern', price=Decimal('40.00'), discount_percentage=50, stock_count=3, rating=5, image=self.create_valid_image())
+        Plant.objects.create(name='Olive Tree', price=Decimal('1200.00'), stock_count=1, rating=5, image=self.create_valid_image())
+        
+        
+    def test_facets(self):
+        """Ensure that every facet is computed correctly."""
+        
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['in_stock'], 2)
+        self.assertEqual(response.data['on_discount'], 1)
+        self.assertEqual(response.data['price']['min'], Decimal('5.00'))
+        self.assertEqual(response.data['price']['max'], Decimal('1200.00'))
+        
+        histogram = {bucket['min']: bucket['count'] for bucket in response.data['price']['histogram']}
+        self.assertEqual(histogram, {0: 1, 10: 1, 25: 0, 50: 0, 100: 0, 250: 0, 500: 0, 1000: 1})
+        self.assertIsNone(response.data['price']['histogram'][-1]['max'])
+        
+        ratings = {entry['rating']: entry['count'] for entry in response.data['rating']}
+        self.assertEqual(ratings, {0: 0, 1: 0, 2: 1, 3: 0, 4: 0, 5: 2})
+    
+    
+    def test_single_query(self):
+        """Ensure that all the facets are computed with a single query (after the catalog version)."""
+        
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+    
+    
+    def test_filters(self):
+        """Ensure that the facets only count the plants that match the filters."""
+        
+        response = self.client.get(self.url, {'in_stock': 'true', 'max_price': '100'})
+        
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['price']['min'], Decimal('20.00'))
+        self.assertEqual(response.data['price']['max'], Decimal('20.00'))
+    
+    
+    def test_invalid_filters(self):
+        """Ensure that a price out of the range of the column returns a 400 response."""
+        
+        response = self.client.get(self.url, {'max_price': '1e999999'})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('max_price', response.data)
+    
+    
+    def test_cache(self):
+        """Ensure that the response is cached until a plant is saved."""
+        
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'HIT')
+        
+        Plant.objects.create(name='Ivy', price=Decimal('8.00'), image=self.create_valid_image())
+        
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 4)
+    
+    
+    def test_empty_catalog(self):
+        """Ensure that an empty catalog returns zero counts and no price range."""
+        
+        Plant.objects.all().delete()
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 0)
+        self.assertIsNone(response.data['price']['min'])
+
+
+class PlantSearchAPITest(FileUploadTestCase):
+    """
+    Test the behavior of the PlantSearchAPI endpoint.
+    
+    - Verify that the matching plants are returned.
+    - Verify that the name matches are ranked above the description matches.
+    - Verify that the results are paginated.
+    - Verify that the catalog filters are applied to the results.
+    - Test the behavior when the search query is missing.
+    - Verify that the search vector is rebuilt on save (PostgreSQL only).
+    """
+    
+    
+    def setUp(self):
+        
+        super().setUp() # Call the setUp of FileUploadTestCase to handle media root setup
+        
+        self.client = APIClient() # Create a new instance of the APIClient
+        self.url = reverse('plant-search') # Get the URL endpoint
+        
+        # Create a few Plant objects
+        self.fern = Plant.objects.create(
+            name='Boston Fern',
+            description='A lush plant that loves humidity.',
+            price=18.00,
+            stock_count=3,
+            image=self.create_valid_image()
+        )
+        self.moss = Plant.objects.create(
+            name='Moss Ball',
+            description='Grows well next to a fern in a humid terrarium.',
+            price=8.00,
+            image=self.create_valid_image()
+        )
+        self.cactus = Plant.objects.create(
+            name='Golden Barrel Cactus',
+            description='Needs plenty of sun and very little water.',
+            price=25.00,
+            image=self.create_valid_image()
+        )
+        
+        
+    def test_search_returns_matching_plants(self):
+        """Test that only the plants that match the query are returned, the name matches first."""
+        
+        response = self.client.get(self.url, {'q': 'fern'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([plant['name'] for plant in response.data['results']], ['Boston Fern', 'Moss Ball'])
+        
+        
+    def test_search_pagination(self):
+        """Test that the results are split into pages."""
+        
+        response = self.client.get(self.url, {'q': 'fern', 'page_size': 1})
+        
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNotNone(response.data['next'])
+        
+        
+    def test_search_with_filters(self):
+        """Test that the catalog filters are applied to the search results."""
+        
+        response = self.client.get(self.url, {'q': 'fern', 'in_stock': 'true'})
+        
+        self.assertEqual([plant['name'] for plant in response.data['results']], ['Boston Fern'])
+        
+        
+    def test_search_without_query(self):
+        """Test that a request without a search query returns a 400 response."""
+        
+        response = self.client.get(self.url, {'q': '  '})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('q', response.data)
+        
+        
+    @skipUnless(connection.vendor == 'postgresql', 'Full-text search requires PostgreSQL.')
+    def test_search_vector_is_rebuilt_on_save(self):
+        """Test that the search vector follows the changes of the name."""
+        
+        self.cactus.name = 'Golden Barrel Succulent'
+        self.cactus.save()
+        
+        response = self.client.get(self.url, {'q': 'succulent'})
+        self.assertEqual([plant['name'] for plant in response.data['results']], ['Golden Barrel Succulent'])
+
+
+class PlantAutocompleteAPITest(FileUploadTestCase):
+    """
+    Test the behavior of the PlantAutocompleteAPI endpoint.
+    
+    - Verify that the suggestions are returned best rated first.
+    - Verify that the lookups do not query the database once the index is loaded.
+    - Verify that the index follows the saved and deleted plants.
+    - Verify that the index follows the plants created by other processes.
+    - Verify that the other catalog changes don't reload the index.
+    - Verify that only the saves that change the name or the rating bump the plant names version.
+    - Test the behavior when the limit is invalid.
+    """
+    
+    
+    def setUp(self):
+        
+        super().setUp() # Call the setUp of FileUploadTestCase to handle media root setup
+        
+        self.client = APIClient() # Create a new instance of the APIClient
+        self.url = reverse('plant-autocomplete') # Get the URL endpoint
+        
+        # Make sure the index is loaded from the plants of this test
+        plant_name_index.reset()
+        
+        # Create a few Plant objects
+        self.fern = Plant.objects.create(name='Boston Fern', price=18.00, rating=3, image=self.create_valid_image())
+        self.fig = Plant.objects.create(name='Fiddle Leaf Fig', price=35.00, rating=5, image=self.create_valid_image())
+        
+        
+    def test_suggestions(self):
+        """Test that the matching plants are returned best rated first."""
+        
+        response = self.client.get(self.url, {'q': 'f'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([plant['name'] for plant in response.data], ['Fiddle Leaf Fig', 'Boston Fern'])
+        self.assertEqual(response.data[0]['id'], self.fig.id)
+        
+        
+    def test_no_queries_once_loaded(self):
+        """Test that the lookups are answered from memory."""
+        
+        self.client.get(self.url, {'q': 'f'}) # Load the index
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'q': 'bost', 'limit': 1})
+        
+        self.assertEqual([plant['name'] for plant in response.data], ['Boston Fern'])
+        
+        
+    def test_index_follows_saved_and_deleted_plants(self):
+        """Test that the index is updated when the plants are saved or deleted."""
+        
+        self.client.get(self.url, {'q': 'f'}) # Load the index
+        
+        # Rename a plant and delete another one
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fern.name = 'Fishbone Fern'
+            self.fern.save()
+            self.fig.delete()
+        
+        response = self.client.get(self.url, {'q': 'fi'})
+        self.assertEqual([plant['name'] for plant in response.data], ['Fishbone Fern'])
+        
+        
+    def test_index_follows_other_processes(self):
+        """Test that the plants created without the signals of this process are found after the next check."""
+        
+        self.client.get(self.url, {'q': 'f'}) # Load the index
+        
+        # What an import or another worker does: no signal reaches this index, only the version changes
+        Plant.objects.bulk_create([Plant(name='Rose Bush', price=9.00, rating=4, image='plants/rose.jpg')])
+        invalidate_plant_names()
+        
+        # The version is not read again before check_interval
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, {'q': 'ros'}).data, [])
+        
+        with patch.object(plant_name_index, 'check_interval', 0):
+            response = self.client.get(self.url, {'q': 'ros'})
+        
+        self.assertEqual([plant['name'] for plant in response.data], ['Rose Bush'])
+        
+        
+    def test_other_catalog_changes_keep_the_index(self):
+        """Test that a change of the catalog that doesn't touch the names (e.g. the stock) doesn't reload the index."""
+        
+        self.client.get(self.url, {'q': 'f'}) # Load the index
+        
+        Plant.objects.filter(id=self.fern.id).update(stock_count=7)
+        invalidate_catalog()
+        
+        # A single query checks the version, the index isn't loaded again
+        with patch.object(plant_name_index, 'check_interval', 0), self.assertNumQueries(1):
+            response = self.client.get(self.url, {'q': 'f'})
+        
+        self.assertEqual(len(response.data), 2)
+        
+        
+    def test_saves_bump_the_version_only_for_names_and_ratings(self):
+        """Test that the stock, price and image edits don't bump the plant names version, the new plants, renames and re-ratings do."""
+        
+        version = get_plant_names_version()
+        
+        # Edits of a plant loaded from the database (as in the admin)
+        fern = Plant.objects.get(id=self.fern.id)
+        fern.stock_count = 12
+        fern.price = 16.00
+        fern.save()
+        
+        fern.stock_count = 11
+        fern.save(update_fields=['stock_count'])
+        
+        self.assertEqual(get_plant_names_version(), version)
+        
+        fern.rating = 4
+        fern.save()
+        self.assertEqual(get_plant_names_version(), version + 1)
+        
+        # A new name not included in update_fields is not saved, so nothing changes
+        fern.name = 'Sword Fern'
+        fern.save(update_fields=['stock_count'])
+        self.assertEqual(get_plant_names_version(), version + 1)
+        
+        fern.save(update_fields=['name'])
+        self.assertEqual(get_plant_names_version(), version + 2)
+        
+        Plant.objects.create(name='Rose Bush', price=9.00, image=self.create_valid_image())
+        self.assertEqual(get_plant_names_version(), version + 3)
+        
+        
+    def test_invalid_limit(self):
+        """Test that a limit that is not a number returns a 400 response."""
+        
+        response = self.client.get(self.url, {'q': 'f', 'limit': 'all'})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PlantListCacheTest(FileUploadTestCase):
+    """
+    Test the catalog response cache of the PlantListAPI endpoint.
+    
+    - Verify that a repeated request is served from the cache, only the catalog version is queried.
+    - Verify that saving or deleting a plant invalidates the cached responses.
+    - Verify that the query parameters are part of the cache key.
+    - Verify that only the recognised parameters, in a canonical form, are part of the key.
+    - Verify that the hit and miss counters are updated.
+    """
+    
+    
+    def setUp(self):
+        
+        super().setUp() # Call the setUp of FileUploadTestCase to handle media root setup
+        
+        self.client = APIClient() # Create a new instance of the APIClient
+        self.url = reverse('plant-list') # Get the URL endpoint
+        
+        self.plant = Plant.objects.create(name='Rosa', price=12.50, image=self.create_valid_image())
+        catalog_cache_stats.reset()
+        
+        
+    def test_repeated_request_is_cached(self):
+        """Test that the second request returns the same bytes, only the catalog version is queried."""
+        
+        first = self.client.get(self.url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        
+        with self.assertNumQueries(1):
+            second = self.client.get(self.url)
+        
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second['Content-Type'], 'application/json')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(catalog_cache_stats.as_dict(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+        
+        
+    def test_save_and_delete_invalidate_the_cache(self):
+        """Test that the cached list is rebuilt after a plant is saved or deleted."""
+        
+        self.client.get(self.url) # Fill the cache
+        
+        # Create a new plant
+        violet = Plant.objects.create(name='Violet', price=10.00, image=self.create_valid_image())
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()), 2)
+        
+        # Delete the plant
+        violet.delete()
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()), 1)
+        
+        
+    def test_query_parameters_are_part_of_the_key(self):
+        """Test that the responses for different query parameters are cached separately."""
+        
+        self.client.get(self.url) # Fill the cache
+        response = self.client.get(self.url, {'ordering': 'name'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        
+        
+    def test_unknown_query_parameters_share_the_entry(self):
+        """Test that the unknown parameters and the equivalent values don't store new copies of the catalog."""
+        
+        first = self.client.get(self.url, {'min_price': '10.50'})
+        self.assertEqual(first['X-Cache'], 'MISS')
+        
+        for params in ({'min_price': '10.5', 'junk': '0'}, {'junk': '1', 'min_price': '10.500'}, {'min_price': '10.5', 'format': 'json'}):
+            response = self.client.get(self.url, params)
+            
+            self.assertEqual(response['X-Cache'], 'HIT', params)
+            self.assertEqual(response['ETag'], first['ETag'])
+        
+        self.assertEqual(catalog_cache_stats.as_dict()['misses'], 1)
+        
+        
+    def test_page_links_are_canonical(self):
+        """Test that a cached page doesn't carry the unknown parameters of the request that rendered it."""
+        
+        Plant.objects.create(name='Violet', price=10.00, image=self.create_valid_image())
+        
+        response = self.client.get(self.url, {'page_size': 1, 'junk': 'x'})
+        
+        self.assertNotIn('junk', response.json()['next'])
+        self.assertIn('page_size=1', response.json()['next'])
+        self.assertEqual(self.client.get(self.url, {'page_size': 1})['X-Cache'], 'HIT')
+
+
+class ConditionalGetTest(FileUploadTestCase):
+    """
+    Test the ETag / Last-Modified handling of the PlantListAPI and PlantDetailAPI endpoints.
+    
+    - Verify that the list returns a 304 for a matching If-None-Match, only the catalog version is queried.
+    - Verify that the list returns a 304 for a matching If-Modified-Since.
+    - Verify that the list ETag changes when the catalog changes, in this process or another one.
+    - Verify that the detail returns a 304 for a matching If-None-Match.
+    - Verify that the detail ETag changes when the plant is saved.
+    """
+    
+    
+    def setUp(self):
+        
+        super().setUp() # Call the setUp of FileUploadTestCase to handle media root setup
+        
+        self.client = APIClient() # Create a new instance of the APIClient
+        self.list_url = reverse('plant-list')
+        
+        self.plant = Plant.objects.create(name='Rosa', price=12.50, image=self.create_valid_image())
+        self.detail_url = reverse('plant-detail', args=[self.plant.id])
+        
+        
+    def test_list_if_none_match(self):
+        """Test that a matching If-None-Match returns an empty 304 response, only the catalog version is queried."""
+        
+        response = self.client.get(self.list_url)
+        etag = response['ETag']
+        
+        self.assertTrue(etag.startswith('"')) # A strong ETag
+        self.assertIn('no-cache', response['Cache-Control'])
+        
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        
+        
+    def test_list_if_modified_since(self):
+        """Test that a matching If-Modified-Since returns a 304 response."""
+        
+        response = self.client.get(self.list_url)
+        response = self.client.get(self.list_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        
+    def test_list_etag_changes_with_the_catalog(self):
+        """Test that the list ETag changes when a plant is saved."""
+        
+        etag = self.client.get(self.list_url)['ETag']
+        
+        self.plant.price = 15
+        self.plant.save()
+        
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        
+        
+    def test_list_etag_changes_with_another_process(self):
+        """Test that a plant created by another process (with its own cache) changes the list ETag."""
+        
+        etag = self.client.get(self.list_url)['ETag']
+        
+        # Another process
+        with self.separate_process_cache('CATALOG_CACHE_ALIAS'):
+            Plant.objects.create(name='Rose Bush', price=9.00, image=self.create_valid_image())
+        
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()), 2)
+        
+        
+    def test_detail_if_none_match(self):
+        """Test that the detail endpoint returns a 304 for the current ETag."""
+        
+        response = self.client.get(self.detail_url)
+        
+        self.assertIn('Last-Modified', response)
+        
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        
+    def test_detail_etag_changes_on_save(self):
+        """Test that the detail ETag changes when the plant is saved."""
+        
+        etag = self.client.get(self.detail_url)['ETag']
+        
+        self.plant.stock_count = 4
+        self.plant.save()
+        
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stock_count'], 4)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+
+class PlantStockAPITest(FileUploadTestCase):
+    """
+    Test the PlantStockAPI endpoint (bulk stock adjustments).
+    
+    - Test that only the staff users can adjust the stock.
+    - Test the deltas and the absolute values, by id and by SKU.
+    - Test that a batch costs a constant number of queries.
+    - Test that the failed adjustments are reported and the others applied.
+    - Test that the plants are locked in a fixed order and that the deadlocked batches are retried.
+    - Test the validation of the request body.
+    """
+    
+    
+    def setUp(self):
+        
+        super().setUp()  # Call the setUp of FileUploadTestCase to handle media root setup
+        
+        self.client = APIClient()
+        self.url = reverse('plant-stock')
+        
+        self.staff = User.objects.create_superuser(name='staff', email='staff@test.com', password='a12a14t56')
+        self.client.force_authenticate(user=self.staff)
+        
+        self.monstera = Plant.objects.create(name='Monstera', sku='MON-1', price=25.00, stock_count=10, image=self.create_valid_image())
+        self.fern = Plant.objects.create(name='Fern', sku='FER-1', price=12.00, stock_count=2, image=self.create_valid_image())
+        self.cactus = Plant.objects.create(name='Cactus', price=8.00, stock_count=0, image=self.create_valid_image())
+        
+        
+    def test_staff_only(self):
+        """Test that the anonymous and the regular users are rejected."""
+        
+        body = {'adjustments': [{'sku': 'MON-1', 'delta': 1}]}
+        
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.post(self.url, body, format='json').status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        user = User.objects.create_user(name='user', email='user@test.com', password='a12a14t56')
+        self.client.force_authenticate(user=user)
+        self.assertEqual(self.client.post(self.url, body, format='json').status_code, status.HTTP_403_FORBIDDEN)
+        
+        self.monstera.refresh_from_db()
+        self.assertEqual(self.monstera.stock_count, 10)
+        
+        
+    def test_adjustments(self):
+        """Test the deltas and the absolute values, by SKU and by id."""
+        
+        version = get_catalog_version()
+        updated_at = self.monstera.updated_at
+        
+        response = self.client.post(self.url, {'adjustments': [
+            {'sku': 'MON-1', 'delta': -3},
+            {'sku': 'FER-1', 'stock_count': 40},
+            {'id': str(self.cactus.id), 'delta': 5},
+        ]}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(response.data['results'], [
+            {'index': 0, 'id': str(self.monstera.id), 'sku': 'MON-1', 'stock_count': 7},
+            {'index': 1, 'id': str(self.fern.id), 'sku': 'FER-1', 'stock_count': 40},
+            {'index': 2, 'id': str(self.cactus.id), 'sku': None, 'stock_count': 5},
+        ])
+        
+        stock = dict(Plant.objects.values_list('name', 'stock_count'))
+        self.assertEqual(stock, {'Monstera': 7, 'Fern': 40, 'Cactus': 5})
+        
+        self.monstera.refresh_from_db()
+        self.assertGreater(self.monstera.updated_at, updated_at)
+        self.assertGreater(get_catalog_version(), version)
+        
+        
+    def test_constant_queries(self):
+        """Test that the number of queries doesn't depend on the size of the batch."""
+        
+        adjustments = [{'sku': 'MON-1', 'delta': 1}, {'sku': 'FER-1', 'delta': 1}, {'id': str(self.cactus.id), 'delta': 1}]
+        
+        # Savepoint, SELECT ... FOR UPDATE, UPDATE, catalog version, release
+        with self.assertNumQueries(5):
+            self.client.post(self.url, {'adjustments': adjustments[:1]}, format='json')
+        
+        with self.assertNumQueries(5):
+            self.client.post(self.url, {'adjustments': adjustments}, format='json')
+        
+        
+    def test_failures(self):
+        """Test that the failed adjustments are reported by index and that the others are applied."""
+        
+        response = self.client.post(self.url, {'adjustments': [
+            {'sku': 'MON-1', 'delta': -1},
+            {'sku': 'FER-1', 'delta': -3},
+            {'sku': 'UNKNOWN', 'delta': 1},
+            {'sku': 'MON-1', 'delta': 1},
+            {'id': str(self.monstera.id), 'delta': 1},
+            {'id': 'not-a-uuid', 'delta': 1},
+            {'sku': 'FER-1', 'delta': 1.5},
+            {'sku': 'FER-1', 'stock_count': -1},
+            {'delta': 1},
+            {'sku': 'FER-1', 'delta': 1, 'stock_count': 1},
+            {'id': str(self.cactus.id), 'delta': 2147483648},
+        ]}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['index'] for result in response.data['results']], [0])
+        self.assertEqual([error['index'] for error in response.data['errors']], list(range(1, 11)))
+        self.assertIn('cannot become negative', response.data['errors'][0]['error'])
+        self.assertIn('does not exist', response.data['errors'][1]['error'])
+        self.assertIn('more than once', response.data['errors'][2]['error'])
+        self.assertIn('more than once', response.data['errors'][3]['error'])
+        
+        stock = dict(Plant.objects.values_list('name', 'stock_count'))
+        self.assertEqual(stock, {'Monstera': 9, 'Fern': 2, 'Cactus': 0})
+        
+        
+    def test_lock_order(self):
+        """Test that the plants are locked in the order of their ids, whatever the order of the batch."""
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, {'adjustments': [{'sku': 'MON-1', 'delta': 1}, {'sku': 'FER-1', 'delta': 1}]}, format='json')
+        
+        select = next(query['sql'] for query in queries if query['sql'].startswith('SELECT') and '"inventory_plant"' in query['sql'])
+        self.assertIn('ORDER BY "inventory_plant"."id" ASC', select)
+        
+        
+    def deadlock(self):
+        """Return the error raised by Django when PostgreSQL detects a deadlock."""
+        
+        cause = Exception('deadlock detected') # The error of the driver, with the SQLSTATE
+        cause.pgcode = '40P01'
+        
+        error = OperationalError('deadlock detected')
+        error.__cause__ = cause
+        
+        return error
+        
+        
+    def test_deadlock_is_retried(self):
+        """Test that a batch that ran into a deadlock is applied by the next attempt."""
+        
+        write = stock.write_stock_adjustments
+        attempts = []
+        
+        def deadlocked_once(cleaned):
+            attempts.append(cleaned)
+            if len(attempts) == 1:
+                raise self.deadlock()
+            return write(cleaned)
+        
+        with patch('inventory.stock.write_stock_adjustments', side_effect=deadlocked_once):
+            response = self.client.post(self.url, {'adjustments': [{'sku': 'MON-1', 'delta': -1}]}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(response.data['results'][0]['stock_count'], 9)
+        
+        self.monstera.refresh_from_db()
+        self.assertEqual(self.monstera.stock_count, 9)
+        
+        
+    def test_conflict(self):
+        """Test that a batch that keeps running into deadlocks gets a 409 and applies nothing."""
+        
+        with patch('inventory.stock.write_stock_adjustments', side_effect=self.deadlock()) as write:
+            response = self.client.post(self.url, {'adjustments': [{'sku': 'MON-1', 'delta': -1}]}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(write.call_count, stock.STOCK_ATTEMPTS)
+        
+        self.monstera.refresh_from_db()
+        self.assertEqual(self.monstera.stock_count, 10)
+        
+        # Any other database error is not a conflict
+        with patch('inventory.stock.write_stock_adjustments', side_effect=OperationalError('disk full')):
+            with self.assertRaises(OperationalError):
+                self.client.post(self.url, {'adjustments': [{'sku': 'MON-1', 'delta': -1}]}, format='json')
+        
+        
+    def test_invalid_body(self):
+        """Test that the adjustments must be a non-empty list of limited size."""
+        
+        for body in ({}, {'adjustments': []}, {'adjustments': {'sku': 'MON-1'}}, [{'sku': 'MON-1', 'delta': 1}]):
+            response = self.client.post(self.url, body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, body)
+        
+        with patch.object(PlantStockAPI, 'max_adjustments', 1):
+            response = self.client.post(self.url, {'adjustments': [{'sku': 'MON-1', 'delta': 1}] * 2}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+
+class PlantExportAPITest(FileUploadTestCase):
+    """
+    Test the PlantExportAPI endpoint (streaming catalog export).
+    
+    - Test that only the staff users can export the catalog.
+    - Test the CSV and the JSONL exports, and the gzip compression.
+    - Test the validation of the query parameters.
+    """
+    
+    
+    def setUp(self):
+        
+        super().setUp()  # Call the setUp of FileUploadTestCase to handle media root setup
+        
+        self.client = APIClient()
+        self.url = reverse('plant-export')
+        
+        self.staff = User.objects.create_superuser(name='staff', email='staff@test.com', password='a12a14t56')
+        self.client.force_authenticate(user=self.staff)
+        
+        self.plant = Plant.objects.create(name='Monstera', price=25.00, image=self.create_valid_image())
+        
+        
+    def test_staff_only(self):
+        """Test that a regular user can't export the catalog."""
+        
+        user = User.objects.create_user(name='user', email='user@test.com', password='a12a14t56')
+        self.client.force_authenticate(user=user)
+        
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+        
+        
+    def test_csv(self):
+        """Test that the CSV export is streamed as an attachment."""
+        
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('plants.csv', response['Content-Disposition'])
+        
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('id,sku,name'))
+        self.assertIn('Monstera', lines[1])
+        
+        
+    def test_jsonl_gzip(self):
+        """Test that the export is gzipped when the client accepts it."""
+        
+        response = self.client.get(self.url, {'type': 'jsonl'}, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        
+        content = gzip.decompress(b''.join(response.streaming_content)).decode()
+        
+        self.assertEqual(content.count('\n'), 1)
+        self.assertIn(str(self.plant.id), content)
+        
+        
+    def test_resume(self):
+        """Test that the export continues after the given id."""
+        
+        response = self.client.get(self.url, {'type': 'jsonl', 'after': str(self.plant.id)})
+        
+        self.assertEqual(b''.join(response.streaming_content), b'')
+        
+        
+    def test_invalid_parameters(self):
+        """Test that the type and the cursor are validated."""
+        
+        self.assertEqual(self.client.get(self.url, {'type': 'xml'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'after': 'abc'}).status_code, status.HTTP_400_BAD_REQUEST)
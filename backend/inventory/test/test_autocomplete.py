@@ -0,0 +1,111 @@
+import uuid
+
+from django.test import SimpleTestCase
+from inventory.autocomplete import PlantNameIndex
+
+
+class PlantNameIndexTest(SimpleTestCase):
+    """
+    Test the in-memory prefix index used by the autocomplete endpoint.
+    
+    - Test that the name and every word of the name are matched by prefix.
+    - Test that the results are ordered by rating and limited.
+    - Test the incremental updates (add, rename and remove).
+    - Test that the rankings of the short prefixes stay complete after the updates.
+    - Test that the memory footprint is reported.
+    """
+    
+    
+    def setUp(self):
+        """Create an index loaded with a few plants."""
+        
+        self.fern_id, self.fig_id, self.cactus_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        
+        self.index = PlantNameIndex()
+        self.index.load([
+            (self.fern_id, 'Boston Fern', 3),
+            (self.fig_id, 'Fiddle Leaf Fig', 5),
+            (self.cactus_id, 'Golden Barrel Cactus', 4),
+        ])
+        
+        
+    def get_names(self, prefix, limit=10):
+        """Return the names of the plants found for the prefix."""
+        
+        return [plant['name'] for plant in self.index.search(prefix, limit)]
+        
+        
+    def test_prefix_matching(self):
+        """Test that the prefix matches the beginning of the name and of every word, case-insensitively."""
+        
+        self.assertEqual(self.get_names('bos'), ['Boston Fern'])
+        self.assertEqual(self.get_names('FERN'), ['Boston Fern'])
+        self.assertEqual(self.get_names('barrel c'), ['Golden Barrel Cactus'])
+        self.assertEqual(self.get_names('ern'), []) # Not the beginning of a word
+        self.assertEqual(self.get_names('   '), [])
+        
+        
+    def test_rating_order_and_limit(self):
+        """Test that the best rated plants are returned first and the limit is respected."""
+        
+        # 'f' matches "Boston Fern" (3) and "Fiddle Leaf Fig" (5)
+        self.assertEqual(self.get_names('f'), ['Fiddle Leaf Fig', 'Boston Fern'])
+        self.assertEqual(self.get_names('f', limit=1), ['Fiddle Leaf Fig'])
+        
+        
+    def test_incremental_updates(self):
+        """Test that the plants can be added, renamed and removed without reloading the index."""
+        
+        # Add a new plant
+        fittonia_id = uuid.uuid4()
+        self.index.add(fittonia_id, 'Fittonia', 4)
+        self.assertEqual(self.get_names('fi'), ['Fiddle Leaf Fig', 'Fittonia'])
+        
+        # Rename a plant, the old keys must be removed
+        self.index.add(self.fern_id, 'Maidenhair Fern', 3)
+        self.assertEqual(self.get_names('bos'), [])
+        self.assertEqual(self.get_names('maiden'), ['Maidenhair Fern'])
+        
+        # Remove a plant
+        self.index.remove(self.fig_id)
+        self.assertEqual(self.get_names('fi'), ['Fittonia'])
+        self.assertEqual(self.index.stats()['plants'], 3)
+        
+        
+    def test_short_prefix_rankings(self):
+        """Test that the short prefixes are answered from rankings that follow the updates."""
+        
+        self.index.top_size = 2
+        self.index.load([
+            (self.fern_id, 'Boston Fern', 3),
+            (self.fig_id, 'Fiddle Leaf Fig', 5),
+            (self.cactus_id, 'Golden Barrel Cactus', 4),
+        ])
+        fittonia_id = uuid.uuid4()
+        self.index.add(fittonia_id, 'Fittonia', 4)
+        
+        self.assertEqual(self.get_names('f', limit=2), ['Fiddle Leaf Fig', 'Fittonia'])
+        
+        # A ranked plant is removed, the next one takes its place
+        self.index.remove(self.fig_id)
+        self.assertEqual(self.get_names('f', limit=2), ['Fittonia', 'Boston Fern'])
+        
+        # A re-rated plant moves in the ranking, a renamed one leaves the rankings of its old name
+        self.index.add(self.fern_id, 'Boston Fern', 5)
+        self.assertEqual(self.get_names('f', limit=2), ['Boston Fern', 'Fittonia'])
+        self.index.add(fittonia_id, 'Calathea', 4)
+        self.assertEqual(self.get_names('f', limit=2), ['Boston Fern'])
+        self.assertEqual(self.get_names('ca', limit=2), ['Calathea', 'Golden Barrel Cactus'])
+        
+        # A limit above the size of the rankings scans the keys
+        self.assertEqual(self.get_names('c', limit=3), ['Calathea', 'Golden Barrel Cactus'])
+        
+        
+    def test_memory_footprint(self):
+        """Test that the stats report the size of the index."""
+        
+        stats = self.index.stats()
+        
+        self.assertEqual(stats['plants'], 3)
+        self.assertEqual(stats['keys'], 8) # 2 + 3 + 3 words
+        self.assertGreater(stats['memory_bytes'], 0)
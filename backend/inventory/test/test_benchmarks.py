@@ -0,0 +1,56 @@
+import io
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from inventory.cache import get_catalog_version
+from inventory.models import Plant
+from .base_test import FileUploadTestCase # Custom class for file handling
+
+
+class BenchmarkPlantSerializersCommandTest(FileUploadTestCase):
+    """
+    Test the benchmark_plant_serializers management command.
+
+    - Test that it refuses to run when DEBUG is off, unless --yes is passed.
+    - Test that it only reads the plants it created, and leaves the catalog as it was.
+    """
+
+
+    def setUp(self):
+        super().setUp()
+
+        self.plant = Plant.objects.create(name='Monstera', price=25.00, stock_count=3, image=self.create_valid_image())
+
+
+    def benchmark(self, **options):
+        """Run the command on a small catalog and return its output."""
+
+        stdout = io.StringIO()
+        call_command('benchmark_plant_serializers', sizes=[20], repeat=1, stdout=stdout, **options)
+
+        return stdout.getvalue()
+
+
+    def test_refuses_without_debug(self):
+        """Ensure that the command doesn't write to the database when DEBUG is off (as in the tests) without --yes."""
+
+        with self.assertRaisesMessage(CommandError, 'Pass --yes'):
+            self.benchmark()
+
+
+    def test_catalog_is_untouched(self):
+        """Ensure that the existing plants are not deleted, nor locked, nor counted in the benchmark."""
+
+        version = get_catalog_version()
+
+        with CaptureQueriesContext(connection) as queries:
+            output = self.benchmark(yes=True)
+
+        self.assertIn('PlantListSerializer', output)
+        self.assertFalse([query for query in queries if query['sql'].startswith(('DELETE', 'UPDATE'))])
+
+        self.assertEqual(list(Plant.objects.values_list('id', flat=True)), [self.plant.id])
+        self.assertEqual(get_catalog_version(), version)
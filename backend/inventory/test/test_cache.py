@@ -0,0 +1,77 @@
+from django.db import transaction
+from django.db.models import F
+from django.test import TestCase
+from inventory.cache import (
+    CATALOG_VERSION_KEY, bump_catalog_version, catalog_cache_key,
+    get_catalog_cache, get_catalog_version, invalidate_catalog
+)
+from inventory.models import CatalogVersion
+
+
+class CatalogVersionTest(TestCase):
+    """
+    Test the catalog version used as a part of the cache keys.
+
+    - Test that a bump changes the cache keys.
+    - Test that a version row created again never goes back to an older value.
+    - Test that invalidate_catalog bumps the version once, in the transaction of the change.
+    - Test that a rolled back change doesn't bump the version.
+    - Test that the version is read from the database, not from the cache of the process.
+    """
+
+
+    def test_bump_changes_the_cache_keys(self):
+        """Test that the same URL gets a different key after a bump."""
+
+        key = catalog_cache_key('plant-list', 'http://testserver/')
+        bump_catalog_version()
+
+        self.assertNotEqual(catalog_cache_key('plant-list', 'http://testserver/'), key)
+
+
+    def test_recreated_version_moves_forward(self):
+        """Test that the version is initialized from the clock when its row is missing."""
+
+        bump_catalog_version()
+        version = get_catalog_version()
+        CatalogVersion.objects.filter(key=CATALOG_VERSION_KEY).delete()
+
+        self.assertGreater(get_catalog_version(), version)
+
+
+    def test_invalidate_bumps_in_the_transaction(self):
+        """Test that the version is bumped right away, and not again on commit."""
+
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_catalog()
+            self.assertEqual(get_catalog_version(), version + 1)
+
+        self.assertEqual(get_catalog_version(), version + 1)
+
+
+    def test_rolled_back_change(self):
+        """Test that the bump is rolled back with the change."""
+
+        version = get_catalog_version()
+
+        try:
+            with transaction.atomic():
+                invalidate_catalog()
+                raise RuntimeError('The change failed')
+        except RuntimeError:
+            pass
+
+        self.assertEqual(get_catalog_version(), version)
+
+
+    def test_version_is_shared_by_the_processes(self):
+        """Test that a bump made by another process (directly in the database) is seen, whatever the cache holds."""
+
+        version = get_catalog_version()
+        get_catalog_cache().clear()
+
+        CatalogVersion.objects.filter(key=CATALOG_VERSION_KEY).update(version=F('version') + 1)
+
+        self.assertEqual(get_catalog_version(), version + 1)
@@ -0,0 +1,109 @@
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.core.management import call_command
+
+from inventory.exports import EXPORT_COLUMNS, export_plants, join_blocks
+from inventory.models import Plant
+from .base_test import FileUploadTestCase # Custom class for file handling
+
+
+class ExportPlantsTest(FileUploadTestCase):
+    """
+    Test the streaming catalog export (exports.py) and the export_plants command.
+
+    - Test the CSV and the JSONL exports.
+    - Test that the export resumes after a given id.
+    - Test the gzip compression.
+    - Test that the rows are fetched in chunks.
+    """
+
+
+    def setUp(self):
+        super().setUp()
+
+        image = self.create_valid_image()
+        self.plants = sorted(
+            (
+                Plant.objects.create(name=f'Plant {number}', sku=f'SKU-{number}', price=Decimal('10.50'), discount_percentage=10, image=image)
+                for number in range(5)
+            ),
+            key=lambda plant: plant.id
+        )
+
+        Plant.objects.filter(id=self.plants[0].id).update(description='Line one\nline two, "quoted"')
+
+
+    def export(self, export_type, **kwargs) -> str:
+        """Return the export as text."""
+
+        return b''.join(export_plants(export_type, **kwargs)).decode()
+
+
+    def test_csv(self):
+        """Ensure that the CSV export has a header and a line per plant, ordered by id."""
+
+        rows = list(csv.DictReader(io.StringIO(self.export('csv'))))
+
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(list(rows[0]), list(EXPORT_COLUMNS))
+        self.assertEqual([row['id'] for row in rows], [str(plant.id) for plant in self.plants])
+        self.assertEqual(rows[0]['description'], 'Line one\nline two, "quoted"')
+        self.assertEqual(rows[0]['price'], '10.50')
+        self.assertEqual(rows[0]['discounted_price'], '9.45')
+        self.assertEqual(rows[1]['description'], '')
+        self.assertTrue(rows[0]['image'].startswith('/media/plants/'))
+
+
+    def test_jsonl(self):
+        """Ensure that the JSONL export has one object per line."""
+
+        rows = [json.loads(line) for line in self.export('jsonl').splitlines()]
+
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['sku'], self.plants[0].sku)
+        self.assertEqual(rows[0]['stock_count'], 0)
+        self.assertIsNone(rows[1]['description'])
+
+
+    def test_resume(self):
+        """Ensure that the export continues after the given id."""
+
+        rows = [json.loads(line) for line in self.export('jsonl', after=self.plants[2].id).splitlines()]
+
+        self.assertEqual([row['id'] for row in rows], [str(plant.id) for plant in self.plants[3:]])
+
+
+    def test_chunks(self):
+        """Ensure that the rows are fetched in chunks and that the output is joined into blocks."""
+
+        with self.assertNumQueries(1):
+            # SQLite fetches the chunks of a single query
+            self.export('csv', chunk_size=2)
+
+        self.assertEqual(list(join_blocks(['ab', 'cd', 'e'], block_size=4)), [b'abcd', b'e'])
+
+
+    def test_command(self):
+        """Ensure that the command writes a gzipped file for a .gz name, and can resume."""
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        path = os.path.join(directory, 'plants.csv.gz')
+        call_command('export_plants', output=path, stderr=io.StringIO())
+
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as file:
+            self.assertEqual(len(list(csv.DictReader(file))), 5)
+
+        path = os.path.join(directory, 'plants.jsonl')
+        call_command('export_plants', type='jsonl', output=path, after=self.plants[3].id, stderr=io.StringIO())
+
+        with open(path, encoding='utf-8') as file:
+            self.assertEqual([json.loads(line)['id'] for line in file], [str(self.plants[4].id)])
@@ -0,0 +1,201 @@
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from account.models import User
+from cart.models import Cart, CartItem
+from inventory.autocomplete import get_plant_names_version
+from inventory.cache import get_catalog_version
+from inventory.models import Plant
+from .base_test import FileUploadTestCase # Custom class for file handling
+
+
+class SyncPlantFeedCommandTest(FileUploadTestCase):
+    """
+    Test the sync_plant_feed management command.
+
+    - Test that only the plants whose feed values changed are updated.
+    - Test that an unchanged feed doesn't write anything.
+    - Test that the new SKUs are inserted and the missing ones reported or deleted.
+    - Test that the missing plants are deleted without the per-plant invalidations.
+    - Test that the changes are seen by the processes that didn't run the sync.
+    - Test the dry run and the invalid records.
+    """
+
+
+    def setUp(self):
+        super().setUp()
+
+        storage = Plant._meta.get_field('image').storage
+        self.image = storage.save('plants/monstera.jpg', ContentFile(self.create_valid_image().read()))
+
+        # The initial catalog, loaded by import_plants so the plants have their fingerprints
+        self.run_command('import_plants', [
+            {'sku': f'SKU-{number}', 'name': f'Plant {number}', 'price': '10.00', 'stock_count': 5, 'image': self.image}
+            for number in range(5)
+        ])
+
+
+    def run_command(self, command, records, **options):
+        """Write the records to a JSONL file, run the command on it and return its output."""
+
+        file = tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8')
+        self.addCleanup(os.unlink, file.name)
+
+        with file:
+            file.write(''.join(json.dumps(record) + '\n' for record in records))
+
+        stdout = io.StringIO()
+        call_command(command, file.name, stdout=stdout, stderr=io.StringIO(), **options)
+
+        return stdout.getvalue()
+
+
+    def feed(self, changes=None):
+        """Return the feed of the initial catalog with the changes {sku: {field: value}}."""
+
+        records = [{'sku': f'SKU-{number}', 'price': '10.00', 'stock_count': 5} for number in range(5)]
+
+        for record in records:
+            record.update((changes or {}).get(record['sku'], {}))
+
+        return records
+
+
+    def test_unchanged_feed(self):
+        """Ensure that a feed without changes doesn't write anything."""
+
+        version = get_catalog_version()
+
+        with CaptureQueriesContext(connection) as queries:
+            output = self.run_command('sync_plant_feed', self.feed())
+
+        self.assertIn('0 inserted, 0 updated, 5 unchanged', output)
+        # Only the writes count, reading with .iterator() declares a cursor on PostgreSQL
+        self.assertFalse([query for query in queries if query['sql'].startswith(('UPDATE', 'INSERT', 'DELETE'))])
+        self.assertEqual(get_catalog_version(), version)
+
+
+    def test_changed_records(self):
+        """Ensure that only the changed plants are updated, with a single UPDATE."""
+
+        untouched = Plant.objects.get(sku='SKU-0').updated_at
+        version = get_catalog_version()
+
+        with CaptureQueriesContext(connection) as queries:
+            output = self.run_command('sync_plant_feed', self.feed({
+                'SKU-1': {'price': '8.50'},
+                'SKU-2': {'stock_count': 0, 'discount_percentage': 20},
+            }))
+
+        self.assertIn('2 updated, 3 unchanged', output)
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE "inventory_plant"')]), 1)
+
+        self.assertEqual(Plant.objects.get(sku='SKU-1').price, Decimal('8.50'))
+
+        plant = Plant.objects.get(sku='SKU-2')
+        self.assertEqual((plant.stock_count, plant.discount_percentage), (0, 20))
+        self.assertEqual(plant.discounted_price, Decimal('8.00'))
+        self.assertEqual(Plant.objects.get(sku='SKU-0').updated_at, untouched)
+        self.assertGreater(get_catalog_version(), version)
+
+        # The fingerprints were updated, the same feed changes nothing
+        self.assertIn('0 updated, 5 unchanged', self.run_command('sync_plant_feed', self.feed({
+            'SKU-1': {'price': '8.5'},
+            'SKU-2': {'stock_count': '0', 'discount_percentage': 20},
+        })))
+
+
+    def test_sync_is_seen_by_another_process(self):
+        """Ensure that the cached catalog of the web processes is invalidated by a sync run in its own process."""
+
+        list_url = reverse('plant-list')
+        etag = self.client.get(list_url)['ETag']
+
+        # The command runs in a process of its own
+        with self.separate_process_cache('CATALOG_CACHE_ALIAS'):
+            self.run_command('sync_plant_feed', self.feed({'SKU-1': {'price': '8.50'}}))
+
+        response = self.client.get(list_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+        prices = {plant['name']: Decimal(str(plant['price'])) for plant in response.json()}
+        self.assertEqual(prices['Plant 1'], Decimal('8.50'))
+
+
+    def test_inserted_and_missing(self):
+        """Ensure that the new SKUs are inserted and that the missing ones are reported, then deleted."""
+
+        records = self.feed()[:4] + [{'sku': 'SKU-NEW', 'name': 'Fern', 'price': '12.00', 'image': self.image}]
+
+        output = self.run_command('sync_plant_feed', records)
+
+        self.assertIn('1 inserted, 0 updated, 4 unchanged, 0 deleted, 1 missing', output)
+        self.assertEqual(Plant.objects.get(sku='SKU-NEW').name, 'Fern')
+        self.assertTrue(Plant.objects.filter(sku='SKU-4').exists())
+
+        output = self.run_command('sync_plant_feed', records, delete_missing=True)
+
+        self.assertIn('1 deleted', output)
+        self.assertFalse(Plant.objects.filter(sku='SKU-4').exists())
+
+
+    def test_delete_missing_in_bulk(self):
+        """Ensure that the missing plants are deleted with their cart items and the versions bumped once."""
+
+        user = User.objects.create_user(name='buyer', email='buyer@test.com', password='a12a14t56')
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product=Plant.objects.get(sku='SKU-4'))
+        cart_version = Cart.objects.get(pk=cart.pk).version
+
+        catalog_version = get_catalog_version()
+        names_version = get_plant_names_version()
+
+        output = self.run_command('sync_plant_feed', self.feed()[:3], delete_missing=True)
+
+        self.assertIn('2 deleted', output)
+        self.assertEqual(Plant.objects.count(), 3)
+        self.assertFalse(CartItem.objects.exists())
+        self.assertGreater(Cart.objects.get(pk=cart.pk).version, cart_version) # The cart handlers still run
+
+        # No invalidation per plant, one bump for the whole sync
+        self.assertEqual(get_catalog_version(), catalog_version + 1)
+        self.assertEqual(get_plant_names_version(), names_version + 1)
+
+
+    def test_dry_run(self):
+        """Ensure that the dry run reports the changes without writing them."""
+
+        output = self.run_command('sync_plant_feed', self.feed({'SKU-1': {'price': '1.00'}})[1:], delete_missing=True, dry_run=True)
+
+        self.assertIn('Dry run, would apply: 0 inserted, 1 updated, 3 unchanged, 0 deleted, 1 missing', output)
+        self.assertEqual(Plant.objects.get(sku='SKU-1').price, Decimal('10.00'))
+        self.assertEqual(Plant.objects.count(), 5)
+
+
+    def test_invalid_records(self):
+        """Ensure that an invalid record cancels the sync, or is skipped with --skip-invalid."""
+
+        feed = self.feed({'SKU-0': {'price': '1.00'}, 'SKU-1': {'price': '-1'}, 'SKU-3': {'price': 'NaN'}})
+        feed += [{'price': '1.00'}, {'sku': 'SKU-2', 'price': '1.00'}]
+
+        with self.assertRaisesMessage(CommandError, 'Line 2: The price field must be greater than 0.'):
+            self.run_command('sync_plant_feed', feed)
+
+        self.assertEqual(Plant.objects.get(sku='SKU-0').price, Decimal('10.00'))
+
+        output = self.run_command('sync_plant_feed', feed, skip_invalid=True)
+
+        self.assertIn('1 updated, 2 unchanged, 0 deleted, 0 missing, 4 invalid', output)
+        self.assertEqual(Plant.objects.get(sku='SKU-0').price, Decimal('1.00'))
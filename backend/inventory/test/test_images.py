@@ -0,0 +1,193 @@
+import base64
+import io
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import override_settings
+from PIL import Image
+
+from inventory.images import VARIANT_WIDTHS, generate_plant_variants, render_images, variant_pool
+from inventory.models import Plant
+from inventory.serializers import PlantSerializer
+from .base_test import FileUploadTestCase # Custom class for file handling
+
+
+def encode_image(size, mode='RGB', image_format='JPEG') -> bytes:
+    """Return the content of a plain image of the given size, mode and format."""
+
+    buffer = io.BytesIO()
+    Image.new(mode, size, (0, 128, 0, 128) if mode == 'RGBA' else 'green').save(buffer, image_format)
+
+    return buffer.getvalue()
+
+
+class RenderVariantsTest(FileUploadTestCase):
+    """
+    Test the rendering of the image variants.
+
+    - Test that every width is generated in every format.
+    - Test that the images are never upscaled.
+    - Test that transparent images get a flat JPEG fallback.
+    - Test that the placeholder is a tiny data URI.
+    - Test that the variants can be rendered by the process pool.
+    """
+
+
+    def test_widths_and_formats(self):
+        """Ensure that every width is generated as WebP and as JPEG with the aspect ratio kept."""
+
+        variants = render_images(encode_image((2000, 1000)))['variants']
+
+        self.assertEqual(set(variants), {(name, width) for name in ('webp', 'jpeg') for width in VARIANT_WIDTHS})
+
+        with Image.open(io.BytesIO(variants[('webp', 640)])) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (640, 320)))
+
+        with Image.open(io.BytesIO(variants[('jpeg', 320)])) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (320, 160)))
+
+
+    def test_no_upscaling(self):
+        """Ensure that a small image gets the smaller widths and one variant of its own width."""
+
+        variants = render_images(encode_image((500, 500)))['variants']
+
+        self.assertEqual(sorted({width for _, width in variants}), [320, 500])
+
+
+    def test_transparency(self):
+        """Ensure that a transparent PNG keeps its alpha channel in WebP and is flattened in JPEG."""
+
+        variants = render_images(encode_image((400, 400), 'RGBA', 'PNG'))['variants']
+
+        with Image.open(io.BytesIO(variants[('webp', 320)])) as image:
+            self.assertEqual(image.mode, 'RGBA')
+
+        with Image.open(io.BytesIO(variants[('jpeg', 320)])) as image:
+            self.assertEqual(image.mode, 'RGB')
+
+
+    def test_placeholder(self):
+        """Ensure that the placeholder is a tiny WebP data URI with the aspect ratio of the image."""
+
+        placeholder = render_images(encode_image((1600, 800)))['placeholder']
+
+        self.assertTrue(placeholder.startswith('data:image/webp;base64,'))
+        self.assertLess(len(placeholder), 400)
+
+        content = base64.b64decode(placeholder.split(',', 1)[1])
+        with Image.open(io.BytesIO(content)) as image:
+            self.assertEqual(image.size, (20, 10))
+
+
+    @override_settings(PLANT_IMAGE_WORKERS=1)
+    def test_process_pool(self):
+        """Ensure that the variants are rendered by a worker process."""
+
+        try:
+            rendered = variant_pool.get_executor().submit(render_images, encode_image((700, 350))).result(timeout=60)
+        finally:
+            variant_pool.shutdown()
+
+        self.assertEqual(sorted({width for _, width in rendered['variants']}), [320, 640, 700])
+
+
+class PlantImageVariantsTest(FileUploadTestCase):
+    """
+    Test the generation of the variants of the plant images.
+
+    - Test that the variants are generated once the plant is committed.
+    - Test that PlantSerializer exposes the URLs of the variants.
+    - Test that the backfill command generates the missing placeholders.
+    - Test that a new image replaces the variants of the previous one.
+    - Test the behavior when the image is not readable.
+    """
+
+
+    def create_plant(self, **kwargs):
+        """Create a plant and run the callbacks registered for the commit."""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return Plant.objects.create(name='Monstera', price=25.00, **kwargs)
+
+
+    def test_variants_generated_on_commit(self):
+        """Ensure that the variants are stored and recorded once the plant is committed."""
+
+        plant = self.create_plant(image=self.create_valid_image(size=(800, 600)))
+        plant.refresh_from_db()
+
+        self.assertEqual(plant.image_variants['source'], plant.image.name)
+        self.assertEqual(set(plant.image_variants['webp']), {'320', '640', '800'})
+        self.assertTrue(plant.image_placeholder.startswith('data:image/webp;base64,'))
+
+        storage = plant.image.storage
+        for name in plant.image_variants['jpeg'].values():
+            self.assertTrue(storage.exists(name))
+
+
+    def test_placeholder_backfill(self):
+        """Ensure that the plants processed before the placeholders existed get one from the command."""
+
+        plant = self.create_plant(image=self.create_valid_image())
+        Plant.objects.filter(id=plant.id).update(image_placeholder='')
+
+        call_command('generate_image_variants', stdout=io.StringIO())
+        plant.refresh_from_db()
+
+        self.assertTrue(plant.image_placeholder.startswith('data:image/webp;base64,'))
+        self.assertEqual(PlantSerializer(plant).data['image_placeholder'], plant.image_placeholder)
+
+
+    def test_serializer(self):
+        """Ensure that the serializer returns the srcset-style map of the variant URLs."""
+
+        plant = self.create_plant(image=self.create_valid_image(size=(400, 300)))
+        plant.refresh_from_db()
+
+        data = PlantSerializer(plant).data
+
+        self.assertEqual(set(data['image_variants']), {'webp', 'jpeg'})
+        self.assertEqual(set(data['image_variants']['webp']), {'320', '400'})
+        self.assertTrue(data['image_variants']['webp']['320'].startswith('/media/plants/variants/'))
+        self.assertTrue(data['image_variants']['webp']['320'].endswith('.webp'))
+
+
+    def test_replaced_image(self):
+        """Ensure that a new image gets new variants, the previous files are left to the garbage collection."""
+
+        plant = self.create_plant(image=self.create_valid_image(size=(400, 300)))
+        plant.refresh_from_db()
+        previous = plant.image_variants
+
+        with self.captureOnCommitCallbacks(execute=True):
+            plant.image = self.create_valid_image(name='new_image.jpg', size=(500, 300))
+            plant.save()
+
+        plant.refresh_from_db()
+
+        self.assertEqual(plant.image_variants['source'], plant.image.name)
+        self.assertEqual(set(plant.image_variants['webp']), {'320', '500'})
+        self.assertNotEqual(plant.image_variants['webp']['320'], previous['webp']['320'])
+
+        # The previous files may be shared with other plants, they are not deleted right away
+        self.assertTrue(plant.image.storage.exists(previous['webp']['320']))
+
+
+    def test_unreadable_image(self):
+        """Ensure that an unreadable image is recorded without variants, so it is not processed again."""
+
+        plant = self.create_plant(image=self.create_valid_image())
+
+        # Corrupt the stored image, the uploads themselves are validated by Plant.clean
+        storage = plant.image.storage
+        storage.delete(plant.image.name)
+        storage.save(plant.image.name, ContentFile(b'fake_image_data'))
+
+        with self.assertLogs('inventory.images', 'WARNING'):
+            generate_plant_variants(plant.id)
+
+        plant.refresh_from_db()
+
+        self.assertEqual(plant.image_variants, {'source': plant.image.name})
+        self.assertEqual(PlantSerializer(plant).data['image_variants'], {})
@@ -0,0 +1,229 @@
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory.cache import get_catalog_version
+from inventory import imports
+from inventory.imports import copy_value
+from inventory.models import Plant
+from .base_test import FileUploadTestCase # Custom class for file handling
+
+
+class ImportPlantsCommandTest(FileUploadTestCase):
+    """
+    Test the import_plants management command.
+
+    - Test the import of CSV and JSONL files, with the default values.
+    - Test that the imported plants match the plants saved by Plant.save().
+    - Test that an invalid row cancels the whole import.
+    - Test that the invalid rows are skipped with --skip-invalid.
+    - Test the SKUs and the feed fingerprints.
+    - Test that the catalog caches are invalidated, also for the processes that didn't run the import.
+    - Test the encoding of the values for COPY.
+    - Test that COPY is used on PostgreSQL and raises the Django exceptions.
+    """
+
+
+    def setUp(self):
+        super().setUp()
+
+        storage = Plant._meta.get_field('image').storage
+        self.image = storage.save('plants/monstera.jpg', ContentFile(self.create_valid_image().read()))
+
+
+    def write_file(self, content, extension):
+        """Write the content to a temporary import file and return its path."""
+
+        file = tempfile.NamedTemporaryFile('w', suffix=extension, delete=False, encoding='utf-8')
+        self.addCleanup(os.unlink, file.name)
+
+        with file:
+            file.write(content)
+
+        return file.name
+
+
+    def import_plants(self, content, extension='.csv', **options):
+        """Run the command on the content and return its output."""
+
+        stdout = io.StringIO()
+        call_command('import_plants', self.write_file(content, extension), stdout=stdout, stderr=io.StringIO(), **options)
+
+        return stdout.getvalue()
+
+
+    def test_import_csv(self):
+        """Ensure that the rows of a CSV file are imported, with the default values for the missing columns."""
+
+        output = self.import_plants(
+            'name,description,price,discount_percentage,stock_count,image,rating\n'
+            f'  Monstera ,"Large, split leaves",25.50,10,3,{self.image},4\n'
+            f'Boston Fern,,12,,,{self.image},\n'
+        )
+
+        self.assertIn('Imported 2 plants', output)
+        self.assertIn('rows/s', output)
+
+        monstera = Plant.objects.get(name='Monstera')
+        self.assertEqual(monstera.description, 'Large, split leaves')
+        self.assertEqual(monstera.price, Decimal('25.50'))
+        self.assertEqual(monstera.discounted_price, Decimal('22.95'))
+        self.assertEqual(monstera.stock_count, 3)
+        self.assertEqual(monstera.rating, 4)
+        self.assertEqual(monstera.image.name, self.image)
+        self.assertEqual(monstera.image_variants, {})
+
+        fern = Plant.objects.get(name='Boston Fern')
+        self.assertIsNone(fern.description)
+        self.assertEqual((fern.discount_percentage, fern.stock_count, fern.rating), (0, 0, 0))
+
+
+    def test_import_jsonl(self):
+        """Ensure that the lines of a JSONL file are imported in batches."""
+
+        rows = [{'name': f'Plant {number}', 'price': '9.99', 'image': self.image} for number in range(7)]
+        output = self.import_plants('\n'.join(json.dumps(row) for row in rows) + '\n', '.jsonl', batch_size=3, verbosity=2)
+
+        self.assertEqual(Plant.objects.count(), 7)
+        self.assertIn('3 plants imported', output)
+        self.assertIn('6 plants imported', output)
+
+
+    def test_invalid_row_cancels_import(self):
+        """Ensure that an invalid row stops the import and that nothing is imported."""
+
+        invalid_rows = [
+            {'name': 'Fe', 'price': '10', 'image': self.image},
+            {'name': 'Fern', 'price': '0', 'image': self.image},
+            {'name': 'Fern', 'price': '123456789.00', 'image': self.image},
+            {'name': 'Fern', 'price': '10', 'discount_percentage': 101, 'image': self.image},
+            {'name': 'Fern', 'price': '10', 'stock_count': -1, 'image': self.image},
+            {'name': 'Fern', 'price': '10', 'rating': 6, 'image': self.image},
+            {'name': 'Fern', 'price': '10', 'rating': 4.5, 'image': self.image},
+            {'name': 'Fern', 'price': '10', 'description': 'a' * 1501, 'image': self.image},
+            {'name': 'Fern', 'price': '10', 'image': 'plants/fern.gif'},
+            {'name': 'Fern', 'price': '10', 'image': 'plants/missing.jpg'},
+            {'name': 'Fern', 'price': 'ten', 'image': self.image},
+            {'name': 'Fern', 'price': 'NaN', 'image': self.image},
+            {'name': 'Fern', 'price': 'Infinity', 'image': self.image},
+            {'name': 'Fern', 'price': '10'},
+        ]
+
+        valid_row = json.dumps({'name': 'Monstera', 'price': '10', 'image': self.image})
+
+        for row in invalid_rows:
+            with self.subTest(row=row), self.assertRaisesMessage(CommandError, 'Line 2:'):
+                self.import_plants(f'{valid_row}\n{json.dumps(row)}\n', '.jsonl', batch_size=1)
+
+        self.assertFalse(Plant.objects.exists())
+
+
+    def test_skip_invalid(self):
+        """Ensure that the invalid rows are reported and skipped with --skip-invalid."""
+
+        output = self.import_plants(
+            f'{json.dumps({"name": "Monstera", "price": "10", "image": self.image})}\n'
+            'not json\n'
+            f'{json.dumps({"name": "Fe", "price": "10", "image": self.image})}\n',
+            '.jsonl', skip_invalid=True
+        )
+
+        self.assertEqual(list(Plant.objects.values_list('name', flat=True)), ['Monstera'])
+        self.assertIn('skipped 2 invalid rows', output)
+
+        # A price that is not a number is skipped too, also in a CSV file
+        output = self.import_plants(f'name,price,image\nFern,NaN,{self.image}\n', skip_invalid=True)
+
+        self.assertIn('Imported 0 plants', output)
+        self.assertIn('skipped 1 invalid rows', output)
+
+
+    def test_sku(self):
+        """Ensure that the SKU and the feed fingerprint are stored, and that a duplicate SKU cancels the import."""
+
+        self.import_plants(f'sku,name,price,image\nMON-1,Monstera,10,{self.image}\n,Fern,10,{self.image}\n')
+
+        monstera = Plant.objects.get(name='Monstera')
+        self.assertEqual(monstera.sku, 'MON-1')
+        self.assertEqual(len(monstera.feed_fingerprint), 64)
+
+        fern = Plant.objects.get(name='Fern')
+        self.assertIsNone(fern.sku)
+        self.assertEqual(fern.feed_fingerprint, '')
+
+        with self.assertRaisesMessage(CommandError, 'duplicate SKU'):
+            self.import_plants(f'sku,name,price,image\nCAC-1,Cactus,10,{self.image}\nMON-1,Monstera,10,{self.image}\n')
+
+        self.assertFalse(Plant.objects.filter(name='Cactus').exists())
+
+
+    def test_invalidates_catalog(self):
+        """Ensure that the catalog version is bumped by the import."""
+
+        version = get_catalog_version()
+
+        self.import_plants(f'name,price,image\nMonstera,10,{self.image}\n')
+
+        self.assertGreater(get_catalog_version(), version)
+
+
+    def test_import_is_seen_by_another_process(self):
+        """Ensure that the cached catalog of the web processes is invalidated by an import run in its own process."""
+
+        self.import_plants(f'name,price,image\nCactus,10,{self.image}\n')
+
+        list_url = reverse('plant-list')
+        etag = self.client.get(list_url)['ETag']
+
+        # The command runs in a process of its own
+        with self.separate_process_cache('CATALOG_CACHE_ALIAS'):
+            self.import_plants(f'name,price,image\nMonstera,10,{self.image}\n')
+
+        response = self.client.get(list_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(sorted(plant['name'] for plant in response.json()), ['Cactus', 'Monstera'])
+
+
+    def test_unknown_format(self):
+        """Ensure that the format must be known."""
+
+        with self.assertRaisesMessage(CommandError, 'Cannot guess the format'):
+            self.import_plants('name,price,image\n', '.txt')
+
+
+    def test_copy_value(self):
+        """Ensure that the values are escaped for the text format of COPY."""
+
+        self.assertEqual(copy_value(None), '\\N')
+        self.assertEqual(copy_value('a\tb\nc\\d\re'), 'a\\tb\\nc\\\\d\\re')
+        self.assertEqual(copy_value(Decimal('9.90')), '9.90')
+        self.assertEqual(copy_value({}), '{}')
+
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY requires PostgreSQL.')
+    def test_copy(self):
+        """Ensure that the plants are loaded with COPY and that a duplicate SKU raises IntegrityError."""
+
+        with mock.patch('inventory.imports.copy_plants', wraps=imports.copy_plants) as copy_plants:
+            self.import_plants(f'sku,name,price,image\nMON-1,Monstera,10,{self.image}\n')
+
+        copy_plants.assert_called_once()
+        self.assertEqual(Plant.objects.get(sku='MON-1').name, 'Monstera')
+
+        importer = imports.PlantImporter()
+        row = importer.clean_row({'sku': 'MON-1', 'name': 'Monstera', 'price': '10', 'image': self.image}, timezone.now())
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            imports.copy_plants(connection, [row])
@@ -1,4 +1,5 @@
 import uuid
+from decimal import Decimal
 
 from django.test import TestCase
 from django.core.exceptions import ValidationError
@@ -32,6 +33,7 @@ class PlantModelTest(FileUploadTestCase):
     - Test invalid rating handling
     - Test image upload path.
     - Test the get_discounted_price method.
+    - Test the discounted_price column.
     - Test the in_stock property.
     - Test that the __str__ method correctly represents a Plant object
     """
@@ -316,6 +318,25 @@ class PlantModelTest(FileUploadTestCase):
         # Recieve a value from the the get_discounted_price
         output = self.correct_plant_object.get_discounted_price()
         
+        self.assertEqual(output, Decimal('18.00')) # 20.00 - 10% = 18.00
+        
+        
+    def test_discounted_price_column(self):
+        """Test that the database stores the discounted price and keeps it up to date."""
+        
+        plant = Plant.objects.create(name='Rosa', price=Decimal('12.99'), discount_percentage=15, image=self.create_valid_image())
+        
+        # The value is returned by the database right after the INSERT
+        self.assertEqual(plant.discounted_price, Decimal('11.04')) # 12.99 - 15% = 11.0415
+        self.assertEqual(plant.discounted_price, plant.get_discounted_price())
+        
+        # Change the discount and make sure the column follows
+        plant.discount_percentage = 50
+        plant.save()
+        
+        self.assertEqual(plant.discounted_price, Decimal('6.50')) # 12.99 - 50% = 6.495
+        self.assertEqual(Plant.objects.filter(discounted_price__lt=7).count(), 1)
+        
     
     def test_in_stock_property(self):
         """Test that the in-stock property returns the expected boolean value."""
@@ -0,0 +1,106 @@
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+
+from inventory.models import Plant
+from inventory.serializers import PlantSerializer, PlantListSerializer
+from .base_test import FileUploadTestCase # Custom class for file handling
+
+
+class PlantListSerializerTest(FileUploadTestCase):
+    """
+    Test that PlantListSerializer (the fast path of the list endpoints) renders exactly
+    the same JSON as PlantSerializer.
+    
+    - Test that the rendered bytes are identical for a list of plants.
+    - Test that the rendered bytes are identical for a plant without image and description.
+    - Test that the rendered bytes are identical for a plant with image variants.
+    - Test that the fields are in the same order.
+    """
+    
+    
+    def setUp(self):
+        """Create plants that cover the different kinds of values."""
+        
+        super().setUp()
+        
+        Plant.objects.create(
+            name='Aloe Vera',
+            description='A succulent plant known for its "soothing" gel.',
+            price=Decimal('20.00'),
+            discount_percentage=10,
+            stock_count=120,
+            image=self.create_valid_image(),
+            rating=4
+        )
+        Plant.objects.create(
+            name='Boston Fern',
+            description='Likes humidity — and indirect light.',
+            price=Decimal('12.99'),
+            discount_percentage=33,
+            stock_count=0,
+            image=self.create_valid_image(name='fern.jpg'),
+            rating=5
+        )
+        Plant.objects.create(
+            name='Cactus',
+            description='',
+            price=Decimal('7.05'),
+            discount_percentage=0,
+            stock_count=3,
+            image=self.create_valid_image(name='cactus.jpg'),
+            rating=0
+        )
+    
+    
+    def render_both(self, queryset):
+        """Render the queryset with both serializers and return the two JSON documents."""
+        
+        renderer = JSONRenderer()
+        
+        expected = renderer.render(PlantSerializer(queryset, many=True).data)
+        actual = renderer.render(PlantListSerializer(PlantListSerializer.get_rows(queryset)).data)
+        
+        return expected, actual
+    
+    
+    def test_rendered_json_is_identical(self):
+        """Ensure that both serializers produce the same bytes."""
+        
+        expected, actual = self.render_both(Plant.objects.order_by('name'))
+        
+        self.assertEqual(actual, expected)
+    
+    
+    def test_rendered_json_is_identical_without_image(self):
+        """Ensure that the missing values are rendered the same way."""
+        
+        Plant.objects.filter(name='Cactus').update(image='', description=None)
+        
+        expected, actual = self.render_both(Plant.objects.filter(name='Cactus'))
+        
+        self.assertEqual(actual, expected)
+    
+    
+    def test_rendered_json_is_identical_with_image_variants(self):
+        """Ensure that the URLs of the image variants are rendered the same way."""
+        
+        plant = Plant.objects.get(name='Aloe Vera')
+        Plant.objects.filter(id=plant.id).update(image_variants={
+            'source': plant.image.name,
+            'webp': {'320': 'plants/variants/aloe_320.webp', '640': 'plants/variants/aloe_640.webp'},
+            'jpeg': {'320': 'plants/variants/aloe_320.jpg', '640': 'plants/variants/aloe_640.jpg'},
+        }, image_placeholder='data:image/webp;base64,UklGRiIAAABXRUJQ')
+        
+        expected, actual = self.render_both(Plant.objects.order_by('name'))
+        
+        self.assertEqual(actual, expected)
+        self.assertIn(b'/media/plants/variants/aloe_640.webp', actual)
+    
+    
+    def test_field_order(self):
+        """Ensure that the fields are in the order declared by PlantSerializer."""
+        
+        rows = PlantListSerializer(PlantListSerializer.get_rows(Plant.objects.all())).data
+        
+        self.assertEqual(list(rows[0]), PlantSerializer.Meta.fields)
@@ -0,0 +1,110 @@
+import io
+import os
+import time
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+
+from inventory.models import Plant
+from inventory.storage import get_reference_counts
+from .base_test import FileUploadTestCase # Custom class for file handling
+
+
+class ContentAddressedStorageTest(FileUploadTestCase):
+    """
+    Test the content-addressed storage of the plant images.
+
+    - Test that the files are named by the hash of their content.
+    - Test that identical uploads are stored once.
+    - Test that the reference counts include the images and the variants.
+    - Test that the garbage collection deletes only the old orphaned files.
+    """
+
+
+    def setUp(self):
+        super().setUp()
+
+        self.storage = Plant._meta.get_field('image').storage
+
+
+    def create_plant(self, name, image):
+        """Create a plant and run the callbacks registered for the commit (the variants generation)."""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            plant = Plant.objects.create(name=name, price=10.00, image=image)
+
+        plant.refresh_from_db()
+
+        return plant
+
+
+    def make_old(self, name):
+        """Set the modification time of a stored file two days back."""
+
+        two_days_ago = time.time() - 2 * 24 * 60 * 60
+        os.utime(self.storage.path(name), (two_days_ago, two_days_ago))
+
+
+    def test_hashed_name(self):
+        """Ensure that the name is made of the hash of the content, in a two-character subdirectory."""
+
+        name = self.storage.save('plants/Monstera.JPG', ContentFile(b'content'))
+        digest = 'ed7002b439e9ac845f22357d822bac1444730fbdb6016d3ec9432297b9ec9f73'
+
+        self.assertEqual(name, f'plants/ed/{digest}.jpg')
+
+
+    def test_identical_uploads(self):
+        """Ensure that the same image uploaded for two plants is stored once."""
+
+        monstera = self.create_plant('Monstera', self.create_valid_image(name='monstera.jpg'))
+        fern = self.create_plant('Fern', self.create_valid_image(name='fern.jpg'))
+        cactus = self.create_plant('Cactus', self.create_valid_image(name='cactus.jpg', size=(32, 32)))
+
+        self.assertEqual(monstera.image.name, fern.image.name)
+        self.assertNotEqual(monstera.image.name, cactus.image.name)
+
+        _, files = self.storage.listdir(os.path.dirname(monstera.image.name))
+        self.assertEqual(files.count(os.path.basename(monstera.image.name)), 1)
+
+
+    def test_reference_counts(self):
+        """Ensure that the shared image and its variants are counted for every plant."""
+
+        monstera = self.create_plant('Monstera', self.create_valid_image())
+        self.create_plant('Fern', self.create_valid_image())
+
+        counts = get_reference_counts()
+
+        self.assertEqual(counts[monstera.image.name], 2)
+        self.assertEqual(counts[monstera.image_variants['webp']['64']], 2)
+
+
+    def test_garbage_collection(self):
+        """Ensure that only the orphaned files that are old enough are deleted."""
+
+        monstera = self.create_plant('Monstera', self.create_valid_image())
+        fern = self.create_plant('Fern', self.create_valid_image(size=(32, 32)))
+        shared = self.create_plant('Shared', self.create_valid_image())
+
+        variant = fern.image_variants['jpeg']['32']
+        for name in (monstera.image.name, fern.image.name, variant):
+            self.make_old(name)
+
+        # The image of the Monstera is still used by another plant
+        monstera.delete()
+        fern.delete()
+
+        # A recent orphan is spared
+        recent = self.storage.save('plants/recent.jpg', ContentFile(b'recent'))
+
+        call_command('collect_plant_images', stdout=io.StringIO())
+
+        self.assertTrue(self.storage.exists(shared.image.name))
+        self.assertTrue(self.storage.exists(recent))
+        self.assertFalse(self.storage.exists(fern.image.name))
+        self.assertFalse(self.storage.exists(variant))
+
+        # The dry run lists the files without deleting them
+        call_command('collect_plant_images', min_age=0, dry_run=True, stdout=io.StringIO())
+        self.assertTrue(self.storage.exists(recent))
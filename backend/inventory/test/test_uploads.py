@@ -0,0 +1,213 @@
+import io
+import struct
+import zlib
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopUpload
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from account.models import User
+from inventory.forms import PlantAdminForm
+from inventory.models import Plant
+from inventory.uploadhandlers import MaxSizeUploadHandler
+from inventory.validators import HEADER_READ_LIMIT, read_image_header
+from .base_test import FileUploadTestCase # Custom class for file handling
+
+
+def png_chunk(chunk_type, data) -> bytes:
+    """Return a PNG chunk: length, type, data and CRC."""
+
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+
+def png_header(width, height) -> bytes:
+    """Return the beginning of a PNG image of the given size: the signature, the IHDR chunk and an empty IDAT chunk."""
+
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+
+    return b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', ihdr) + png_chunk(b'IDAT', b'')
+
+
+class TrackingFile(io.BytesIO):
+    """In-memory file that remembers how far it has been read."""
+
+    furthest = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.furthest = max(self.furthest, self.tell())
+        return data
+
+
+class ImageHeaderValidationTest(FileUploadTestCase):
+    """
+    Test the header-only validation of the uploaded images.
+
+    - Test that the dimensions are read from the header only.
+    - Test that the content must match the extension.
+    - Test that the decompression bombs are rejected.
+    - Test that a plant with a valid image passes the validation.
+    - Test that the image of a saved plant is not read again.
+    """
+
+
+    def test_reads_header_only(self):
+        """Ensure that only the beginning of a large file is read and its position is restored."""
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (120, 80), 'green').save(buffer, 'JPEG')
+
+        file = TrackingFile(buffer.getvalue() + b'\0' * (5 * 1024 * 1024))
+        file.seek(10)
+
+        self.assertEqual(read_image_header(file, '.jpg'), (120, 80))
+        self.assertLessEqual(file.furthest, HEADER_READ_LIMIT)
+        self.assertEqual(file.tell(), 10)
+
+
+    def test_content_must_match_extension(self):
+        """Ensure that a PNG named .jpg and a file that is not an image are rejected."""
+
+        with self.assertRaises(ValidationError):
+            read_image_header(io.BytesIO(png_header(10, 10)), '.jpg')
+
+        with self.assertRaises(ValidationError):
+            read_image_header(io.BytesIO(b'fake_image_data'), '.png')
+
+        # Valid magic bytes followed by garbage
+        with self.assertRaises(ValidationError):
+            read_image_header(io.BytesIO(b'\xff\xd8\xff' + b'garbage' * 100), '.jpeg')
+
+
+    def test_decompression_bomb(self):
+        """Ensure that the images with too many pixels are rejected without decoding them."""
+
+        # Above the limit of the validator
+        with self.assertRaises(ValidationError):
+            read_image_header(io.BytesIO(png_header(10000, 5000)), '.png')
+
+        # Above the limit where Pillow refuses to open the image
+        with self.assertRaises(ValidationError):
+            read_image_header(io.BytesIO(png_header(100000, 100000)), '.png')
+
+        self.assertEqual(read_image_header(io.BytesIO(png_header(4000, 3000)), '.png'), (4000, 3000))
+
+
+    def test_plant_clean(self):
+        """Ensure that Plant.clean rejects an invalid upload and accepts a valid one."""
+
+        plant = Plant(name='Rosa', price=10.00, image=self.create_valid_image(content=b'fake_image_data'))
+
+        with self.assertRaises(ValidationError):
+            plant.clean()
+
+        plant = Plant(name='Rosa', price=10.00, image=self.create_valid_image())
+        plant.clean()
+
+
+    def test_saved_image_not_read(self):
+        """Ensure that saving a plant again doesn't read its stored image."""
+
+        plant = Plant.objects.create(name='Rosa', price=10.00, image=self.create_valid_image())
+
+        with mock.patch('inventory.models.read_image_header') as read_image_header_mock:
+            plant.name = 'Rose'
+            plant.save()
+
+        read_image_header_mock.assert_not_called()
+
+
+class MaxSizeUploadHandlerTest(FileUploadTestCase):
+    """
+    Test the upload handler that stops the oversized uploads.
+
+    - Test that a file larger than MAX_UPLOAD_SIZE is dropped from the request and recorded,
+      without resetting the connection.
+    - Test that a smaller file is received.
+    - Test that Plant.clean reads the same limit.
+    - Test that the admin form validates the upload with Plant.clean.
+    - Test that the admin reports the size of an oversized upload, not a missing field.
+    """
+
+
+    def get_uploaded_files(self, content):
+        """Send a multipart request with the content as a file and return the files Django received."""
+
+        request = RequestFactory().post('/', {'image': SimpleUploadedFile('plant.jpg', content)})
+
+        return request.FILES
+
+
+    @override_settings(MAX_UPLOAD_SIZE=1024 * 1024)
+    def test_oversized_upload(self):
+        """Ensure that the upload is stopped once the file crosses the limit."""
+
+        request = RequestFactory().post('/', {'image': SimpleUploadedFile('plant.jpg', b'0' * (2 * 1024 * 1024))})
+
+        with self.assertLogs('inventory.uploadhandlers', 'WARNING'):
+            files = request.FILES
+
+        self.assertNotIn('image', files)
+        self.assertEqual(request.oversized_files, {'image': 1024 * 1024})
+
+        # The rest of the body is read, the connection is kept for the error response
+        handler = MaxSizeUploadHandler()
+        handler.field_name, handler.file_name = 'image', 'plant.jpg'
+
+        with self.assertLogs('inventory.uploadhandlers', 'WARNING'), self.assertRaises(StopUpload) as context:
+            handler.receive_data_chunk(b'0' * 1024, 1024 * 1024)
+
+        self.assertFalse(context.exception.connection_reset)
+
+
+    @override_settings(MAX_UPLOAD_SIZE=1024 * 1024)
+    def test_upload_within_limit(self):
+        """Ensure that a file within the limit is received entirely."""
+
+        files = self.get_uploaded_files(b'0' * 1024)
+
+        self.assertEqual(files['image'].size, 1024)
+
+
+    @override_settings(MAX_UPLOAD_SIZE=1024)
+    def test_model_limit_follows_setting(self):
+        """Ensure that Plant.clean enforces the same limit as the upload handler."""
+
+        plant = Plant(name='Rosa', price=10, image=self.create_valid_image(size=(400, 400)))
+
+        with self.assertRaisesMessage(ValidationError, 'cannot exceed'):
+            plant.clean()
+
+
+    def test_admin_form(self):
+        """Ensure that the admin form accepts a valid image and rejects a file that is not an image."""
+
+        data = {'name': 'Rosa', 'price': '10.00', 'discount_percentage': 0, 'stock_count': 1, 'rating': 0}
+
+        form = PlantAdminForm(data, {'image': self.create_valid_image()})
+        self.assertTrue(form.is_valid(), form.errors)
+
+        form = PlantAdminForm(data, {'image': self.create_valid_image(content=b'fake_image_data')})
+        self.assertFalse(form.is_valid())
+
+
+    @override_settings(MAX_UPLOAD_SIZE=1024 * 1024)
+    def test_admin_reports_oversized_upload(self):
+        """Ensure that the admin form shows the size error of the validator instead of "This field is required."."""
+
+        admin = User.objects.create_superuser(name='admin', email='admin@test.com', password='a12a14t56')
+        self.client.force_login(admin)
+
+        data = {'name': 'Rosa', 'price': '10.00', 'discount_percentage': 0, 'stock_count': 1, 'rating': 0}
+        data['image'] = SimpleUploadedFile('plant.jpg', b'0' * (2 * 1024 * 1024))
+
+        with self.assertLogs('inventory.uploadhandlers', 'WARNING'):
+            response = self.client.post(reverse('admin:inventory_plant_add'), data)
+
+        self.assertEqual(response.status_code, 200) # The form is displayed again with its errors
+        self.assertEqual(response.context['adminform'].form.errors['image'], ['The image field file cannot exceed 1.0MB.'])
+        self.assertFalse(Plant.objects.exists())
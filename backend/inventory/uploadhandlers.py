@@ -0,0 +1,50 @@
+import logging
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+
+logger = logging.getLogger(__name__)
+
+
+class MaxSizeUploadHandler(FileUploadHandler):
+    """
+    Stops receiving a multipart request as soon as an uploaded file crosses MAX_UPLOAD_SIZE.
+
+    The default handlers keep the whole file (in memory, then in a temporary file) before
+    the form or the model can check its size, so a 15 MB upload is fully received and
+    buffered only to be rejected. This handler runs first and passes the chunks on to the
+    next handlers until the limit is crossed, then the rest of the request is read and
+    discarded without being buffered. It is not left unread: the browser would report a
+    reset connection instead of the error page. The file is then missing from the request,
+    so the handler records the field and the limit in request.oversized_files ({field
+    name: max size}) for the form to report the size of the file (see forms.PlantAdminForm)
+    rather than a missing field.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_size = settings.MAX_UPLOAD_SIZE
+
+
+    def receive_data_chunk(self, raw_data, start):
+        """Pass the chunk on to the next handler, or stop the upload if the file is too large."""
+
+        if start + len(raw_data) > self.max_size:
+            logger.warning('Upload of %s stopped, the file exceeds %s bytes', self.file_name, self.max_size)
+
+            if self.request is not None:
+                if not hasattr(self.request, 'oversized_files'):
+                    self.request.oversized_files = {}
+                self.request.oversized_files[self.field_name] = self.max_size
+
+            # Discard the rest of the body, so the response with the size error reaches the client
+            raise StopUpload(connection_reset=False)
+
+        return raw_data
+
+
+    def file_complete(self, file_size):
+        """The file itself is built by the next handlers."""
+
+        return None
@@ -1,8 +1,14 @@
 from django.urls import path
-from .apis import PlantListAPI, PlantDetailAPI
+from .apis import PlantListAPI, PlantDetailAPI, PlantBatchAPI, PlantFacetsAPI, PlantSearchAPI, PlantAutocompleteAPI, PlantStockAPI, PlantExportAPI
 
 urlpatterns = [
     path('', PlantListAPI.as_view(), name='plant-list'),
-    path('plant/<uuid:id>/', PlantDetailAPI.as_view(), name='plant-detail')
+    path('plant/<uuid:id>/', PlantDetailAPI.as_view(), name='plant-detail'),
+    path('batch/', PlantBatchAPI.as_view(), name='plant-batch'),
+    path('facets/', PlantFacetsAPI.as_view(), name='plant-facets'),
+    path('search/', PlantSearchAPI.as_view(), name='plant-search'),
+    path('autocomplete/', PlantAutocompleteAPI.as_view(), name='plant-autocomplete'),
+    path('stock/', PlantStockAPI.as_view(), name='plant-stock'),
+    path('export/', PlantExportAPI.as_view(), name='plant-export'),
 ]
 
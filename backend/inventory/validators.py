@@ -0,0 +1,88 @@
+import io
+import warnings
+
+from django.core.exceptions import ValidationError
+from PIL import Image, UnidentifiedImageError
+
+
+# Largest accepted image in pixels (e.g. 8000 x 5000). The file size says little about
+# the memory needed to decode an image, a small PNG can expand to gigabytes (a decompression bomb).
+MAX_IMAGE_PIXELS = 40_000_000
+
+# The header is read in chunks, and never more than HEADER_READ_LIMIT bytes of the file
+HEADER_CHUNK_SIZE = 16 * 1024
+HEADER_READ_LIMIT = 256 * 1024
+
+# Pillow format and magic bytes expected for every allowed extension
+IMAGE_FORMATS = {
+    '.png': ('PNG', b'\x89PNG\r\n\x1a\n'),
+    '.jpg': ('JPEG', b'\xff\xd8\xff'),
+    '.jpeg': ('JPEG', b'\xff\xd8\xff'),
+}
+
+
+def get_image_size_message(max_size) -> str:
+    """Return the error message of an image file larger than max_size bytes."""
+
+    return f'The image field file cannot exceed {max_size / 1024 / 1024}MB.'
+
+
+def read_image_header(file, extension) -> tuple:
+    """
+    Check that the file is an image of the format announced by its extension and return its (width, height).
+
+    Only the beginning of the file is read: the magic bytes first, then chunks until Pillow
+    can parse the header (PIL.Image.open is lazy and doesn't decode the pixels), so the
+    memory used and the time spent don't depend on the size of the file. The position
+    of the file is restored afterwards.
+
+    Raises ValidationError if the content doesn't match the extension, if the header
+    can't be found in the first HEADER_READ_LIMIT bytes or if the image is too large.
+    """
+
+    image_format, signature = IMAGE_FORMATS[extension]
+    position = file.tell()
+
+    try:
+        file.seek(0)
+        header = file.read(len(signature))
+
+        if header != signature:
+            raise ValidationError(f'The image field file is not a valid {image_format} image.')
+
+        while len(header) < HEADER_READ_LIMIT:
+            chunk = file.read(HEADER_CHUNK_SIZE)
+            header += chunk
+
+            size = open_image_header(header, image_format)
+            if size is not None:
+                break
+
+            if not chunk:
+                raise ValidationError(f'The image field file is not a valid {image_format} image.')
+        else:
+            raise ValidationError('The image field file header could not be read.')
+    finally:
+        file.seek(position)
+
+    width, height = size
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ValidationError(f'The image field file cannot have more than {MAX_IMAGE_PIXELS} pixels.')
+
+    return width, height
+
+
+def open_image_header(header, image_format):
+    """Return the (width, height) parsed from the beginning of an image or None if more bytes are needed."""
+
+    try:
+        # The size is checked by the caller, against a stricter limit than the warning of Pillow
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+
+            with Image.open(io.BytesIO(header), formats=[image_format]) as image:
+                return image.size
+    except Image.DecompressionBombError:
+        raise ValidationError(f'The image field file cannot have more than {MAX_IMAGE_PIXELS} pixels.')
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        return None